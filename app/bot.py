@@ -2,13 +2,47 @@
 import os
 import sys
 import asyncio
+import signal
 import subprocess
+import time
 import traceback
+from datetime import datetime, timedelta, timezone
 import discord
 from discord.ext import commands
 from discord import app_commands
 from .config import Settings
-from .db import init_db
+from . import dbstats
+from .loopwatch import LOOP_MONITOR
+from .metrics import observe_command, start_metrics_server
+from .profiling import PROFILER
+from .db import (
+    RATINGS_CACHE, WRITE_BEHIND, close_memory_db, configure_db, init_db, persist_memory_db, run_maintenance,
+    warm_ratings_cache,
+)
+
+
+class TeamTree(app_commands.CommandTree):
+    """Arbre de commandes slash qui horodate chaque interaction (latence exposée sur /metrics, /profile command:)."""
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        interaction.extras["t0"] = time.perf_counter()
+        if interaction.command:
+            PROFILER.command_started(interaction.command.qualified_name)
+        return True
+
+    async def on_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError) -> None:
+        cmd = interaction.command
+        _record_command(interaction, cmd.qualified_name if cmd else "?", "error")
+        await super().on_error(interaction, error)
+
+
+def _record_command(interaction: discord.Interaction, name: str, status: str) -> None:
+    t0 = interaction.extras.get("t0")
+    if t0 is None:
+        observe_command(name, status, None)
+        return
+    observe_command(name, status, time.perf_counter() - t0)
+    PROFILER.command_finished(name)
 
 
 class TeamBot(commands.Bot):
@@ -18,11 +52,54 @@ class TeamBot(commands.Bot):
         intents.voice_states = True
         # Garde message_content seulement si tu utilises des commandes préfixées ou lis du contenu
         intents.message_content = True
-        super().__init__(command_prefix="!", intents=intents)
+        super().__init__(command_prefix="!", intents=intents, tree_cls=TeamTree)
         self.settings = settings
+        self._maintenance_task: asyncio.Task | None = None
+        self._persist_task: asyncio.Task | None = None
+        self._metrics_runner = None
 
     async def setup_hook(self) -> None:
-        # 1) Charger les cogs (avec logs d’erreurs lisibles)
+        # 1) Profil SQLite puis init / migration du schéma DB, une seule fois et avant les cogs :
+        #    les repositories (app/db.py) ne vérifient plus l'existence des tables à chaque appel.
+        dbstats.configure(slow_ms=self.settings.SLOW_QUERY_MS)
+        # Retard de la boucle toutes les LOOP_LAG_INTERVAL_MS ; pile capturée si bloquée > LOOP_STALL_MS
+        LOOP_MONITOR.configure(interval_ms=self.settings.LOOP_LAG_INTERVAL_MS, stall_ms=self.settings.LOOP_STALL_MS)
+        LOOP_MONITOR.start()
+        configure_db(
+            self.settings.DB_PROFILE,
+            mmap_size=self.settings.DB_MMAP_SIZE,
+            cache_size=self.settings.DB_CACHE_SIZE,
+            busy_timeout=self.settings.DB_BUSY_TIMEOUT_MS,
+        )
+        await init_db(self.settings.DB_PATH, in_memory=self.settings.DB_IN_MEMORY)
+        if self.settings.DB_IN_MEMORY:
+            # Base en mémoire : recopie immédiate (schéma migré), puis toutes les DB_MEMORY_PERSIST_S secondes
+            await persist_memory_db()
+            self._persist_task = asyncio.create_task(self._persist_loop(), name="db-persist")
+            try:
+                # SIGTERM (arrêt de la plateforme) -> close() -> dernière recopie
+                asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, lambda: asyncio.create_task(self.close()))
+            except (NotImplementedError, RuntimeError):
+                pass
+            print(f"💾 DB en mémoire — recopie sur {self.settings.DB_PATH} toutes les {self.settings.DB_MEMORY_PERSIST_S}s")
+        WRITE_BEHIND.configure(
+            interval_ms=self.settings.WRITE_BEHIND_INTERVAL_MS,
+            max_batch=self.settings.WRITE_BEHIND_MAX_BATCH,
+        )
+        RATINGS_CACHE.resize(self.settings.RATINGS_CACHE_SIZE)
+        await warm_ratings_cache(self.settings.DB_PATH)
+        if 0 <= self.settings.MAINTENANCE_HOUR <= 23:
+            self._maintenance_task = asyncio.create_task(self._maintenance_loop(), name="db-maintenance")
+        if self.settings.METRICS_PORT:
+            # Endpoint Prometheus local (curl http://127.0.0.1:9108/metrics) ; un port occupé ne bloque pas le bot
+            try:
+                self._metrics_runner = await start_metrics_server(
+                    self, self.settings.METRICS_HOST, self.settings.METRICS_PORT)
+                print(f"📈 Métriques sur http://{self.settings.METRICS_HOST}:{self.settings.METRICS_PORT}/metrics")
+            except OSError as e:
+                print("⚠️ Metrics server error:", e)
+
+        # 2) Charger les cogs (avec logs d’erreurs lisibles)
         async def _safe_load(ext: str):
             try:
                 await self.load_extension(ext)
@@ -43,9 +120,6 @@ class TeamBot(commands.Bot):
         ):
             await _safe_load(ext)
 
-        # 2) Init DB (avant la sync, pour éviter toute commande qui accède à la DB au tout début)
-        await init_db(self.settings.DB_PATH)
-
         # 3) Sync des commandes
         #    - GLOBAL (peut prendre un peu de temps à se propager) — activable via SYNC_GLOBAL=true (défaut)
         #    - GUILD (si GUILD_ID défini) — apparition immédiate sur ta guild de dev
@@ -66,6 +140,62 @@ class TeamBot(commands.Bot):
             except Exception as e:
                 print("⚠️ Guild sync error:", e)
 
+    async def _maintenance_loop(self):
+        """Maintenance DB une fois par jour à MAINTENANCE_HOUR (UTC) : pruning, purges, archivage, ANALYZE, vacuum, checkpoint."""
+        s = self.settings
+        while True:
+            now = datetime.now(timezone.utc)
+            nxt = now.replace(hour=s.MAINTENANCE_HOUR, minute=0, second=0, microsecond=0)
+            if nxt <= now:
+                nxt += timedelta(days=1)
+            await asyncio.sleep((nxt - now).total_seconds())
+            t0 = time.perf_counter()
+            try:
+                stats = await run_maintenance(
+                    s.DB_PATH,
+                    keep_signatures=s.TEAM_HISTORY_KEEP,
+                    session_max_age_days=s.MAINTENANCE_SESSION_DAYS,
+                    archive_after_days=s.ARCHIVE_AFTER_DAYS,
+                )
+                print(f"🧹 Maintenance DB en {time.perf_counter() - t0:.2f}s : "
+                      + ", ".join(f"{k}={v}" for k, v in stats.items()))
+            except Exception as e:
+                print("⚠️ Maintenance DB error:", e)
+                traceback.print_exc()
+
+    async def _persist_loop(self):
+        """Mode mémoire : recopie périodique sur disque (fenêtre de perte max = DB_MEMORY_PERSIST_S)."""
+        while True:
+            await asyncio.sleep(self.settings.DB_MEMORY_PERSIST_S)
+            try:
+                ms = await persist_memory_db()
+                if ms and ms > 1000:
+                    print(f"⚠️ Recopie DB lente : {ms:.0f} ms")
+            except Exception as e:
+                print("⚠️ DB persist error:", e)
+
+    async def close(self) -> None:
+        if self._maintenance_task:
+            self._maintenance_task.cancel()
+        if self._persist_task:
+            self._persist_task.cancel()
+        LOOP_MONITOR.stop()
+        if self._metrics_runner:
+            await self._metrics_runner.cleanup()
+        # Vide les écritures différées avant de fermer (sinon snapshot / signatures perdus)
+        try:
+            await WRITE_BEHIND.drain()
+        except Exception as e:
+            print("⚠️ Write-behind drain error:", e)
+        try:
+            await close_memory_db()  # mode mémoire : dernière recopie sur disque
+        except Exception as e:
+            print("⚠️ DB persist error:", e)
+        await super().close()
+
+    async def on_app_command_completion(self, interaction: discord.Interaction, command) -> None:
+        _record_command(interaction, command.qualified_name, "ok")
+
     async def on_ready(self):
         print(f"✅ Connecté comme {self.user} — slash prêts. DB: {self.settings.DB_PATH}")
 
@@ -0,0 +1,76 @@
+# app/cache.py
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Dict, Hashable, List
+
+# Valeur renvoyée par get() quand la clé est absente (None reste une valeur cachable : « pas de donnée »)
+MISSING = object()
+
+# Tous les caches créés, pour le monitoring (cache_stats)
+_REGISTRY: List["LRUCache"] = []
+
+
+class LRUCache:
+    """Cache LRU borné, en mémoire du process, avec compteurs hit / miss / éviction."""
+
+    def __init__(self, name: str, maxsize: int = 1024):
+        self.name = name
+        self.maxsize = max(1, int(maxsize))
+        self._data: "OrderedDict[Hashable, object]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        _REGISTRY.append(self)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def resize(self, maxsize: int):
+        self.maxsize = max(1, int(maxsize))
+        self._evict()
+
+    def get(self, key: Hashable, default=MISSING):
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        self._evict()
+
+    def pop(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def _evict(self):
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, object]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": (self.hits / total) if total else 0.0,
+        }
+
+
+def cache_stats() -> Dict[str, Dict[str, object]]:
+    """Instantané de tous les caches (pour /dbstats, métriques…)."""
+    return {c.name: c.stats() for c in _REGISTRY}
@@ -0,0 +1,48 @@
+# app/codec.py
+from __future__ import annotations
+
+import json
+import struct
+import sys
+from array import array
+from typing import List, Optional, Sequence, Union
+
+# Encodage binaire compact des listes d'IDs Discord (snowflakes 64 bits) stockées en BLOB.
+# 1er octet = format ; entiers non signés 64 bits little-endian.
+#   0x01 : liste plate        -> [fmt][Q * n]
+# Les anciennes valeurs JSON (TEXT) restent lisibles : decode_ids retombe sur json.loads.
+
+FMT_IDS = 0x01
+
+_SWAP = sys.byteorder != "little"
+
+Blob = Union[bytes, bytearray, str, None]
+
+
+def _unpack(buf, typecode: str) -> array:
+    arr = array(typecode)
+    arr.frombytes(buf)
+    if _SWAP:
+        arr.byteswap()
+    return arr
+
+
+def encode_ids(ids: Sequence[int]) -> bytes:
+    """[id, ...] -> BLOB (format 0x01)."""
+    # struct.pack en un seul appel : plus rapide que array(...).tobytes() pour des int Python
+    return struct.pack(f"<B{len(ids)}Q", FMT_IDS, *ids)
+
+
+def decode_ids(value: Blob, default: Optional[list] = None) -> List[int]:
+    """BLOB 0x01 ou JSON texte -> list[int] ; `default` (ou []) si vide / illisible."""
+    if not value:
+        return [] if default is None else default
+    if isinstance(value, str):
+        try:
+            return [int(x) for x in json.loads(value)]
+        except Exception:
+            return [] if default is None else default
+    if value[0] != FMT_IDS:
+        raise ValueError(f"codec: format inattendu {value[0]:#x} (attendu {FMT_IDS:#x})")
+    return _unpack(value[1:], "Q").tolist()
+
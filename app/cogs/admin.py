@@ -1,15 +1,19 @@
 # app/cogs/admin.py
 import os, sys, asyncio, subprocess
-import csv
-import aiosqlite
+import io
+import json
 import tempfile
-import zipfile
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import Optional
 
 import discord
 from discord import app_commands
 from discord.ext import commands
 
+from ..db import backup_db, commit_export_watermarks, db_metrics, export_csv_zip, export_incremental
+from ..dbstats import reset_query_stats
+from ..profiling import PROFILER
+
 
 class AdminCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
@@ -23,6 +27,16 @@ class AdminCog(commands.Cog):
         member = inter.guild and inter.guild.get_member(inter.user.id)
         return bool(member and (member.guild_permissions.administrator or member.guild_permissions.manage_guild))
 
+    def _is_owner(self, inter: discord.Interaction) -> bool:
+        # Réservé à OWNER_ID : ce qui agit sur tout le process (tous les serveurs)
+        owner_id = self.bot.settings.OWNER_ID
+        return bool(owner_id and inter.user.id == owner_id)
+
+    @staticmethod
+    def _upload_limit(inter: discord.Interaction) -> int:
+        # Taille max d'une pièce jointe sur ce serveur (boosts compris) ; commandes d'envoi de fichier guild_only
+        return inter.guild.filesize_limit
+
     # ------ utilitaires ------
     @app_commands.command(name="whoami", description="Affiche ton User ID.")
     async def whoami(self, inter: discord.Interaction):
@@ -113,73 +127,287 @@ class AdminCog(commands.Cog):
                 os._exit(0)
 
     # ------ sauvegarde / export ------
-    @app_commands.command(name="backupdb", description="Télécharger la base SQLite (admin).")
-    async def backupdb(self, inter: discord.Interaction):
+    COMPRESSION_CHOICES = [
+        app_commands.Choice(name="gzip (rapide)", value="gzip"),
+        app_commands.Choice(name="xz (plus compact)", value="xz"),
+    ]
+
+    @app_commands.command(name="backupdb", description="Télécharger une sauvegarde cohérente de la base SQLite (admin).")
+    @app_commands.guild_only()
+    @app_commands.describe(compression="gzip (défaut) ou xz")
+    @app_commands.choices(compression=COMPRESSION_CHOICES)
+    async def backupdb(self, inter: discord.Interaction, compression: app_commands.Choice[str] = None):
         if not self._is_authorized(inter):
             await inter.response.send_message("⛔ Autorisation refusée.", ephemeral=True)
             return
+        await inter.response.defer(ephemeral=True, thinking=True)
         path = self.bot.settings.DB_PATH
-        try:
-            await inter.response.send_message(
-                content=f"📦 Sauvegarde de `{path.name}`",
-                file=discord.File(fp=str(path), filename=path.name),
-                ephemeral=True
-            )
-        except Exception as e:
-            await inter.response.send_message(f"❌ Impossible d'envoyer la BDD: {e}", ephemeral=True)
+        limit = self._upload_limit(inter)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            # Instantané via l'API backup de SQLite (thread dédié) : jamais de fichier à moitié écrit
+            try:
+                info = await backup_db(path, tmpdir, compression.value if compression else "gzip")
+            except Exception as e:
+                await inter.followup.send(f"❌ Sauvegarde impossible : {e}", ephemeral=True)
+                return
+            if info["size"] > limit:
+                await inter.followup.send(
+                    f"❌ Sauvegarde trop volumineuse pour Discord : {info['size'] / 1e6:.1f} Mo "
+                    f"(limite {limit / 1e6:.0f} Mo). Récupère `{path.name}` directement sur le serveur.",
+                    ephemeral=True
+                )
+                return
+            try:
+                await inter.followup.send(
+                    content=(f"📦 Sauvegarde de `{path.name}` — {info['raw_size'] / 1e6:.1f} Mo → "
+                             f"{info['size'] / 1e6:.1f} Mo en {info['seconds']:.1f}s"),
+                    file=discord.File(fp=str(info["path"]), filename=info["path"].name),
+                    ephemeral=True
+                )
+            except Exception as e:
+                await inter.followup.send(f"❌ Impossible d'envoyer la BDD: {e}", ephemeral=True)
 
     @app_commands.command(name="exportcsv", description="Exporter la base en CSV (un fichier par table, zippé).")
-    async def exportcsv(self, inter: discord.Interaction):
+    @app_commands.guild_only()
+    @app_commands.describe(
+        tables="Tables à exporter, séparées par des virgules (défaut : toutes)",
+        this_server="Uniquement les données de ce serveur",
+        since="Date de début incluse (AAAA-MM-JJ, UTC)",
+        until="Date de fin exclue (AAAA-MM-JJ, UTC)",
+    )
+    async def exportcsv(self, inter: discord.Interaction, tables: Optional[str] = None, this_server: bool = False,
+                        since: Optional[str] = None, until: Optional[str] = None):
         if not self._is_authorized(inter):
             await inter.response.send_message("⛔ Autorisation refusée.", ephemeral=True)
             return
 
-        db_path = self.bot.settings.DB_PATH
-
-        # Découverte dynamique des tables (hors tables internes SQLite)
-        async with aiosqlite.connect(db_path) as db:
-            tables = []
-            async with db.execute(
-                "SELECT name FROM sqlite_master "
-                "WHERE type='table' AND name NOT LIKE 'sqlite_%' "
-                "ORDER BY name"
-            ) as cur:
-                async for (name,) in cur:
-                    tables.append(name)
-
-        if not tables:
-            await inter.response.send_message("😕 Aucune table à exporter.", ephemeral=True)
-            return
+        def ts(day: Optional[str]) -> Optional[int]:
+            if not day:
+                return None
+            return int(datetime.strptime(day.strip(), "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp())
 
-        ts = datetime.utcnow().strftime("%Y-%m-%d_%H-%M-%S")
-        zip_filename = f"export-{ts}.zip"
+        try:
+            since_ts, until_ts = ts(since), ts(until)
+        except ValueError:
+            await inter.response.send_message("❌ Date invalide (format AAAA-MM-JJ).", ephemeral=True)
+            return
+        wanted = [t.strip() for t in tables.split(",") if t.strip()] if tables else None
 
-        # Ecrit des CSV temporaires dans /tmp puis zip
+        await inter.response.defer(ephemeral=True, thinking=True)
+        limit = self._upload_limit(inter)
+        # Lecture + écriture du zip en flux dans un thread : la boucle (gateway) n'est jamais bloquée
         with tempfile.TemporaryDirectory() as tmpdir:
-            async with aiosqlite.connect(db_path) as db:
-                for t in tables:
-                    csv_path = os.path.join(tmpdir, f"{t}.csv")
-                    async with db.execute(f"SELECT * FROM {t}") as cur:
-                        cols = [c[0] for c in cur.description]
-                        with open(csv_path, "w", newline="", encoding="utf-8") as f:
-                            writer = csv.writer(f)
-                            writer.writerow(cols)
-                            async for row in cur:
-                                writer.writerow(row)
-
-            zip_path = os.path.join(tmpdir, zip_filename)
-            with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as z:
-                for t in tables:
-                    z.write(os.path.join(tmpdir, f"{t}.csv"), arcname=f"{t}.csv")
+            try:
+                info = await export_csv_zip(
+                    self.bot.settings.DB_PATH, tmpdir, tables=wanted,
+                    guild_id=inter.guild.id if this_server else None, since=since_ts, until=until_ts,
+                )
+            except Exception as e:
+                await inter.followup.send(f"❌ Échec de l'export CSV : {e}", ephemeral=True)
+                return
+            if not info["tables"]:
+                await inter.followup.send("😕 Aucune table à exporter.", ephemeral=True)
+                return
+            if info["size"] > limit:
+                await inter.followup.send(
+                    f"❌ Export trop volumineux pour Discord : {info['size'] / 1e6:.1f} Mo "
+                    f"(limite {limit / 1e6:.0f} Mo). Restreins `tables`, `this_server` ou la période.",
+                    ephemeral=True
+                )
+                return
+            try:
+                await inter.followup.send(
+                    content=(f"🗂️ Export CSV ({len(info['tables'])} tables, {sum(info['tables'].values())} lignes) "
+                             f"— `{info['path'].name}`"),
+                    file=discord.File(fp=str(info["path"]), filename=info["path"].name),
+                    ephemeral=True
+                )
+            except Exception as e:
+                await inter.followup.send(f"❌ Échec de l'export CSV : {e}", ephemeral=True)
+
+    FORMAT_CHOICES = [
+        app_commands.Choice(name="JSONL", value="jsonl"),
+        app_commands.Choice(name="CSV", value="csv"),
+    ]
 
+    @app_commands.command(name="exportdelta", description="Export incrémental : seulement ce qui est nouveau depuis le dernier export.")
+    @app_commands.guild_only()
+    @app_commands.describe(fmt="jsonl (défaut) ou csv", full="Tout réexporter (réinitialise les filigranes)")
+    @app_commands.choices(fmt=FORMAT_CHOICES)
+    async def exportdelta(self, inter: discord.Interaction, fmt: Optional[app_commands.Choice[str]] = None, full: bool = False):
+        if not self._is_authorized(inter):
+            await inter.response.send_message("⛔ Autorisation refusée.", ephemeral=True)
+            return
+        await inter.response.defer(ephemeral=True, thinking=True)
+        limit = self._upload_limit(inter)
+        with tempfile.TemporaryDirectory() as tmpdir:
             try:
-                await inter.response.send_message(
-                    content=f"🗂️ Export CSV ({len(tables)} tables) — `{zip_filename}`",
-                    file=discord.File(fp=zip_path, filename=zip_filename),
+                info = await export_incremental(self.bot.settings.DB_PATH, tmpdir, fmt.value if fmt else "jsonl", full=full)
+            except Exception as e:
+                await inter.followup.send(f"❌ Échec de l'export incrémental : {e}", ephemeral=True)
+                return
+            if info["size"] > limit:
+                await inter.followup.send(
+                    f"❌ Export trop volumineux pour Discord : {info['size'] / 1e6:.1f} Mo "
+                    f"(limite {limit / 1e6:.0f} Mo). Filigranes inchangés.",
+                    ephemeral=True
+                )
+                return
+            new_rows = {t: n for t, n in info["tables"].items() if n}
+            try:
+                await inter.followup.send(
+                    content=(f"📈 Export incrémental — {sum(new_rows.values())} lignes "
+                             f"({', '.join(f'{t}: {n}' for t, n in new_rows.items()) or 'rien de neuf'}) "
+                             f"— `{info['path'].name}`"),
+                    file=discord.File(fp=str(info["path"]), filename=info["path"].name),
                     ephemeral=True
                 )
             except Exception as e:
-                await inter.response.send_message(f"❌ Échec de l'export CSV : {e}", ephemeral=True)
+                await inter.followup.send(f"❌ Échec de l'export incrémental : {e} (filigranes inchangés)", ephemeral=True)
+                return
+        # Archive livrée : le prochain export repartira d'ici
+        await commit_export_watermarks(self.bot.settings.DB_PATH, info["marks"])
+
+    @app_commands.command(name="dbstats", description="Statistiques DB : temps par fonction, requêtes lentes, verrous, caches (admin).")
+    @app_commands.describe(
+        as_json="Joindre l'instantané complet (JSON)",
+        reset="Remettre à zéro les compteurs de temps après affichage",
+    )
+    async def dbstats(self, inter: discord.Interaction, as_json: bool = False, reset: bool = False):
+        if not self._is_authorized(inter):
+            await inter.response.send_message("⛔ Autorisation refusée.", ephemeral=True)
+            return
+        m = db_metrics()
+        q = m["queries"]
+
+        def clip(lines: list[str]) -> str:
+            # limite Discord : 1024 caractères par champ d'embed
+            out, size = [], 0
+            for line in lines:
+                if size + len(line) + 1 > 1000:
+                    out.append("…")
+                    break
+                out.append(line)
+                size += len(line) + 1
+            return "\n".join(out) or "—"
+
+        emb = discord.Embed(
+            title="📊 Statistiques DB (depuis le démarrage)",
+            description=(f"{q['statements']} requêtes SQL, {q['statements_total_ms'] / 1000:.2f}s cumulées — "
+                         f"{q['slow']} lente(s) (> {q['slow_ms']:.0f} ms)"),
+            color=discord.Color.blurple(),
+        )
+        emb.add_field(name="⏱️ Fonctions (temps total)", value=clip([
+            f"`{f['name']}` ×{f['calls']} — moy {f['avg_ms']:.1f} / p95 {f['p95_ms']:.1f} / "
+            f"p99 {f['p99_ms']:.1f} / max {f['max_ms']:.0f} ms · {f['rows']} lignes"
+            + (f" · ⚠️ {f['errors']} err." if f["errors"] else "")
+            for f in q["functions"][:12]
+        ]), inline=False)
+        emb.add_field(name="🐢 Requêtes lentes (dernières)", value=clip([
+            f"{e['ms']:.0f} ms `{e['fn'] or '?'}` — `{e['sql'][:120]}`"
+            for e in reversed(q["slow_log"][-5:])
+        ]), inline=False)
+        emb.add_field(name="🔒 Verrous", value=clip([
+            f"`{r}` {st['acquired']} acquis, {st['contended']} en attente, max {st['wait_max_s'] * 1000:.0f} ms"
+            for r, st in m["locks"]["resources"].items()
+        ]), inline=False)
+        emb.add_field(name="🧠 Caches", value=clip([
+            f"`{name}` {c['size']}/{c['maxsize']} — hit {c['hit_ratio']:.0%}"
+            for name, c in m["caches"].items()
+        ]), inline=True)
+        wb = m["write_behind"]
+        emb.add_field(name="✍️ Write-behind", value=(
+            f"{wb['written']} écrites, {wb['coalesced']} fusionnées, {wb['failed']} échecs, {wb['pending']} en attente"
+        ), inline=True)
+        if m["memory_db"]:
+            mem = m["memory_db"]
+            emb.add_field(name="💾 Mode mémoire", value=(
+                f"{mem['persists']} recopies, dernière {mem['last_persist_ms']:.0f} ms"
+            ), inline=True)
+
+        files = []
+        if as_json:
+            data = json.dumps(m, ensure_ascii=False, indent=1).encode("utf-8")
+            stamp = datetime.now(timezone.utc).strftime("%Y-%m-%d_%H-%M-%S")
+            files.append(discord.File(fp=io.BytesIO(data), filename=f"dbstats-{stamp}.json"))
+        if reset:
+            reset_query_stats()
+            emb.set_footer(text="Compteurs de temps remis à zéro.")
+        await inter.response.send_message(embed=emb, files=files, ephemeral=True)
+
+    # ------ profilage à la demande (owner) ------
+    PROFILE_ACTIONS = [
+        app_commands.Choice(name="start", value="start"),
+        app_commands.Choice(name="snapshot (rapport, la collecte continue)", value="snapshot"),
+        app_commands.Choice(name="stop", value="stop"),
+    ]
+    PROFILE_MODES = [
+        app_commands.Choice(name="cpu (cProfile)", value="cpu"),
+        app_commands.Choice(name="mémoire (tracemalloc)", value="memory"),
+    ]
+    PROFILE_SORTS = [
+        app_commands.Choice(name="temps cumulé", value="cumulative"),
+        app_commands.Choice(name="temps propre", value="tottime"),
+        app_commands.Choice(name="nombre d'appels", value="ncalls"),
+    ]
+
+    @app_commands.command(name="profile", description="Profiler le bot en production : cProfile ou tracemalloc (owner).")
+    @app_commands.describe(
+        action="start / snapshot / stop",
+        mode="start : cpu (défaut) ou mémoire",
+        command="start cpu : ne profiler que cette commande slash (ex. teamroll)",
+        seconds="start : fin automatique de la collecte après N secondes (0 = jusqu'à stop)",
+        sort="Tri du rapport CPU (défaut : temps cumulé)",
+        top="Nombre de lignes du rapport",
+        as_pstats="Joindre aussi le fichier .pstats (snakeviz, python -m pstats…)",
+    )
+    @app_commands.choices(action=PROFILE_ACTIONS, mode=PROFILE_MODES, sort=PROFILE_SORTS)
+    async def profile(
+        self,
+        inter: discord.Interaction,
+        action: app_commands.Choice[str],
+        mode: Optional[app_commands.Choice[str]] = None,
+        command: Optional[str] = None,
+        seconds: app_commands.Range[int, 0, 14400] = 0,
+        sort: Optional[app_commands.Choice[str]] = None,
+        top: app_commands.Range[int, 5, 200] = 40,
+        as_pstats: bool = False,
+    ):
+        if not self._is_owner(inter):
+            await inter.response.send_message("⛔ Réservé au propriétaire du bot (OWNER_ID).", ephemeral=True)
+            return
+        if action.value == "start":
+            kind = mode.value if mode else "cpu"
+            try:
+                PROFILER.start(kind, command=command, seconds=seconds)
+            except (RuntimeError, ValueError) as e:
+                await inter.response.send_message(f"⚠️ {e}", ephemeral=True)
+                return
+            scope = f"pendant `/{PROFILER.command}`" if PROFILER.command else "sur tout le process"
+            window = f", arrêt de la collecte dans {seconds}s" if seconds else ""
+            await inter.response.send_message(
+                f"🔬 Profil {kind} démarré {scope}{window}. `/profile snapshot` ou `/profile stop` pour le rapport.",
+                ephemeral=True,
+            )
+            return
+
+        await inter.response.defer(ephemeral=True, thinking=True)
+        kind = PROFILER.mode
+        try:
+            if action.value == "stop":
+                text, raw = await PROFILER.stop(top=top, sort=sort.value if sort else "cumulative")
+            else:
+                text, raw = await PROFILER.snapshot(top=top, sort=sort.value if sort else "cumulative")
+        except RuntimeError as e:
+            await inter.followup.send(f"⚠️ {e}", ephemeral=True)
+            return
+
+        stamp = datetime.now(timezone.utc).strftime("%Y-%m-%d_%H-%M-%S")
+        files = [discord.File(fp=io.BytesIO(text.encode("utf-8")), filename=f"profile-{kind}-{stamp}.txt")]
+        if as_pstats and raw is not None:
+            files.append(discord.File(fp=io.BytesIO(raw), filename=f"profile-{stamp}.pstats"))
+        preview = text if len(text) <= 1800 else text[:1800] + "\n…"
+        await inter.followup.send(f"```text\n{preview}```", files=files, ephemeral=True)
 
 
 async def setup(bot: commands.Bot):
@@ -1,6 +1,6 @@
 # app/cogs/arena.py
 from __future__ import annotations
-from typing import List, Dict, Optional
+from typing import List, Mapping, Optional, Sequence
 from datetime import datetime
 import random
 import discord
@@ -8,12 +8,13 @@ from discord import app_commands
 from discord.ext import commands
 from pathlib import Path
 from ..team_logic import parse_mentions
+from ..locks import guild_lock
 from ..voice import create_and_move_voice  # ← voix centralisée (crée/réutilise, lobby, pin on top)
 from ..db import (
     get_team_last, set_team_last,
-    arena_get_active, arena_create, arena_update_scores_and_advance,
-    arena_get_by_id, arena_set_state, arena_mark_results, ensure_arena_schema
+    arena_get_active, arena_create, arena_get_by_id, arena_set_state, arena_mark_results
 )
+from ..records import Arena
 
 def is_admin_or_owner(bot: commands.Bot, inter: discord.Interaction) -> bool:
     s = bot.settings
@@ -206,18 +207,44 @@ class ArenaCog(commands.Cog):
     # ======================================================================
     async def _process_report(self, inter: discord.Interaction, placements: str) -> bool:
         guild = inter.guild
-        arena = guild and await arena_get_active(self.bot.settings.DB_PATH, guild.id)
-        if not arena or arena["state"] != "running":
+        if not guild:
             await inter.followup.send("ℹ️ Aucun tournoi Arena en cours.", ephemeral=True)
             return False
 
-        cur_round = arena["current_round"]
-        schedule = arena["schedule"]
-        if cur_round < 1 or cur_round > len(schedule):
-            await inter.followup.send("❌ Plus de round à jouer.", ephemeral=True)
+        # Un seul report à la fois par serveur : les modals soumis en même temps passent l'un après l'autre,
+        # chacun relisant le round courant mis à jour par le précédent. Sous le verrou : lecture, validation
+        # et écriture uniquement ; les messages (followup, embeds, GIF du podium) partent après.
+        arena2 = None
+        async with guild_lock(guild.id, "arena"):
+            arena = await arena_get_active(self.bot.settings.DB_PATH, guild.id)
+            if not arena or arena.state != "running":
+                error = "ℹ️ Aucun tournoi Arena en cours."
+            else:
+                results, error = self._parse_report(guild, arena, placements)
+                if results is not None:
+                    # ➜ Flux “report partiel” : on ne marque que les duos saisis, n’avance que si le round est complet
+                    arena2 = await arena_mark_results(
+                        self.bot.settings.DB_PATH,
+                        arena.id,
+                        arena.current_round,
+                        results,
+                    )
+
+        if arena2 is None:
+            await inter.followup.send(error, ephemeral=True)
             return False
+        await self._announce_report(inter, arena, arena2)
+        return True
 
-        expected_pairs = schedule[cur_round - 1]  # [[u1,u2], ...] (Duo 1..N)
+    def _parse_report(self, guild: discord.Guild, arena: Arena,
+                      placements: str) -> tuple[Optional[dict[tuple[int, int], tuple[int, int]]], Optional[str]]:
+        """Valide la saisie contre le round courant : (résultats, None) ou (None, message d'erreur)."""
+        cur_round = arena.current_round
+        schedule = arena.schedule
+        if cur_round < 1 or cur_round > len(schedule):
+            return None, "❌ Plus de round à jouer."
+
+        expected_pairs = schedule[cur_round - 1]  # ((u1,u2), ...) (Duo 1..N)
         expected_set = {tuple(sorted(p)) for p in expected_pairs}
         duo_count = len(expected_pairs)
 
@@ -236,30 +263,25 @@ class ArenaCog(commands.Cog):
 
         chunks = [c.strip() for c in (placements or "").split("|") if c.strip()]
         if not chunks:
-            await inter.followup.send("❌ Saisie vide. Ex: `#1:1 | 3:6 | @A @B:7`.", ephemeral=True)
-            return False
+            return None, "❌ Saisie vide. Ex: `#1:1 | 3:6 | @A @B:7`."
 
         used_ranks: set[int] = set()
         used_pairs: set[tuple[int, int]] = set()
-        new_scores: dict[int, int] = {}
+        results: dict[tuple[int, int], tuple[int, int]] = {}
 
         for ch in chunks:
             if ":" not in ch:
-                await inter.followup.send(f"❌ Il manque le ':top' dans « {ch} » (ex.: ':1').", ephemeral=True)
-                return False
+                return None, f"❌ Il manque le ':top' dans « {ch} » (ex.: ':1')."
             left, right = ch.rsplit(":", 1)
             left = left.strip()
             try:
                 rank = int(right.strip())
             except ValueError:
-                await inter.followup.send(f"❌ Top invalide dans « {ch} » (attendu 1..8).", ephemeral=True)
-                return False
+                return None, f"❌ Top invalide dans « {ch} » (attendu 1..8)."
             if rank < 1 or rank > 8:
-                await inter.followup.send(f"❌ Top hors borne dans « {ch} » (1..8).", ephemeral=True)
-                return False
+                return None, f"❌ Top hors borne dans « {ch} » (1..8)."
             if rank in used_ranks:
-                await inter.followup.send(f"❌ Le top {rank} est déjà attribué dans ta saisie.", ephemeral=True)
-                return False
+                return None, f"❌ Le top {rank} est déjà attribué dans ta saisie."
 
             # 1) Essayer un index de duo (#1, 1, d2, duo3)
             idx = _parse_duo_index(left)
@@ -272,67 +294,52 @@ class ArenaCog(commands.Cog):
                 ms = parse_mentions(guild, left)
                 ms = [m for m in ms if not m.bot]
                 if len(ms) != 2:
-                    await inter.followup.send(f"❌ Impossible de lire un duo dans: « {ch} »", ephemeral=True)
-                    return False
+                    return None, f"❌ Impossible de lire un duo dans: « {ch} »"
                 a, b = sorted([ms[0].id, ms[1].id])
                 pair = (a, b)
                 if pair not in expected_set:
-                    await inter.followup.send(f"❌ Ce duo n'est pas prévu au round courant: « {ch} »", ephemeral=True)
-                    return False
+                    return None, f"❌ Ce duo n'est pas prévu au round courant: « {ch} »"
 
             if pair in used_pairs:
-                await inter.followup.send("❌ Duo répété dans ta saisie (index/mentions en double).", ephemeral=True)
-                return False
+                return None, "❌ Duo répété dans ta saisie (index/mentions en double)."
 
             used_ranks.add(rank)
             used_pairs.add(pair)
 
-            pts = points_for_rank(rank)  # 1→8 pts pour chacun
-            a, b = pair
-            new_scores[a] = new_scores.get(a, 0) + pts
-            new_scores[b] = new_scores.get(b, 0) + pts
+            results[pair] = (rank, points_for_rank(rank))  # 1→8 pts pour chacun
 
-        # ➜ Nouveau flux “report partiel” : n’avance que si le round est complet
-        reported_pairs = [(a, b) for (a, b) in used_pairs]  # on marque seulement les duos saisis
-
-        arena2 = await arena_mark_results(
-            self.bot.settings.DB_PATH,
-            arena["id"],
-            cur_round,
-            new_scores,
-            reported_pairs,
-        )
+        return results, None
 
+    async def _announce_report(self, inter: discord.Interaction, arena: Arena, arena2: Arena) -> None:
+        """Messages d'après report (hors verrou) : confirmation, scores, puis round suivant / podium / attente."""
         await inter.followup.send("✅ Résultat enregistré.", ephemeral=True)
-        await self._post_scores_embed(inter.channel, arena2["participants"], arena2["scores"])
+        await self._post_scores_embed(inter.channel, arena2.participants, arena2.scores)
 
         # passage au round suivant uniquement si l'actuel est désormais complet
-        if arena2["state"] == "running" and arena2["current_round"] != arena["current_round"]:
+        if arena2.state == "running" and arena2.current_round != arena.current_round:
             lookup = {m.id: m for m in inter.guild.members}
-            members = [lookup[i] for i in arena2["participants"] if i in lookup]
+            members = [lookup[i] for i in arena2.participants if i in lookup]
             await self._post_round_embed(
-                inter.channel, members, arena2["schedule"], current_round=arena2["current_round"]
+                inter.channel, members, arena2.schedule, current_round=arena2.current_round
             )
-        elif arena2["state"] == "finished":
-            await self._post_podium_embed(inter.channel, arena2["participants"], arena2["scores"])
+        elif arena2.state == "finished":
+            await self._post_podium_embed(inter.channel, arena2.participants, arena2.scores)
         else:
             # round non-complet : indiquer ce qu'il manque (optionnel mais utile)
-            expected_pairs = arena2["schedule"][arena["current_round"] - 1]
+            expected_pairs = arena2.schedule[arena.current_round - 1]
             expected = {tuple(sorted(p)) for p in expected_pairs}
             have = set(
                 tuple(map(int, k.split("-")))
-                for k in arena2.get("reported", {}).get(str(arena["current_round"]), [])
+                for k in arena2.reported.get(str(arena.current_round), ())
             )
             missing = expected - have
             if missing:
                 lines = [f"· duo <@{a}> & <@{b}>" for (a, b) in sorted(list(missing))]
                 await inter.channel.send(
-                    f"⏳ En attente de résultats pour {len(missing)} duo(x) du round {arena['current_round']}:\n"
+                    f"⏳ En attente de résultats pour {len(missing)} duo(x) du round {arena.current_round}:\n"
                     + "\n".join(lines)
                 )
 
-        return True
-
     # ======================================================================
     # Commandes
     # ======================================================================
@@ -351,43 +358,44 @@ class ArenaCog(commands.Cog):
         if not guild:
             await inter.followup.send("❌ À utiliser sur un serveur.", ephemeral=True); return
 
-        # Récup participants
-        selected: List[discord.Member] = []
-        if members.strip():
-            selected = parse_mentions(guild, members)
-        else:
-            snap = await get_team_last(self.bot.settings.DB_PATH, guild.id)
-            if snap and snap.get("teams"):
-                lookup = {m.id: m for m in guild.members}
-                ids = [int(uid) for team_ids in snap["teams"] for uid in team_ids]
-                selected = [lookup[i] for i in ids if i in lookup and not lookup[i].bot]
-            if not selected:
-                me = guild.get_member(inter.user.id)
-                if me and me.voice and me.voice.channel:
-                    selected = [m for m in me.voice.channel.members if not m.bot]
-
-        if len(selected) < 4 or len(selected) % 2 != 0:
-            await inter.followup.send("❌ Il faut un nombre **pair** de joueurs (min 4).", ephemeral=True); return
-        if len(selected) > 16:
-            await inter.followup.send("❌ Maximum 16 joueurs (8 duos).", ephemeral=True); return
-
-        user_ids = [m.id for m in selected]
-        schedule_full = round_robin_duos(user_ids)  # n-1 rounds
-        full_rounds = len(schedule_full)
-
-        if not rounds or rounds <= 0 or rounds > full_rounds:
-            rounds = full_rounds  # par défaut n-1
-
-        schedule = schedule_full[:rounds]
-        arena_id = await arena_create(
-            self.bot.settings.DB_PATH,
-            guild.id, inter.user.id, rounds, user_ids, schedule
-        )
+        async with guild_lock(guild.id, "arena"):
+            # Récup participants
+            selected: List[discord.Member] = []
+            if members.strip():
+                selected = parse_mentions(guild, members)
+            else:
+                snap = await get_team_last(self.bot.settings.DB_PATH, guild.id)
+                if snap and snap.get("teams"):
+                    lookup = {m.id: m for m in guild.members}
+                    ids = [int(uid) for team_ids in snap["teams"] for uid in team_ids]
+                    selected = [lookup[i] for i in ids if i in lookup and not lookup[i].bot]
+                if not selected:
+                    me = guild.get_member(inter.user.id)
+                    if me and me.voice and me.voice.channel:
+                        selected = [m for m in me.voice.channel.members if not m.bot]
+
+            if len(selected) < 4 or len(selected) % 2 != 0:
+                await inter.followup.send("❌ Il faut un nombre **pair** de joueurs (min 4).", ephemeral=True); return
+            if len(selected) > 16:
+                await inter.followup.send("❌ Maximum 16 joueurs (8 duos).", ephemeral=True); return
+
+            user_ids = [m.id for m in selected]
+            schedule_full = round_robin_duos(user_ids)  # n-1 rounds
+            full_rounds = len(schedule_full)
+
+            if not rounds or rounds <= 0 or rounds > full_rounds:
+                rounds = full_rounds  # par défaut n-1
+
+            schedule = schedule_full[:rounds]
+            arena_id = await arena_create(
+                self.bot.settings.DB_PATH,
+                guild.id, inter.user.id, rounds, user_ids, schedule
+            )
 
-        await inter.followup.send(
-            f"✅ Tournoi Arena lancé (id `{arena_id}`) — **{len(selected)}** joueurs, **{rounds}** rounds.",
-            ephemeral=True
-        )
+            await inter.followup.send(
+                f"✅ Tournoi Arena lancé (id `{arena_id}`) — **{len(selected)}** joueurs, **{rounds}** rounds.",
+                ephemeral=True
+            )
         await self._post_round_embed(inter.channel, selected, schedule, current_round=1)
         await self._post_scores_embed(inter.channel, user_ids, {})  # scores 0 au départ
 
@@ -396,14 +404,14 @@ class ArenaCog(commands.Cog):
         await inter.response.defer(ephemeral=True, thinking=True)
         guild = inter.guild
         arena = guild and await arena_get_active(self.bot.settings.DB_PATH, guild.id)
-        if not arena or arena["state"] != "running":
+        if not arena or arena.state != "running":
             await inter.followup.send("ℹ️ Aucun tournoi Arena en cours.", ephemeral=True); return
 
-        ids = arena["participants"]
+        ids = arena.participants
         lookup = {m.id: m for m in inter.guild.members}
         members = [lookup[i] for i in ids if i in lookup]
         await inter.followup.send("📣 Round courant affiché dans le salon.", ephemeral=True)
-        await self._post_round_embed(inter.channel, members, arena["schedule"], current_round=arena["current_round"])
+        await self._post_round_embed(inter.channel, members, arena.schedule, current_round=arena.current_round)
 
     @group.command(name="status", description="Afficher le classement et l'état du tournoi Arena.")
     async def status(self, inter: discord.Interaction):
@@ -412,11 +420,11 @@ class ArenaCog(commands.Cog):
         arena = guild and await arena_get_active(self.bot.settings.DB_PATH, guild.id)
         if not arena:
             await inter.followup.send("ℹ️ Aucun tournoi Arena actif.", ephemeral=True); return
-        ids = arena["participants"]
+        ids = arena.participants
         await inter.followup.send("📊 Statut posté.", ephemeral=True)
         await self._post_scores_embed(
-            inter.channel, ids, arena["scores"],
-            title_suffix=f"(Round {min(arena['current_round'], arena['rounds_total'])}/{arena['rounds_total']}, état: {arena['state']})"
+            inter.channel, ids, arena.scores,
+            title_suffix=f"(Round {min(arena.current_round, arena.rounds_total)}/{arena.rounds_total}, état: {arena.state})"
         )
 
     @group.command(
@@ -439,13 +447,16 @@ class ArenaCog(commands.Cog):
             await inter.followup.send("⛔ Réservé aux admins/owner.", ephemeral=True); return
 
         guild = inter.guild
-        arena = guild and await arena_get_active(self.bot.settings.DB_PATH, guild.id)
-        if not arena:
-            await inter.followup.send("ℹ️ Aucun tournoi Arena actif.", ephemeral=True); return
+        if not guild:
+            await inter.followup.send("❌ À utiliser sur un serveur.", ephemeral=True); return
+        async with guild_lock(guild.id, "arena"):
+            arena = await arena_get_active(self.bot.settings.DB_PATH, guild.id)
+            if not arena:
+                await inter.followup.send("ℹ️ Aucun tournoi Arena actif.", ephemeral=True); return
+            await arena_set_state(self.bot.settings.DB_PATH, arena.id, "finished")
 
-        await arena_set_state(self.bot.settings.DB_PATH, arena["id"], "finished")
         await inter.followup.send("🏁 Tournoi arrêté. Podium affiché dans le salon.", ephemeral=True)
-        await self._post_podium_embed(inter.channel, arena["participants"], arena["scores"])
+        await self._post_podium_embed(inter.channel, arena.participants, arena.scores)
 
     @group.command(name="cancel", description="Annuler (supprimer) le tournoi Arena en cours.")
     async def cancel(self, inter: discord.Interaction):
@@ -453,17 +464,20 @@ class ArenaCog(commands.Cog):
         if not is_admin_or_owner(self.bot, inter):
             await inter.followup.send("⛔ Réservé aux admins/owner.", ephemeral=True); return
         guild = inter.guild
-        arena = guild and await arena_get_active(self.bot.settings.DB_PATH, guild.id)
-        if not arena:
-            await inter.followup.send("ℹ️ Aucun tournoi Arena actif.", ephemeral=True); return
-        await arena_set_state(self.bot.settings.DB_PATH, arena["id"], "cancelled")
+        if not guild:
+            await inter.followup.send("❌ À utiliser sur un serveur.", ephemeral=True); return
+        async with guild_lock(guild.id, "arena"):
+            arena = await arena_get_active(self.bot.settings.DB_PATH, guild.id)
+            if not arena:
+                await inter.followup.send("ℹ️ Aucun tournoi Arena actif.", ephemeral=True); return
+            await arena_set_state(self.bot.settings.DB_PATH, arena.id, "cancelled")
         await inter.followup.send("🛑 Tournoi Arena annulé.", ephemeral=True)
 
     # ======================================================================
     # Rendu embeds
     # ======================================================================
     async def _post_round_embed(self, channel: discord.abc.Messageable, members: List[discord.Member],
-                                schedule: List[List[List[int]]], current_round: int):
+                                schedule: Sequence[Sequence[Sequence[int]]], current_round: int):
         lookup = {m.id: m for m in members}
         pairs = schedule[current_round - 1]
         lines = []
@@ -489,7 +503,7 @@ class ArenaCog(commands.Cog):
             }
             guild_id = members[0].guild.id if members else None
             if guild_id:
-                await set_team_last(self.bot.settings.DB_PATH, guild_id, snapshot)
+                await set_team_last(self.bot.settings.DB_PATH, guild_id, snapshot, defer=True)
         except Exception:
             pass
 
@@ -497,8 +511,8 @@ class ArenaCog(commands.Cog):
         view = self.ReportView(self, guild=the_guild, round_pairs=pairs)
         await channel.send(embed=emb, view=view)
 
-    async def _post_scores_embed(self, channel: discord.abc.Messageable, participants: List[int],
-                                 scores: Dict[str, int], title_suffix: str = ""):
+    async def _post_scores_embed(self, channel: discord.abc.Messageable, participants: Sequence[int],
+                                 scores: Mapping[int, int], title_suffix: str = ""):
         norm = {int(k): int(v) for k, v in (scores or {}).items()}
         rows = sorted([(uid, norm.get(uid, 0)) for uid in participants], key=lambda x: (-x[1], x[0]))
         emb = discord.Embed(title=f"📊 Arena — Classement {title_suffix}".strip(), color=discord.Color.gold())
@@ -509,8 +523,8 @@ class ArenaCog(commands.Cog):
         await channel.send(embed=emb)
 
 
-    async def _post_podium_embed(self, channel: discord.abc.Messageable, participants: list[int],
-                                scores: dict[str, int]):
+    async def _post_podium_embed(self, channel: discord.abc.Messageable, participants: Sequence[int],
+                                scores: Mapping[int, int]):
         MAX_BYTES = 7_500_000  # ~7.5 MB pour rester sous la limite standard (~8MB)
         norm = {int(k): int(v) for k, v in (scores or {}).items()}
         rows = sorted([(uid, norm.get(uid, 0)) for uid in participants], key=lambda x: (-x[1], x[0]))
@@ -588,7 +602,6 @@ class ArenaCog(commands.Cog):
 
 async def setup(bot: commands.Bot):
     cog = ArenaCog(bot)
-    await ensure_arena_schema(bot.settings.DB_PATH)
     await bot.add_cog(cog)
     # Pour rendre la view persistante après reboot, il faudrait une ReportView tolérante à guild=None/round_pairs=[],
     # puis enregistrer ici une instance "globale" :
@@ -188,6 +188,9 @@ HELP_SECTIONS = {
         {"name": "/resyncglobal", "desc": "Resynchronise les **commandes globales**."},
         {"name": "/backupdb", "desc": "Sauvegarde la base de données."},
         {"name": "/exportcsv", "desc": "Export CSV (ratings, participants, etc. selon implémentation)."},
+        {"name": "/exportdelta", "desc": "Export **incrémental** (JSONL/CSV) : uniquement le nouveau depuis le dernier export."},
+        {"name": "/dbstats", "desc": "Temps DB par fonction (p50/p95/p99), requêtes lentes, verrous, caches."},
+        {"name": "/profile", "desc": "Profilage à la demande (owner) : cProfile ou tracemalloc, rapport trié ou `.pstats`."},
         {"name": "/restart", "desc": "Redémarre le bot (la plateforme relance le process)."},
         {"name": "/shutdown", "desc": "Arrête le bot (owner/admin)."},
     ],
@@ -295,6 +298,9 @@ COMMAND_DETAILS = {
     "resyncglobal": {"title": "ℹ️ /resyncglobal", "desc": "Resynchronise les commandes **globales**."},
     "backupdb": {"title": "ℹ️ /backupdb", "desc": "Sauvegarde la BDD."},
     "exportcsv": {"title": "ℹ️ /exportcsv", "desc": "Export CSV."},
+    "exportdelta": {"title": "ℹ️ /exportdelta", "desc": "Export incrémental (filigranes par table). `full:true` pour tout réexporter."},
+    "dbstats": {"title": "ℹ️ /dbstats", "desc": "Statistiques DB depuis le démarrage. `as_json:true` joint l'instantané complet, `reset:true` remet à zéro."},
+    "profile": {"title": "ℹ️ /profile", "desc": "Owner uniquement. `action:start` (mode cpu/mémoire, `command:` pour ne profiler qu'une commande, `seconds:` pour une fenêtre), `snapshot` pour un rapport intermédiaire, `stop` pour le rapport final (`as_pstats:true` joint le fichier .pstats)."},
     "restart": {"title": "ℹ️ /restart", "desc": "Redémarre le bot."},
     "shutdown": {"title": "ℹ️ /shutdown", "desc": "Arrête le bot."},
 }
@@ -356,7 +362,7 @@ class HelpCog(commands.Cog):
             )
             embed.add_field(
                 name="🛠️ Admin",
-                value="`/whoami`  `/resync`  `/resyncglobal`  `/backupdb`  `/exportcsv`  `/restart`  `/shutdown`",
+                value="`/whoami`  `/resync`  `/resyncglobal`  `/backupdb`  `/exportcsv`  `/exportdelta`  `/dbstats`  `/profile`  `/restart`  `/shutdown`",
                 inline=False
             )
             embed.set_footer(text="Astuce: `/help command:arena report` pour l’aide d’une sous-commande.")
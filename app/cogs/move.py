@@ -5,7 +5,7 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 
-from ..db import get_team_last
+from ..db import get_team_last_versioned
 from ..voice import create_and_move_voice
 
 
@@ -31,7 +31,7 @@ class MoveCog(commands.Cog):
             await inter.followup.send("❌ À utiliser en serveur.", ephemeral=True)
             return
 
-        snap = await get_team_last(self.bot.settings.DB_PATH, guild.id)
+        version, snap = await get_team_last_versioned(self.bot.settings.DB_PATH, guild.id)
         if not snap or not snap.get("teams"):
             await inter.followup.send("ℹ️ Aucune config enregistrée. Lance d'abord `/team`, `/teamroll` ou un round d'`/arena`.", ephemeral=True)
             return
@@ -54,7 +54,7 @@ class MoveCog(commands.Cog):
                 sizes,
                 ttl_minutes=max(int(channel_ttl), 1),
             )
-            await inter.followup.send("🚀 Salons créés/réutilisés et joueurs déplacés.", ephemeral=True)
+            await inter.followup.send(f"🚀 Salons créés/réutilisés et joueurs déplacés (config v{version}).", ephemeral=True)
         except discord.Forbidden:
             await inter.followup.send("⚠️ Permissions manquantes (Manage Channels / Move Members).", ephemeral=True)
 
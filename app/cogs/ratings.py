@@ -26,7 +26,7 @@ class RatingsCog(commands.Cog):
     async def setrank(self, inter: discord.Interaction, user: discord.Member, tier: app_commands.Choice[str], division: Optional[app_commands.Choice[str]], lp: int = 0):
         r = rank_to_rating(tier.value, division.value if division else None, lp)
         await set_rating(self.bot.settings.DB_PATH, user.id, r)
-        await set_lol_rank(self.bot.settings.DB_PATH, user.id, source="offline", tier=tier.value, division=(division.value if division else None), lp=lp)
+        await set_lol_rank(self.bot.settings.DB_PATH, user.id, source="offline", tier=tier.value, division=(division.value if division else None), lp=lp, defer=True)
         div_txt = division.value if division else "-"
         await inter.response.send_message(f"✅ Rang défini pour **{user.display_name}** → {tier.name} {div_txt} {lp} LP → rating **{int(r)}**.", ephemeral=True)
 
@@ -124,7 +124,7 @@ class RatingsCog(commands.Cog):
 
         tier, division, lp, rating = info
         await set_rating(self.bot.settings.DB_PATH, user.id, rating)
-        await set_lol_rank(self.bot.settings.DB_PATH, user.id, source="riot", tier=tier, division=division, lp=lp)
+        await set_lol_rank(self.bot.settings.DB_PATH, user.id, source="riot", tier=tier, division=division, lp=lp, defer=True)
         div_txt = f" {division}" if division else ""
         await inter.followup.send(f"✅ **{user.display_name}** lié à **{summoner}** ({region}) → **{int(rating)}** • _{tier.title()}{div_txt} {lp} LP_.", ephemeral=True)
 
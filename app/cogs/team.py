@@ -1,5 +1,6 @@
 # app/cogs/team.py
 from typing import List, Dict, Tuple, Optional
+import contextlib
 import itertools
 import time
 import random
@@ -10,9 +11,9 @@ from discord import app_commands
 from discord.ext import commands
 
 from ..db import (
-    get_rating, set_rating, set_team_last, get_team_last,
+    get_rating, set_rating, set_team_last, get_team_last, get_team_last_versioned,
     get_or_create_session_id, load_pair_counts, bump_pair_counts, session_stats, end_session,
-    load_team_signatures, add_team_signature, clear_team_signatures, prune_team_signatures
+    load_team_signatures, add_team_signature, prune_team_signatures, clear_team_signatures
 )
 
 # Import gracieux : si le helper Riot n'existe pas encore, on ne plante pas
@@ -26,6 +27,7 @@ from ..team_logic import (
     parse_avoid_pairs, split_random, balance_k_teams_with_constraints, fmt_team
 )
 from ..voice import create_and_move_voice
+from ..locks import guild_lock
 
 
 class TeamCog(commands.Cog):
@@ -74,6 +76,7 @@ class TeamCog(commands.Cog):
                         tier=tier,
                         division=division,
                         lp=lp,
+                        defer=True,
                     )
                     imported.append(m)
 
@@ -176,113 +179,117 @@ class TeamCog(commands.Cog):
         with_groups_list = group_by_with_constraints(guild, selected, with_groups) if with_groups else [[m] for m in selected]
         avoid_pairs_set = parse_avoid_pairs(guild, avoid_pairs)
 
-        # 3) Session, compteurs de paires & signatures déjà vues
-        sid = await get_or_create_session_id(self.bot.settings.DB_PATH, guild.id, session)
-        pair_counts = await load_pair_counts(self.bot.settings.DB_PATH, sid)
-        pair_counts = {tuple(sorted(k)): v for k, v in pair_counts.items()}
+        # Lecture des compteurs -> recherche -> commit : sérialisé par serveur quand on écrit
+        # (deux /teamroll ou Reroll simultanés ne s'appuient pas sur le même historique périmé)
+        async with (guild_lock(guild.id, "teamroll") if commit else contextlib.nullcontext()):
+            # 3) Session, compteurs de paires & signatures déjà vues
+            sid = await get_or_create_session_id(self.bot.settings.DB_PATH, guild.id, session)
+            pair_counts = await load_pair_counts(self.bot.settings.DB_PATH, sid)
+            pair_counts = {tuple(sorted(k)): v for k, v in pair_counts.items()}
 
-        players_fp = self._players_fingerprint(selected)
-        sizes_fp = self._sizes_fingerprint(sizes_list)
-        seen_signatures = await load_team_signatures(
-            self.bot.settings.DB_PATH, guild.id, session, players_fp, sizes_fp
-        )
-
-        def penalty(teams: List[List[discord.Member]]) -> Tuple[int, int]:
-            """Retourne (penalty_repetition, spread_totals)."""
-            rep = 0
-            for t in teams:
-                ids = sorted(m.id for m in t)
-                for a, b in itertools.combinations(ids, 2):
-                    rep += pair_counts.get((a, b), 0)
-            totals = [int(sum(ratings[m.id] for m in t)) for t in teams]
-            spread = max(totals) - min(totals) if totals else 0
-            return rep, spread
-
-        # 4) Recherche (inédit prioritaire) + diversité quand tout est vu
-        BEST: Optional[tuple[int, int, List[List[discord.Member]]]] = None
-        BEST_UNSEEN: Optional[List[List[discord.Member]]] = None
-        TOP_POOL: list[List[List[discord.Member]]] = []  # ex æquo au meilleur score
-        attempts = max(50, min(5000, int(attempts)))
-
-        for _ in range(attempts):
-            base = selected[:]
-            random.shuffle(base)  # casse la déterminisme d’entrée
-
-            if mode.lower() == "random":
-                cand = split_random(base, team_count, sizes_list)
-            else:
-                cand, _viol = balance_k_teams_with_constraints(
-                    base, ratings, team_count, sizes_list, with_groups_list, avoid_pairs_set
-                )
+            players_fp = self._players_fingerprint(selected)
+            sizes_fp = self._sizes_fingerprint(sizes_list)
+            seen_signatures = await load_team_signatures(
+                self.bot.settings.DB_PATH, guild.id, session, players_fp, sizes_fp
+            )
 
-            sig = self._composition_signature(cand)
-            if sig not in seen_signatures and BEST_UNSEEN is None:
-                BEST_UNSEEN = cand  # 1ère inédite trouvée
+            def penalty(teams: List[List[discord.Member]]) -> Tuple[int, int]:
+                """Retourne (penalty_repetition, spread_totals)."""
+                rep = 0
+                for t in teams:
+                    ids = sorted(m.id for m in t)
+                    for a, b in itertools.combinations(ids, 2):
+                        rep += pair_counts.get((a, b), 0)
+                totals = [int(sum(ratings[m.id] for m in t)) for t in teams]
+                spread = max(totals) - min(totals) if totals else 0
+                return rep, spread
+
+            # 4) Recherche (inédit prioritaire) + diversité quand tout est vu
+            BEST: Optional[tuple[int, int, List[List[discord.Member]]]] = None
+            BEST_UNSEEN: Optional[List[List[discord.Member]]] = None
+            TOP_POOL: list[List[List[discord.Member]]] = []  # ex æquo au meilleur score
+            attempts = max(50, min(5000, int(attempts)))
+
+            for _ in range(attempts):
+                base = selected[:]
+                random.shuffle(base)  # casse la déterminisme d’entrée
+
+                if mode.lower() == "random":
+                    cand = split_random(base, team_count, sizes_list)
+                else:
+                    cand, _viol = balance_k_teams_with_constraints(
+                        base, ratings, team_count, sizes_list, with_groups_list, avoid_pairs_set
+                    )
 
-            rep, spr = penalty(cand)
-            if (BEST is None) or (rep, spr) < (BEST[0], BEST[1]):
-                BEST = (rep, spr, cand)
-                TOP_POOL = [cand]
-            elif BEST is not None and (rep, spr) == (BEST[0], BEST[1]):
-                TOP_POOL.append(cand)
+                sig = self._composition_signature(cand)
+                if sig not in seen_signatures and BEST_UNSEEN is None:
+                    BEST_UNSEEN = cand  # 1ère inédite trouvée
 
-            if BEST_UNSEEN is not None and rep == 0:
-                break  # jackpot: inédite + rep==0
+                rep, spr = penalty(cand)
+                if (BEST is None) or (rep, spr) < (BEST[0], BEST[1]):
+                    BEST = (rep, spr, cand)
+                    TOP_POOL = [cand]
+                elif BEST is not None and (rep, spr) == (BEST[0], BEST[1]):
+                    TOP_POOL.append(cand)
 
-        if BEST is None:
-            raise RuntimeError("Impossible de générer des équipes.")
+                if BEST_UNSEEN is not None and rep == 0:
+                    break  # jackpot: inédite + rep==0
 
-        if BEST_UNSEEN is not None:
-            teams = BEST_UNSEEN
-            exhausted = False
-            rep, spr = penalty(teams)
-        else:
-            # EPUISE : on varie parmi les meilleures candidates
-            exhausted = True
-            pool = TOP_POOL or ([BEST[2]] if BEST else [])
-            teams = random.choice(pool)
-            rep, spr = penalty(teams)
-
-        # 5) Affichage
-        embed = discord.Embed(title=f"🎲 Team Roll — session: {session}", color=discord.Color.blurple())
-        for idx, team_list in enumerate(teams):
-            lines = [f"- {m.display_name} ({int(ratings[m.id])})" for m in team_list]
-            total = int(sum(ratings[m.id] for m in team_list))
-            embed.add_field(
-                name=f"Team {idx+1} — total {total}",
-                value=("\n".join(lines) if lines else "_(vide)_"),
-                inline=True
-            )
+            if BEST is None:
+                raise RuntimeError("Impossible de générer des équipes.")
 
-        # progression couverture des paires pour CE set de joueurs
-        seen, possible = await session_stats(self.bot.settings.DB_PATH, sid, [m.id for m in selected])
-        footer = f"Répétitions évitées: {max(0, rep)} • Δ totals: {spr} • Couverture paires: {seen}/{possible}"
-        if exhausted:
-            footer += " • ♻️ Espace épuisé: tirage varié (historique non bloquant)"
-        embed.set_footer(text=footer)
+            if BEST_UNSEEN is not None:
+                teams = BEST_UNSEEN
+                exhausted = False
+                rep, spr = penalty(teams)
+            else:
+                # EPUISE : on varie parmi les meilleures candidates
+                exhausted = True
+                pool = TOP_POOL or ([BEST[2]] if BEST else [])
+                teams = random.choice(pool)
+                rep, spr = penalty(teams)
+
+            # 5) Affichage
+            embed = discord.Embed(title=f"🎲 Team Roll — session: {session}", color=discord.Color.blurple())
+            for idx, team_list in enumerate(teams):
+                lines = [f"- {m.display_name} ({int(ratings[m.id])})" for m in team_list]
+                total = int(sum(ratings[m.id] for m in team_list))
+                embed.add_field(
+                    name=f"Team {idx+1} — total {total}",
+                    value=("\n".join(lines) if lines else "_(vide)_"),
+                    inline=True
+                )
 
-        # 6) Commit dans l’historique (optionnel)
-        if commit:
-            # historise les paires
-            await bump_pair_counts(
-                self.bot.settings.DB_PATH,
-                sid,
-                [[m.id for m in t] for t in teams]
-            )
-            # historise la signature forte
-            sig = self._composition_signature(teams)
-            await add_team_signature(
-                self.bot.settings.DB_PATH,
-                guild.id, session, players_fp, sizes_fp, sig, int(time.time())
-            )
-            # garde une fenêtre max d’historique (ex: 200 dernières compos)
-            KEEP_LAST = 200
-            try:
-                await prune_team_signatures(
-                    self.bot.settings.DB_PATH, guild.id, session, players_fp, sizes_fp, KEEP_LAST
+            # progression couverture des paires pour CE set de joueurs
+            seen, possible = await session_stats(self.bot.settings.DB_PATH, sid, [m.id for m in selected])
+            footer = f"Répétitions évitées: {max(0, rep)} • Δ totals: {spr} • Couverture paires: {seen}/{possible}"
+            if exhausted:
+                footer += " • ♻️ Espace épuisé: tirage varié (historique non bloquant)"
+            embed.set_footer(text=footer)
+
+            # 6) Commit dans l’historique (optionnel)
+            if commit:
+                # historise les paires
+                await bump_pair_counts(
+                    self.bot.settings.DB_PATH,
+                    sid,
+                    [[m.id for m in t] for t in teams]
                 )
-            except Exception:
-                pass
+                # historise la signature forte
+                sig = self._composition_signature(teams)
+                await add_team_signature(
+                    self.bot.settings.DB_PATH,
+                    guild.id, session, players_fp, sizes_fp, sig, int(time.time()),
+                    defer=True,
+                )
+                # la fenêtre d’historique (TEAM_HISTORY_KEEP par bucket) est appliquée par la maintenance quotidienne ;
+                # maintenance désactivée (MAINTENANCE_HOUR=-1) : pruning du bucket à chaque roll, différé lui aussi
+                settings = self.bot.settings
+                if not 0 <= settings.MAINTENANCE_HOUR <= 23:
+                    await prune_team_signatures(
+                        settings.DB_PATH, guild.id, session, players_fp, sizes_fp, settings.TEAM_HISTORY_KEEP,
+                        defer=True,
+                    )
 
         return embed, teams, ratings
 
@@ -294,6 +301,8 @@ class TeamCog(commands.Cog):
             self.cog = cog
             self.params = params or {}
             self.author_id = author_id
+            # version du snapshot "dernière config" produit par ce roll (None si inconnue)
+            self.snapshot_version: int | None = None
 
         async def interaction_check(self, interaction: discord.Interaction) -> bool:
             # Auteur initial OU admin/manager; si author_id inconnu (reboot), on autorise admin/manager
@@ -312,6 +321,14 @@ class TeamCog(commands.Cog):
             if not params:
                 await interaction.followup.send("⚠️ Impossible de retrouver les paramètres du dernier roll.", ephemeral=True)
                 return
+            if self.snapshot_version is not None and interaction.guild:
+                current, _snap = await get_team_last_versioned(self.cog.bot.settings.DB_PATH, interaction.guild.id)
+                if current != self.snapshot_version:
+                    await interaction.followup.send(
+                        f"⚠️ Une config plus récente existe (v{current}, ce roll : v{self.snapshot_version}) — "
+                        "ce reroll repart des joueurs de CE message, pas de la dernière config.",
+                        ephemeral=True
+                    )
             try:
                 embed, _teams, _ratings = await self.cog._generate_roll(interaction, **params)
             except Exception as e:
@@ -448,7 +465,7 @@ class TeamCog(commands.Cog):
                 "created_by": inter.user.id,
                 "created_at": int(time.time()),
             }
-            await set_team_last(self.bot.settings.DB_PATH, inter.guild.id, snapshot)
+            view.snapshot_version = await set_team_last(self.bot.settings.DB_PATH, inter.guild.id, snapshot, defer=True)
         except Exception:
             pass
 
@@ -586,14 +603,14 @@ class TeamCog(commands.Cog):
                 "ratings": {str(uid): float(ratings[uid]) for uid in [m.id for t in teams for m in t]},
                 "params": {
                     "with_groups": with_groups, "avoid_pairs": avoid_pairs, "members": members,
-                    "session": params["session"], "attempts": attempts
+                    "session": session, "attempts": attempts
                 },
                 "created_by": inter.user.id,
                 "created_at": int(time.time()),
             }
-            await set_team_last(self.bot.settings.DB_PATH, guild.id, snapshot)
+            snapshot_version = await set_team_last(self.bot.settings.DB_PATH, guild.id, snapshot, defer=True)
         except Exception:
-            pass
+            snapshot_version = None
 
         # Bouton Reroll avec les mêmes paramètres (+ stock global simple)
         params = dict(
@@ -605,13 +622,14 @@ class TeamCog(commands.Cog):
         setattr(inter.client, "last_teamroll_params", params)
 
         view = self.RerollView(self, params=params, author_id=inter.user.id, timeout=300)
+        view.snapshot_version = snapshot_version
         await inter.followup.send(embed=embed, view=view)
 
     # -------- /team_last --------
     @app_commands.command(name="team_last", description="Afficher la dernière configuration d'équipes enregistrée pour ce serveur.")
     async def team_last(self, inter: discord.Interaction):
         await inter.response.defer(ephemeral=True, thinking=True)
-        snap = await get_team_last(self.bot.settings.DB_PATH, inter.guild.id)
+        version, snap = await get_team_last_versioned(self.bot.settings.DB_PATH, inter.guild.id)
         if not snap:
             await inter.followup.send("ℹ️ Aucune configuration de team enregistrée pour ce serveur.", ephemeral=True)
             return
@@ -631,7 +649,7 @@ class TeamCog(commands.Cog):
             embed.add_field(name=f"Team {idx} — total {total}", value="\n".join(names) or "_(vide)_", inline=True)
 
         meta = snap.get("params", {})
-        footer = f"Mode: {snap.get('mode','?')} • Équipes: {snap.get('team_count','?')}"
+        footer = f"v{version} • Mode: {snap.get('mode','?')} • Équipes: {snap.get('team_count','?')}"
         if meta.get("session"):
             footer += f" • Session: {meta['session']}"
         embed.set_footer(text=footer)
@@ -1,7 +1,6 @@
 # app/cogs/team_tournament.py
 from __future__ import annotations
-from typing import List, Optional, Tuple
-import json
+from typing import Dict, List, Optional, Tuple
 import time
 import math
 
@@ -9,75 +8,43 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 
-import aiosqlite
-
-from ..db import get_team_last  # on réutilise ton snapshot "dernière config d'équipes"
+from ..codec import decode_ids, encode_ids
+from ..db import (  # on réutilise ton snapshot "dernière config d'équipes"
+    cached_active, connect, fetch_record, fetch_records, get_team_last, table_for, update_active_cache
+)
+from ..dbstats import instrument
+from ..locks import guild_lock
+from ..records import TeamMatch, TeamTournament
 
 
 # ----------------- Helpers DB locaux (tables dédiées Team vs Team) -----------------
 
-CREATE_TEAM_TOURNAMENTS_SQL = """
-CREATE TABLE IF NOT EXISTS team_tournaments (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    guild_id INTEGER NOT NULL,
-    name TEXT NOT NULL,
-    state TEXT NOT NULL, -- setup | running | cancelled | finished
-    created_by INTEGER NOT NULL,
-    created_at INTEGER NOT NULL,
-    started_at INTEGER,
-    cancelled_at INTEGER
-);
-"""
-
-CREATE_TEAM_MATCHES_SQL = """
-CREATE TABLE IF NOT EXISTS team_matches (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    tournament_id INTEGER NOT NULL,
-    round INTEGER NOT NULL,
-    pos_in_round INTEGER NOT NULL,
-    p1_team_json TEXT,          -- JSON [user_id...]
-    p2_team_json TEXT,          -- JSON [user_id...]
-    best_of INTEGER NOT NULL DEFAULT 1,
-    status TEXT NOT NULL,       -- pending | running | done
-    p1_score INTEGER NOT NULL DEFAULT 0,
-    p2_score INTEGER NOT NULL DEFAULT 0,
-    winner_team_json TEXT,      -- JSON gagnante [user_id...]
-    next_match_id INTEGER,      -- FK vers team_matches.id
-    next_slot INTEGER,          -- 1 ou 2
-    FOREIGN KEY (tournament_id) REFERENCES team_tournaments(id)
-);
-"""
-
-async def ensure_tables(db_path: str):
-    async with aiosqlite.connect(db_path) as db:
-        await db.execute(CREATE_TEAM_TOURNAMENTS_SQL)
-        await db.execute(CREATE_TEAM_MATCHES_SQL)
-        await db.commit()
+# Les tables team_tournaments / team_matches sont créées par les migrations (app/db.py).
+
+async def _tt_row(db, where: str, params: tuple) -> Optional[TeamTournament]:
+    return await fetch_record(db, TeamTournament, f"SELECT {TeamTournament.COLUMNS} FROM team_tournaments WHERE {where}", params)
 
 async def tt_create(db_path: str, guild_id: int, name: str, created_by: int) -> int:
-    await ensure_tables(db_path)
-    async with aiosqlite.connect(db_path) as db:
+    async with connect(db_path) as db:
         cur = await db.execute(
             "INSERT INTO team_tournaments (guild_id, name, state, created_by, created_at) VALUES (?,?,?,?,?)",
             (guild_id, name, "setup", created_by, int(time.time()))
         )
         await db.commit()
+        update_active_cache(db_path, "tt", await _tt_row(db, "id=?", (cur.lastrowid,)))
         return cur.lastrowid
 
-async def tt_get_active(db_path: str, guild_id: int):
-    await ensure_tables(db_path)
-    async with aiosqlite.connect(db_path) as db:
-        db.row_factory = aiosqlite.Row  # <-- permet l’accès par nom de colonne
-        cur = await db.execute(
-            "SELECT * FROM team_tournaments WHERE guild_id=? AND state IN ('setup','running') ORDER BY id DESC LIMIT 1",
-            (guild_id,)
-        )
-        row = await cur.fetchone()
-        await cur.close()
-        return dict(row) if row else None   # <-- renvoie un dict ou None
+async def tt_get_active(db_path: str, guild_id: int) -> Optional[TeamTournament]:
+    # Servi par le cache d'état actif (app/db.py) ; la base n'est lue qu'au premier accès
+    async def load():
+        async with connect(db_path) as db:
+            return await _tt_row(
+                db, "guild_id=? AND state IN ('setup','running') ORDER BY id DESC LIMIT 1", (guild_id,)
+            )
+    return await cached_active(db_path, "tt", guild_id, load)
 
 async def tt_set_state(db_path: str, tournament_id: int, state: str):
-    async with aiosqlite.connect(db_path) as db:
+    async with connect(db_path) as db:
         if state == "running":
             await db.execute("UPDATE team_tournaments SET state=?, started_at=? WHERE id=?", (state, int(time.time()), tournament_id))
         elif state == "cancelled":
@@ -85,18 +52,42 @@ async def tt_set_state(db_path: str, tournament_id: int, state: str):
         else:
             await db.execute("UPDATE team_tournaments SET state=? WHERE id=?", (state, tournament_id))
         await db.commit()
+        update_active_cache(db_path, "tt", await _tt_row(db, "id=?", (tournament_id,)))
 
 async def tm_clear(db_path: str, tournament_id: int):
-    async with aiosqlite.connect(db_path) as db:
+    async with connect(db_path) as db:
         await db.execute("DELETE FROM team_matches WHERE tournament_id=?", (tournament_id,))
+        await db.execute("DELETE FROM tt_teams WHERE tournament_id=?", (tournament_id,))
         await db.commit()
 
+async def tt_teams_create(db_path: str, tournament_id: int, teams: List[List[int]]) -> List[int]:
+    """Enregistre les équipes (seed = ordre de la liste) ; retourne leurs ids dans le même ordre."""
+    ids: List[int] = []
+    async with connect(db_path) as db:
+        for seed, members in enumerate(teams, start=1):
+            cur = await db.execute(
+                "INSERT INTO tt_teams (tournament_id, seed, members) VALUES (?,?,?)",
+                (tournament_id, seed, encode_ids(members))
+            )
+            ids.append(cur.lastrowid)
+            await cur.close()
+        await db.commit()
+    return ids
+
+async def tt_teams_map(db_path: str, tournament_id: int, archived: bool = False) -> Dict[int, List[int]]:
+    """team_id -> [user_id...] pour tout le tournoi (une seule requête)."""
+    async with connect(db_path) as db:
+        cur = await db.execute(f"SELECT id, members FROM {table_for('tt_teams', archived)} WHERE tournament_id=?", (tournament_id,))
+        rows = await cur.fetchall()
+        await cur.close()
+    return {int(tid): decode_ids(members) for tid, members in rows}
+
 async def tm_create_many(db_path: str, tournament_id: int, matches: List[dict]):
-    async with aiosqlite.connect(db_path) as db:
+    async with connect(db_path) as db:
         await db.executemany(
             """
             INSERT INTO team_matches
-            (tournament_id, round, pos_in_round, p1_team_json, p2_team_json, best_of, status, p1_score, p2_score, winner_team_json, next_match_id, next_slot)
+            (tournament_id, round, pos_in_round, p1_team_id, p2_team_id, best_of, status, p1_score, p2_score, winner_team_id, next_match_id, next_slot)
             VALUES (?,?,?,?,?,?,?,?,?,?,?,?)
             """,
             [
@@ -104,13 +95,13 @@ async def tm_create_many(db_path: str, tournament_id: int, matches: List[dict]):
                     tournament_id,
                     m["round"],
                     m["pos_in_round"],
-                    json.dumps(m.get("p1_team") or []),
-                    json.dumps(m.get("p2_team") or []),
+                    m.get("p1_team_id"),
+                    m.get("p2_team_id"),
                     int(m.get("best_of", 1)),
                     m.get("status", "pending"),
                     int(m.get("p1_score", 0)),
                     int(m.get("p2_score", 0)),
-                    json.dumps(m.get("winner_team") or []),
+                    m.get("winner_team_id"),
                     m.get("next_match_id"),
                     m.get("next_slot"),
                 )
@@ -119,77 +110,59 @@ async def tm_create_many(db_path: str, tournament_id: int, matches: List[dict]):
         )
         await db.commit()
 
-async def tm_list(db_path: str, tournament_id: int) -> List[dict]:
-    async with aiosqlite.connect(db_path) as db:
-        cur = await db.execute("SELECT * FROM team_matches WHERE tournament_id=? ORDER BY round, pos_in_round", (tournament_id,))
-        cols = [c[0] for c in cur.description]
-        rows = await cur.fetchall()
-        await cur.close()
-    out = []
-    for r in rows:
-        d = dict(zip(cols, r))
-        # JSON -> list[int]
-        for k in ("p1_team_json", "p2_team_json", "winner_team_json"):
-            if d.get(k):
-                try:
-                    d[k] = json.loads(d[k])
-                except Exception:
-                    d[k] = []
-            else:
-                d[k] = []
-        out.append(d)
-    return out
+async def tm_list(db_path: str, tournament_id: int, archived: bool = False) -> List[TeamMatch]:
+    async with connect(db_path) as db:
+        return await fetch_records(
+            db, TeamMatch,
+            f"SELECT {TeamMatch.COLUMNS} FROM {table_for('team_matches', archived)} WHERE tournament_id=? ORDER BY round, pos_in_round",
+            (tournament_id,)
+        )
 
 async def tm_update_next_links(db_path: str, tournament_id: int, triples: List[Tuple[int, int, int]]):
     """triples: (match_id, next_match_id, next_slot)"""
-    async with aiosqlite.connect(db_path) as db:
+    async with connect(db_path) as db:
         await db.executemany(
             "UPDATE team_matches SET next_match_id=?, next_slot=? WHERE id=? AND tournament_id=?",
             [(nm, ns, mid, tournament_id) for (mid, nm, ns) in triples]
         )
         await db.commit()
 
-async def tm_set_result(db_path: str, tournament_id: int, match_id: int, winner_team: List[int], p1_score: int, p2_score: int) -> Optional[int]:
+async def tm_set_result(db_path: str, tournament_id: int, match_id: int, winner_team_id: int, p1_score: int, p2_score: int) -> Optional[int]:
     """Retourne next_match_id si dispo, sinon None."""
-    async with aiosqlite.connect(db_path) as db:
-        # récupérer match + slots
+    async with connect(db_path) as db:
         cur = await db.execute(
-            "SELECT id, p1_team_json, p2_team_json, next_match_id, next_slot FROM team_matches WHERE id=? AND tournament_id=?",
+            "SELECT next_match_id, next_slot FROM team_matches WHERE id=? AND tournament_id=?",
             (match_id, tournament_id)
         )
         row = await cur.fetchone()
         await cur.close()
         if not row:
             return None
-        _id, p1_json, p2_json, next_id, next_slot = row
+        next_id, next_slot = row
         # set winner + score + status
         await db.execute(
-            "UPDATE team_matches SET winner_team_json=?, p1_score=?, p2_score=?, status='done' WHERE id=? AND tournament_id=?",
-            (json.dumps(winner_team), int(p1_score), int(p2_score), match_id, tournament_id)
+            "UPDATE team_matches SET winner_team_id=?, p1_score=?, p2_score=?, status='done' WHERE id=? AND tournament_id=?",
+            (winner_team_id, int(p1_score), int(p2_score), match_id, tournament_id)
         )
-        # Propager au match suivant si existe
+        # Propager au match suivant si existe : on n'écrit que l'id de l'équipe
         if next_id:
-            # Insère gagnant dans slot 1 ou 2
-            if int(next_slot) == 1:
-                await db.execute(
-                    "UPDATE team_matches SET p1_team_json=?, status=CASE WHEN status='pending' THEN 'running' ELSE status END WHERE id=? AND tournament_id=?",
-                    (json.dumps(winner_team), next_id, tournament_id)
-                )
-            else:
-                await db.execute(
-                    "UPDATE team_matches SET p2_team_json=?, status=CASE WHEN status='pending' THEN 'running' ELSE status END WHERE id=? AND tournament_id=?",
-                    (json.dumps(winner_team), next_id, tournament_id)
-                )
+            col = "p1_team_id" if int(next_slot) == 1 else "p2_team_id"
+            await db.execute(
+                f"UPDATE team_matches SET {col}=?, status=CASE WHEN status='pending' THEN 'running' ELSE status END WHERE id=? AND tournament_id=?",
+                (winner_team_id, next_id, tournament_id)
+            )
         await db.commit()
         return next_id
 
+# Helpers DB ci-dessus chronométrés comme les repositories de app/db.py (/dbstats)
+instrument(globals(), __name__)
 
 # ----------------- Bracket builder Team vs Team -----------------
 
 def _build_team_bracket(team_count: int, best_of: int = 1) -> List[dict]:
     """
     Construit la structure des matches (sans équipes encore), rounds & pos_in_round + wiring next_slot.
-    On remplit p1_team/p2_team après en injectant les équipes initiales.
+    On remplit p1_team_id/p2_team_id après en injectant les équipes initiales.
     """
     # nombre total de rounds pour N équipes (power-of-two ceiling)
     pow2 = 1
@@ -209,8 +182,8 @@ def _build_team_bracket(team_count: int, best_of: int = 1) -> List[dict]:
                 "_tmp_id": next_id_counter,  # provisoire
                 "round": r,
                 "pos_in_round": i + 1,
-                "p1_team": None,
-                "p2_team": None,
+                "p1_team_id": None,
+                "p2_team_id": None,
                 "best_of": best_of,
                 "status": "pending" if r > 1 else "running",  # R1 en running, le reste pending
                 "next_match_id": None,
@@ -236,14 +209,14 @@ def _build_team_bracket(team_count: int, best_of: int = 1) -> List[dict]:
 
     return matches
 
-def _inject_round1_teams(matches: List[dict], teams: List[List[int]]):
-    """Injecte les équipes réelles dans les matches du Round 1; si pow2 > len(teams), byes (None)."""
+def _inject_round1_teams(matches: List[dict], team_ids: List[int]):
+    """Injecte les ids d'équipes (tt_teams) dans les matches du Round 1; si pow2 > len(team_ids), byes (None)."""
     # Récupérer les matches du round 1, ordonnés
     r1 = [m for m in matches if m["round"] == 1]
     r1.sort(key=lambda x: x["pos_in_round"])
     # Place Team1 vs Team2, Team3 vs Team4, etc.
     # Si le nombre n'est pas power-of-two, on met des byes (None) en face.
-    t = teams[:]
+    t = team_ids[:]
     # Compléter à power-of-two avec None
     pow2 = 1
     while pow2 < len(t):
@@ -255,8 +228,8 @@ def _inject_round1_teams(matches: List[dict], teams: List[List[int]]):
     for m in r1:
         a = next(it, None)
         b = next(it, None)
-        m["p1_team"] = a
-        m["p2_team"] = b
+        m["p1_team_id"] = a
+        m["p2_team_id"] = b
         # si bye -> gagnant auto déterminable (on laisse la logique de report le gérer au premier score report)
     return matches
 
@@ -307,11 +280,12 @@ class TeamTournamentCog(commands.Cog):
         guild = inter.guild
         if not guild:
             await inter.followup.send("❌ À utiliser en serveur.", ephemeral=True); return
-        active = await tt_get_active(self.bot.settings.DB_PATH, guild.id)
-        if active:
-            await inter.followup.send(f"⚠️ Un tournoi est déjà actif: **{active['name']}** (état: {active['state']}).", ephemeral=True); return
-        tid = await tt_create(self.bot.settings.DB_PATH, guild.id, name, inter.user.id)
-        await inter.followup.send(f"✅ Tournoi **{name}** créé (id: `{tid}`)\n→ Lance `/tt start` pour générer le bracket à partir des **dernières équipes**.", ephemeral=True)
+        async with guild_lock(guild.id, "tt"):
+            active = await tt_get_active(self.bot.settings.DB_PATH, guild.id)
+            if active:
+                await inter.followup.send(f"⚠️ Un tournoi est déjà actif: **{active.name}** (état: {active.state}).", ephemeral=True); return
+            tid = await tt_create(self.bot.settings.DB_PATH, guild.id, name, inter.user.id)
+            await inter.followup.send(f"✅ Tournoi **{name}** créé (id: `{tid}`)\n→ Lance `/tt start` pour générer le bracket à partir des **dernières équipes**.", ephemeral=True)
 
     # ------- START -------
     @group.command(name="start", description="Démarrer le bracket Team vs Team en utilisant les DERNIÈRES équipes.")
@@ -324,43 +298,47 @@ class TeamTournamentCog(commands.Cog):
         if not guild:
             await inter.followup.send("❌ À utiliser en serveur.", ephemeral=True); return
 
-        t = await tt_get_active(self.bot.settings.DB_PATH, guild.id)
-        if not t or t["state"] != "setup":
-            await inter.followup.send("❌ Aucun tournoi Team vs Team en préparation.", ephemeral=True); return
-
-        # Récupère les DERNIÈRES équipes
-        snap = await get_team_last(self.bot.settings.DB_PATH, guild.id)
-        if not snap or not snap.get("teams"):
-            await inter.followup.send("ℹ️ Aucune **dernière configuration d’équipes** trouvée. Utilise `/team` ou `/teamroll` d’abord.", ephemeral=True); return
-
-        teams: List[List[int]] = [[int(x) for x in t] for t in snap["teams"] if t]
-        if len(teams) < 2:
-            await inter.followup.send("❌ Il faut au moins 2 équipes.", ephemeral=True); return
-
-        # Construit la structure de bracket
-        built = _build_team_bracket(len(teams), best_of=best_of)
-        _inject_round1_teams(built, teams)
-
-        # On insère sans next ids, on récupère l'ordre SQL, puis on met à jour les next ids
-        await tm_clear(self.bot.settings.DB_PATH, t["id"])
-        await tm_create_many(self.bot.settings.DB_PATH, t["id"], built)
-        # Récupérer l'ordre inséré
-        created = await tm_list(self.bot.settings.DB_PATH, t["id"])
-        created_sorted = sorted(created, key=lambda r: (r["round"], r["pos_in_round"]))
-        sql_ids = [row["id"] for row in created_sorted]
-
-        # Fixer les next ids
-        resolved = _resolve_next_ids(sql_ids, built)
-        triples = []
-        for row, nb in zip(created_sorted, resolved):
-            if nb.get("next_match_id"):
-                triples.append((row["id"], nb["next_match_id"], nb.get("next_slot") or None))
-        if triples:
-            await tm_update_next_links(self.bot.settings.DB_PATH, t["id"], triples)
-
-        await tt_set_state(self.bot.settings.DB_PATH, t["id"], "running")
+        async with guild_lock(guild.id, "tt"):
+            t = await tt_get_active(self.bot.settings.DB_PATH, guild.id)
+            if not t or t.state != "setup":
+                await inter.followup.send("❌ Aucun tournoi Team vs Team en préparation.", ephemeral=True); return
+
+            # Récupère les DERNIÈRES équipes
+            snap = await get_team_last(self.bot.settings.DB_PATH, guild.id)
+            if not snap or not snap.get("teams"):
+                await inter.followup.send("ℹ️ Aucune **dernière configuration d’équipes** trouvée. Utilise `/team` ou `/teamroll` d’abord.", ephemeral=True); return
+
+            teams: List[List[int]] = [[int(x) for x in t] for t in snap["teams"] if t]
+            if len(teams) < 2:
+                await inter.followup.send("❌ Il faut au moins 2 équipes.", ephemeral=True); return
+
+            # Construit la structure de bracket
+            built = _build_team_bracket(len(teams), best_of=best_of)
+
+            # Une ligne tt_teams par équipe ; les matches ne référencent que leurs ids
+            await tm_clear(self.bot.settings.DB_PATH, t.id)
+            team_ids = await tt_teams_create(self.bot.settings.DB_PATH, t.id, teams)
+            _inject_round1_teams(built, team_ids)
+
+            # On insère sans next ids, on récupère l'ordre SQL, puis on met à jour les next ids
+            await tm_create_many(self.bot.settings.DB_PATH, t.id, built)
+            # Récupérer l'ordre inséré
+            created = await tm_list(self.bot.settings.DB_PATH, t.id)
+            created_sorted = sorted(created, key=lambda r: (r.round, r.pos_in_round))
+            sql_ids = [row.id for row in created_sorted]
+
+            # Fixer les next ids
+            resolved = _resolve_next_ids(sql_ids, built)
+            triples = []
+            for row, nb in zip(created_sorted, resolved):
+                if nb.get("next_match_id"):
+                    triples.append((row.id, nb["next_match_id"], nb.get("next_slot") or None))
+            if triples:
+                await tm_update_next_links(self.bot.settings.DB_PATH, t.id, triples)
+
+            await tt_set_state(self.bot.settings.DB_PATH, t.id, "running")
         await inter.followup.send("✅ Tournoi Team vs Team démarré ! Utilisez `/tt view` pour voir le bracket.", ephemeral=True)
-        await self._post_bracket(inter, t["id"], title=f"🏆 {t['name']} — Round 1 (Teams)")
+        await self._post_bracket(inter, t.id, title=f"🏆 {t.name} — Round 1 (Teams)")
 
     # ------- REPORT -------
     @group.command(name="report", description="Reporter le résultat d'un match (Team vs Team).")
@@ -371,27 +349,30 @@ class TeamTournamentCog(commands.Cog):
             await inter.followup.send("⛔ Réservé aux admins/owner pour l’instant.", ephemeral=True); return
 
         guild = inter.guild
-        t = guild and await tt_get_active(self.bot.settings.DB_PATH, guild.id)
-        if not t or t["state"] != "running":
-            await inter.followup.send("❌ Pas de tournoi Team vs Team en cours.", ephemeral=True); return
-
-        # On récupère le match pour savoir quelles équipes sont en slot 1 / 2
-        allm = await tm_list(self.bot.settings.DB_PATH, t["id"])
-        mm = next((m for m in allm if m["id"] == match_id), None)
-        if not mm:
-            await inter.followup.send("❌ Match introuvable.", ephemeral=True); return
-
-        p1_team = mm.get("p1_team_json") or []
-        p2_team = mm.get("p2_team_json") or []
-        if winner_slot == 1 and not p1_team:
-            await inter.followup.send("❌ Le slot 1 est vide (bye).", ephemeral=True); return
-        if winner_slot == 2 and not p2_team:
-            await inter.followup.send("❌ Le slot 2 est vide (bye).", ephemeral=True); return
-
-        winner = p1_team if winner_slot == 1 else p2_team
-        next_id = await tm_set_result(self.bot.settings.DB_PATH, t["id"], match_id, winner, p1_score, p2_score)
+        if not guild:
+            await inter.followup.send("❌ À utiliser en serveur.", ephemeral=True); return
+        async with guild_lock(guild.id, "tt"):
+            t = await tt_get_active(self.bot.settings.DB_PATH, guild.id)
+            if not t or t.state != "running":
+                await inter.followup.send("❌ Pas de tournoi Team vs Team en cours.", ephemeral=True); return
+
+            # On récupère le match pour savoir quelles équipes sont en slot 1 / 2
+            allm = await tm_list(self.bot.settings.DB_PATH, t.id)
+            mm = next((m for m in allm if m.id == match_id), None)
+            if not mm:
+                await inter.followup.send("❌ Match introuvable.", ephemeral=True); return
+
+            p1_team = mm.p1_team_id
+            p2_team = mm.p2_team_id
+            if winner_slot == 1 and not p1_team:
+                await inter.followup.send("❌ Le slot 1 est vide (bye).", ephemeral=True); return
+            if winner_slot == 2 and not p2_team:
+                await inter.followup.send("❌ Le slot 2 est vide (bye).", ephemeral=True); return
+
+            winner = p1_team if winner_slot == 1 else p2_team
+            next_id = await tm_set_result(self.bot.settings.DB_PATH, t.id, match_id, winner, p1_score, p2_score)
         await inter.followup.send("✅ Résultat enregistré.", ephemeral=True)
-        await self._post_bracket(inter, t["id"], title="🔄 Bracket Teams mis à jour")
+        await self._post_bracket(inter, t.id, title="🔄 Bracket Teams mis à jour")
         if next_id:
             await inter.channel.send(f"➡️ L'équipe gagnante avance au match `{next_id}`.")
 
@@ -404,7 +385,7 @@ class TeamTournamentCog(commands.Cog):
         if not t:
             await inter.followup.send("❌ Aucun tournoi Team vs Team actif.", ephemeral=True); return
         await inter.followup.send("✅ Bracket envoyé dans le salon.", ephemeral=True)
-        await self._post_bracket(inter, t["id"], title=f"🏆 {t['name']} — Bracket (Teams)")
+        await self._post_bracket(inter, t.id, title=f"🏆 {t.name} — Bracket (Teams)")
 
     # ------- CANCEL -------
     @group.command(name="cancel", description="Annuler le tournoi Team vs Team actif.")
@@ -413,11 +394,14 @@ class TeamTournamentCog(commands.Cog):
         if not is_admin_or_owner(self.bot, inter):
             await inter.followup.send("⛔ Réservé aux admins/owner.", ephemeral=True); return
         guild = inter.guild
-        t = guild and await tt_get_active(self.bot.settings.DB_PATH, guild.id)
-        if not t:
-            await inter.followup.send("❌ Aucun tournoi Team vs Team actif.", ephemeral=True); return
-        await tt_set_state(self.bot.settings.DB_PATH, t["id"], "cancelled")
-        await inter.followup.send("🛑 Tournoi Teams annulé.", ephemeral=True)
+        if not guild:
+            await inter.followup.send("❌ À utiliser en serveur.", ephemeral=True); return
+        async with guild_lock(guild.id, "tt"):
+            t = await tt_get_active(self.bot.settings.DB_PATH, guild.id)
+            if not t:
+                await inter.followup.send("❌ Aucun tournoi Team vs Team actif.", ephemeral=True); return
+            await tt_set_state(self.bot.settings.DB_PATH, t.id, "cancelled")
+            await inter.followup.send("🛑 Tournoi Teams annulé.", ephemeral=True)
 
     # ------- Helpers rendu -------
     async def _post_bracket(self, inter: discord.Interaction, tournament_id: int, title: str):
@@ -425,35 +409,39 @@ class TeamTournamentCog(commands.Cog):
         if not matches:
             await inter.channel.send("Aucun match (Teams).")
             return
+        guild = inter.guild
+
+        # Noms résolus une fois par équipe (et non à chaque apparition dans un match)
+        labels: Dict[int, str] = {}
+        for team_id, user_ids in (await tt_teams_map(self.bot.settings.DB_PATH, tournament_id)).items():
+            names = []
+            for uid in user_ids:
+                mem = guild.get_member(int(uid)) if guild else None
+                names.append(mem.display_name if mem else f"(id:{uid})")
+            labels[team_id] = ", ".join(names) or "—"
+
+        def fmt_team(team_id: Optional[int]) -> str:
+            return labels.get(team_id, "—") if team_id else "—"
+
         # group by round
         rounds = {}
         for m in matches:
-            rounds.setdefault(m["round"], []).append(m)
+            rounds.setdefault(m.round, []).append(m)
         for r in rounds.values():
-            r.sort(key=lambda x: x["pos_in_round"])
+            r.sort(key=lambda x: x.pos_in_round)
 
-        guild = inter.guild
         emb = discord.Embed(title=title, color=discord.Color.gold())
         for rnd in sorted(rounds.keys()):
             lines = []
             for m in rounds[rnd]:
-                def fmt_team(user_ids: List[int]) -> str:
-                    if not user_ids:
-                        return "—"
-                    names = []
-                    for uid in user_ids:
-                        mem = guild.get_member(int(uid)) if guild else None
-                        names.append(mem.display_name if mem else f"(id:{uid})")
-                    return ", ".join(names)
-
-                p1 = fmt_team(m["p1_team_json"])
-                p2 = fmt_team(m["p2_team_json"])
-                status = m["status"]
-                score = f" ({m['p1_score']}–{m['p2_score']})" if status == "done" else ""
+                p1 = fmt_team(m.p1_team_id)
+                p2 = fmt_team(m.p2_team_id)
+                status = m.status
+                score = f" ({m.p1_score}–{m.p2_score})" if status == "done" else ""
                 w = ""
-                if m.get("winner_team_json"):
-                    w = " → **" + fmt_team(m["winner_team_json"]) + "**"
-                lines.append(f"`#{m['id']}` {p1}  vs  {p2}  [{status}]{score}{w}")
+                if m.winner_team_id:
+                    w = " → **" + fmt_team(m.winner_team_id) + "**"
+                lines.append(f"`#{m.id}` {p1}  vs  {p2}  [{status}]{score}{w}")
             emb.add_field(name=f"Round {rnd}", value=("\n".join(lines) if lines else "—"), inline=False)
 
         await inter.channel.send(embed=emb)
@@ -12,6 +12,7 @@ from ..db import (
 )
 from ..tournament_logic import build_bracket_matches, resolve_next_ids
 from ..team_logic import parse_mentions
+from ..locks import guild_lock
 
 
 def is_admin_or_owner(bot: commands.Bot, inter: discord.Interaction) -> bool:
@@ -53,58 +54,59 @@ class TournamentCog(commands.Cog):
         mode: str = str(snap.get("mode", "—"))
         team_count: int = int(snap.get("team_count", len(teams)))
 
-        # 2) Trouver (ou créer) le tournoi actif
-        t = await get_active_tournament(self.bot.settings.DB_PATH, guild.id)
-
-        # En dry-run, on ne crée pas de tournoi s’il n’existe pas : on simule
-        created_now = False
-        if not t and not dry_run:
-            tid = await create_tournament(self.bot.settings.DB_PATH, guild.id, name, inter.user.id)
+        async with guild_lock(guild.id, "tournament"):
+            # 2) Trouver (ou créer) le tournoi actif
             t = await get_active_tournament(self.bot.settings.DB_PATH, guild.id)
-            created_now = True
-
-        tournament_id = int(t["id"]) if t else None
 
-        # 3) Participants déjà présents pour éviter les doublons
-        existing_ids = set()
-        if tournament_id is not None:
-            existing = await list_participants(self.bot.settings.DB_PATH, tournament_id)
-            existing_ids = {int(p["user_id"]) for p in existing}
-            start_seed = 1 + len(existing_ids)
-        else:
-            # Pas de tournoi actif (dry-run) : on simule une base vide
-            start_seed = 1
-
-        # 4) Construire l’ordre d’inscription (par blocs d’équipe ; tri interne rating décroissant)
-        ratings_cache: dict[int, float] = {}
-
-        async def _rating(uid: int) -> float:
-            if uid not in ratings_cache:
-                r = await get_rating(self.bot.settings.DB_PATH, uid)
-                ratings_cache[uid] = float(r) if r is not None else 1000.0
-            return ratings_cache[uid]
-
-        for team in teams:
-            for uid in team:
-                await _rating(uid)
-
-        ordered: list[int] = []
-        for team in teams:
-            ordered.extend(sorted(team, key=lambda u: ratings_cache.get(u, 1000.0), reverse=True))
-
-        # 5) Ajouter (ou simuler)
-        planned_rows = []
-        added = 0
-        seed = start_seed
-        for uid in ordered:
-            if uid in existing_ids:
-                planned_rows.append((seed, uid, ratings_cache.get(uid, 1000.0), True))
-                continue
-            planned_rows.append((seed, uid, ratings_cache.get(uid, 1000.0), False))
-            if not dry_run and tournament_id is not None:
-                await add_participant(self.bot.settings.DB_PATH, tournament_id, uid, seed, float(ratings_cache[uid]))
-            added += 1
-            seed += 1
+            # En dry-run, on ne crée pas de tournoi s’il n’existe pas : on simule
+            created_now = False
+            if not t and not dry_run:
+                tid = await create_tournament(self.bot.settings.DB_PATH, guild.id, name, inter.user.id)
+                t = await get_active_tournament(self.bot.settings.DB_PATH, guild.id)
+                created_now = True
+
+            tournament_id = int(t.id) if t else None
+
+            # 3) Participants déjà présents pour éviter les doublons
+            existing_ids = set()
+            if tournament_id is not None:
+                existing = await list_participants(self.bot.settings.DB_PATH, tournament_id)
+                existing_ids = {int(p.user_id) for p in existing}
+                start_seed = 1 + len(existing_ids)
+            else:
+                # Pas de tournoi actif (dry-run) : on simule une base vide
+                start_seed = 1
+
+            # 4) Construire l’ordre d’inscription (par blocs d’équipe ; tri interne rating décroissant)
+            ratings_cache: dict[int, float] = {}
+
+            async def _rating(uid: int) -> float:
+                if uid not in ratings_cache:
+                    r = await get_rating(self.bot.settings.DB_PATH, uid)
+                    ratings_cache[uid] = float(r) if r is not None else 1000.0
+                return ratings_cache[uid]
+
+            for team in teams:
+                for uid in team:
+                    await _rating(uid)
+
+            ordered: list[int] = []
+            for team in teams:
+                ordered.extend(sorted(team, key=lambda u: ratings_cache.get(u, 1000.0), reverse=True))
+
+            # 5) Ajouter (ou simuler)
+            planned_rows = []
+            added = 0
+            seed = start_seed
+            for uid in ordered:
+                if uid in existing_ids:
+                    planned_rows.append((seed, uid, ratings_cache.get(uid, 1000.0), True))
+                    continue
+                planned_rows.append((seed, uid, ratings_cache.get(uid, 1000.0), False))
+                if not dry_run and tournament_id is not None:
+                    await add_participant(self.bot.settings.DB_PATH, tournament_id, uid, seed, float(ratings_cache[uid]))
+                added += 1
+                seed += 1
 
         # 6) Rendu UX (embed)
         def _name(uid: int) -> str:
@@ -114,12 +116,12 @@ class TournamentCog(commands.Cog):
         if dry_run:
             title_prefix = "🧪 APERÇU (dry-run)"
             footer_note = "Aucune écriture effectuée. Relance sans `dry_run` pour appliquer."
-            tour_label = (t["name"] if t else f"(sera créé : {name})")
+            tour_label = (t.name if t else f"(sera créé : {name})")
             tour_id_txt = (f"(id: `{tournament_id}`)" if tournament_id is not None else "(pas encore créé)")
         else:
             title_prefix = "👥 Import effectué"
             footer_note = "—"
-            tour_label = t["name"] if t else name
+            tour_label = t.name if t else name
             tour_id_txt = f"(id: `{tournament_id}`)" if tournament_id is not None else ""
 
         title = f"{title_prefix} — dernière config (mode: {mode}, équipes: {team_count})"
@@ -153,11 +155,12 @@ class TournamentCog(commands.Cog):
         guild = inter.guild
         if not guild:
             await inter.followup.send("❌ À utiliser en serveur.", ephemeral=True); return
-        active = await get_active_tournament(self.bot.settings.DB_PATH, guild.id)
-        if active:
-            await inter.followup.send(f"⚠️ Un tournoi est déjà actif: **{active['name']}** (état: {active['state']}).", ephemeral=True); return
-        tid = await create_tournament(self.bot.settings.DB_PATH, guild.id, name, inter.user.id)
-        await inter.followup.send(f"✅ Tournoi **{name}** créé (id: `{tid}`) — ajoutez des participants avec `/tournament add` puis `/tournament start`.", ephemeral=True)
+        async with guild_lock(guild.id, "tournament"):
+            active = await get_active_tournament(self.bot.settings.DB_PATH, guild.id)
+            if active:
+                await inter.followup.send(f"⚠️ Un tournoi est déjà actif: **{active.name}** (état: {active.state}).", ephemeral=True); return
+            tid = await create_tournament(self.bot.settings.DB_PATH, guild.id, name, inter.user.id)
+            await inter.followup.send(f"✅ Tournoi **{name}** créé (id: `{tid}`) — ajoutez des participants avec `/tournament add` puis `/tournament start`.", ephemeral=True)
 
     # ------- ADD -------
     @group.command(name="add", description="Ajouter des participants (mentions ou salon vocal).")
@@ -167,40 +170,41 @@ class TournamentCog(commands.Cog):
         guild = inter.guild
         if not guild:
             await inter.followup.send("❌ À utiliser en serveur.", ephemeral=True); return
-        t = await get_active_tournament(self.bot.settings.DB_PATH, guild.id)
-        if not t or t["state"] != "setup":
-            await inter.followup.send("❌ Aucun tournoi en préparation. Lance `/tournament create`.", ephemeral=True); return
-
-        # Collecte
-        selected: List[discord.Member] = []
-        if members.strip():
-            selected = parse_mentions(guild, members)
-        else:
-            me = guild.get_member(inter.user.id)
-            if me and me.voice and me.voice.channel:
-                selected = [m for m in me.voice.channel.members if not m.bot]
+        async with guild_lock(guild.id, "tournament"):
+            t = await get_active_tournament(self.bot.settings.DB_PATH, guild.id)
+            if not t or t.state != "setup":
+                await inter.followup.send("❌ Aucun tournoi en préparation. Lance `/tournament create`.", ephemeral=True); return
+
+            # Collecte
+            selected: List[discord.Member] = []
+            if members.strip():
+                selected = parse_mentions(guild, members)
             else:
-                await inter.followup.send("❌ Pas de mentions et tu n'es pas en vocal.", ephemeral=True); return
+                me = guild.get_member(inter.user.id)
+                if me and me.voice and me.voice.channel:
+                    selected = [m for m in me.voice.channel.members if not m.bot]
+                else:
+                    await inter.followup.send("❌ Pas de mentions et tu n'es pas en vocal.", ephemeral=True); return
 
-        if not selected:
-            await inter.followup.send("❌ Aucun joueur trouvé.", ephemeral=True); return
+            if not selected:
+                await inter.followup.send("❌ Aucun joueur trouvé.", ephemeral=True); return
 
-        # Seed par rating décroissant
-        pairs = []
-        for m in selected:
-            r = await get_rating(self.bot.settings.DB_PATH, m.id)
-            pairs.append((m, int(r) if r is not None else 1000))
-        pairs.sort(key=lambda x: x[1], reverse=True)
+            # Seed par rating décroissant
+            pairs = []
+            for m in selected:
+                r = await get_rating(self.bot.settings.DB_PATH, m.id)
+                pairs.append((m, int(r) if r is not None else 1000))
+            pairs.sort(key=lambda x: x[1], reverse=True)
 
-        # Évite d'écraser les seeds existants
-        existing = await list_participants(self.bot.settings.DB_PATH, t["id"])
-        next_seed = 1 + len(existing)
+            # Évite d'écraser les seeds existants
+            existing = await list_participants(self.bot.settings.DB_PATH, t.id)
+            next_seed = 1 + len(existing)
 
-        for i, (m, r) in enumerate(pairs, start=0):
-            await add_participant(self.bot.settings.DB_PATH, t["id"], m.id, next_seed + i, r)
+            for i, (m, r) in enumerate(pairs, start=0):
+                await add_participant(self.bot.settings.DB_PATH, t.id, m.id, next_seed + i, r)
 
-        names = ", ".join(f"{m.display_name}" for m, _ in pairs)
-        await inter.followup.send(f"✅ Ajouté {len(pairs)} joueurs: {names}", ephemeral=True)
+            names = ", ".join(f"{m.display_name}" for m, _ in pairs)
+            await inter.followup.send(f"✅ Ajouté {len(pairs)} joueurs: {names}", ephemeral=True)
 
     # ------- START -------
     @group.command(name="start", description="Démarrer le bracket (single elimination).")
@@ -213,59 +217,60 @@ class TournamentCog(commands.Cog):
         guild = inter.guild
         if not guild:
             await inter.followup.send("❌ À utiliser en serveur.", ephemeral=True); return
-        t = await get_active_tournament(self.bot.settings.DB_PATH, guild.id)
-        if not t or t["state"] != "setup":
-            await inter.followup.send("❌ Aucun tournoi en préparation.", ephemeral=True); return
-
-        part = await list_participants(self.bot.settings.DB_PATH, t["id"])
-        if len(part) < 2:
-            await inter.followup.send("❌ Il faut au moins 2 joueurs.", ephemeral=True); return
-
-        user_ids_by_seed = [int(p["user_id"]) for p in part]  # déjà triés par seed ASC
-        raw_matches = build_bracket_matches(user_ids_by_seed, best_of=best_of)
-
-        # 1) insertion "vierge" (next_match_id=None)
-        await clear_bracket(self.bot.settings.DB_PATH, t["id"])
-        for m in raw_matches:
-            m["next_match_id"] = None
-
-        await create_matches(self.bot.settings.DB_PATH, t["id"], [
-            {
-                "round": m["round"],
-                "pos_in_round": m["pos_in_round"],
-                "p1_user_id": m["p1_user_id"],
-                "p2_user_id": m["p2_user_id"],
-                "best_of": m["best_of"],
-                "status": m["status"],
-                "next_match_id": None,
-                "next_slot": m["next_slot"]
-            } for m in raw_matches
-        ])
-
-        # 2) lire les lignes créées et les ordonner comme raw_matches
-        created = await list_matches(self.bot.settings.DB_PATH, t["id"])
-        created.sort(key=lambda r: (r["round"], r["pos_in_round"]))
-        sql_ids = [row["id"] for row in created]
-
-        # 3) calculer les bons next_match_id
-        resolved = resolve_next_ids(sql_ids, raw_matches)
-
-        # 4) mettre à jour en place (et non pas ré-effacer/ré-créer)
-        id_by_key = {(r["round"], r["pos_in_round"]): r["id"] for r in created}
-        updates = []
-        for m in resolved:
-            if m["next_match_id"] is None:
-                continue
-            mid = id_by_key[(m["round"], m["pos_in_round"])]
-            updates.append((mid, m["next_match_id"], m["next_slot"]))
-
-        if updates:
-            await set_next_links(self.bot.settings.DB_PATH, t["id"], updates)
-
-        await set_tournament_state(self.bot.settings.DB_PATH, t["id"], "running", started=True)
+        async with guild_lock(guild.id, "tournament"):
+            t = await get_active_tournament(self.bot.settings.DB_PATH, guild.id)
+            if not t or t.state != "setup":
+                await inter.followup.send("❌ Aucun tournoi en préparation.", ephemeral=True); return
+
+            part = await list_participants(self.bot.settings.DB_PATH, t.id)
+            if len(part) < 2:
+                await inter.followup.send("❌ Il faut au moins 2 joueurs.", ephemeral=True); return
+
+            user_ids_by_seed = [int(p.user_id) for p in part]  # déjà triés par seed ASC
+            raw_matches = build_bracket_matches(user_ids_by_seed, best_of=best_of)
+
+            # 1) insertion "vierge" (next_match_id=None)
+            await clear_bracket(self.bot.settings.DB_PATH, t.id)
+            for m in raw_matches:
+                m["next_match_id"] = None
+
+            await create_matches(self.bot.settings.DB_PATH, t.id, [
+                {
+                    "round": m["round"],
+                    "pos_in_round": m["pos_in_round"],
+                    "p1_user_id": m["p1_user_id"],
+                    "p2_user_id": m["p2_user_id"],
+                    "best_of": m["best_of"],
+                    "status": m["status"],
+                    "next_match_id": None,
+                    "next_slot": m["next_slot"]
+                } for m in raw_matches
+            ])
+
+            # 2) lire les lignes créées et les ordonner comme raw_matches
+            created = await list_matches(self.bot.settings.DB_PATH, t.id)
+            created.sort(key=lambda r: (r.round, r.pos_in_round))
+            sql_ids = [row.id for row in created]
+
+            # 3) calculer les bons next_match_id
+            resolved = resolve_next_ids(sql_ids, raw_matches)
+
+            # 4) mettre à jour en place (et non pas ré-effacer/ré-créer)
+            id_by_key = {(r.round, r.pos_in_round): r.id for r in created}
+            updates = []
+            for m in resolved:
+                if m["next_match_id"] is None:
+                    continue
+                mid = id_by_key[(m["round"], m["pos_in_round"])]
+                updates.append((mid, m["next_match_id"], m["next_slot"]))
+
+            if updates:
+                await set_next_links(self.bot.settings.DB_PATH, t.id, updates)
+
+            await set_tournament_state(self.bot.settings.DB_PATH, t.id, "running", started=True)
 
         await inter.followup.send("✅ Tournoi démarré ! Utilisez `/tournament view` pour voir le bracket.", ephemeral=True)
-        await self._post_bracket(inter, t["id"], title=f"🏆 {t['name']} — Round 1")
+        await self._post_bracket(inter, t.id, title=f"🏆 {t.name} — Round 1")
 
     # ------- REPORT -------
     @group.command(name="report", description="Reporter le résultat d'un match.")
@@ -276,13 +281,16 @@ class TournamentCog(commands.Cog):
             await inter.followup.send("⛔ Réservé aux admins/owner pour l’instant.", ephemeral=True); return
 
         guild = inter.guild
-        t = guild and await get_active_tournament(self.bot.settings.DB_PATH, guild.id)
-        if not t or t["state"] != "running":
-            await inter.followup.send("❌ Pas de tournoi en cours.", ephemeral=True); return
+        if not guild:
+            await inter.followup.send("❌ À utiliser en serveur.", ephemeral=True); return
+        async with guild_lock(guild.id, "tournament"):
+            t = await get_active_tournament(self.bot.settings.DB_PATH, guild.id)
+            if not t or t.state != "running":
+                await inter.followup.send("❌ Pas de tournoi en cours.", ephemeral=True); return
 
-        next_id = await report_match_result(self.bot.settings.DB_PATH, t["id"], match_id, winner.id, p1_score, p2_score)
+            next_id = await report_match_result(self.bot.settings.DB_PATH, t.id, match_id, winner.id, p1_score, p2_score)
         await inter.followup.send("✅ Résultat enregistré.", ephemeral=True)
-        await self._post_bracket(inter, t["id"], title="🔄 Bracket mis à jour")
+        await self._post_bracket(inter, t.id, title="🔄 Bracket mis à jour")
         if next_id:
             await inter.channel.send(f"➡️ Le vainqueur avance au match `{next_id}`.")
 
@@ -295,7 +303,7 @@ class TournamentCog(commands.Cog):
         if not t:
             await inter.followup.send("❌ Aucun tournoi actif.", ephemeral=True); return
         await inter.followup.send("✅ Bracket envoyé dans le salon.", ephemeral=True)
-        await self._post_bracket(inter, t["id"], title=f"🏆 {t['name']} — Bracket")
+        await self._post_bracket(inter, t.id, title=f"🏆 {t.name} — Bracket")
 
     # ------- CANCEL -------
     @group.command(name="cancel", description="Annuler le tournoi actif.")
@@ -304,11 +312,14 @@ class TournamentCog(commands.Cog):
         if not is_admin_or_owner(self.bot, inter):
             await inter.followup.send("⛔ Réservé aux admins/owner.", ephemeral=True); return
         guild = inter.guild
-        t = guild and await get_active_tournament(self.bot.settings.DB_PATH, guild.id)
-        if not t:
-            await inter.followup.send("❌ Aucun tournoi actif.", ephemeral=True); return
-        await set_tournament_state(self.bot.settings.DB_PATH, t["id"], "cancelled")
-        await inter.followup.send("🛑 Tournoi annulé.", ephemeral=True)
+        if not guild:
+            await inter.followup.send("❌ À utiliser en serveur.", ephemeral=True); return
+        async with guild_lock(guild.id, "tournament"):
+            t = await get_active_tournament(self.bot.settings.DB_PATH, guild.id)
+            if not t:
+                await inter.followup.send("❌ Aucun tournoi actif.", ephemeral=True); return
+            await set_tournament_state(self.bot.settings.DB_PATH, t.id, "cancelled")
+            await inter.followup.send("🛑 Tournoi annulé.", ephemeral=True)
 
     # ------- helpers -------
     async def _post_bracket(self, inter: discord.Interaction, tournament_id: int, title: str):
@@ -319,21 +330,21 @@ class TournamentCog(commands.Cog):
         # Group by round
         rounds = {}
         for m in matches:
-            rounds.setdefault(m["round"], []).append(m)
+            rounds.setdefault(m.round, []).append(m)
         # tri
         for r in rounds.values():
-            r.sort(key=lambda x: x["pos_in_round"])
+            r.sort(key=lambda x: x.pos_in_round)
 
         emb = discord.Embed(title=title, color=discord.Color.gold())
         for rnd in sorted(rounds.keys()):
             lines = []
             for m in rounds[rnd]:
-                p1 = f"<@{m['p1_user_id']}>" if m["p1_user_id"] else "—"
-                p2 = f"<@{m['p2_user_id']}>" if m["p2_user_id"] else "—"
-                status = m["status"]
-                score = f" ({m['p1_score']}–{m['p2_score']})" if status == "done" else ""
-                w = f" → **<@{m['winner_user_id']}>**" if m.get("winner_user_id") else ""
-                lines.append(f"`#{m['id']}` {p1} vs {p2} [{status}]{score}{w}")
+                p1 = f"<@{m.p1_user_id}>" if m.p1_user_id else "—"
+                p2 = f"<@{m.p2_user_id}>" if m.p2_user_id else "—"
+                status = m.status
+                score = f" ({m.p1_score}–{m.p2_score})" if status == "done" else ""
+                w = f" → **<@{m.winner_user_id}>**" if m.winner_user_id else ""
+                lines.append(f"`#{m.id}` {p1} vs {p2} [{status}]{score}{w}")
             emb.add_field(name=f"Round {rnd}", value="\n".join(lines), inline=False)
 
         await inter.channel.send(embed=emb)
@@ -10,6 +10,11 @@ def _str2bool(x: str | None, default: bool = True) -> bool:
     x = x.strip().lower()
     return x in {"1", "true", "t", "yes", "y", "on"}
 
+def _int_or_none(x: str | None) -> int | None:
+    if x is None or not x.strip():
+        return None
+    return int(x)
+
 @dataclass(frozen=True)
 class Settings:
     DISCORD_BOT_TOKEN: str
@@ -19,6 +24,29 @@ class Settings:
     DB_PATH: Path
     RIOT_API_KEY: str | None
     ENABLE_TRASH_TALK: bool  # nouveau flag
+    # Profil SQLite (safe | balanced | fast) + surcharges optionnelles (None = valeur du profil)
+    DB_PROFILE: str
+    DB_MMAP_SIZE: int | None
+    DB_CACHE_SIZE: int | None  # négatif = KiB, positif = pages (sémantique PRAGMA cache_size)
+    DB_BUSY_TIMEOUT_MS: int | None
+    # Write-behind (écritures non critiques) : lot vidé toutes les N ms ou dès M écritures
+    WRITE_BEHIND_INTERVAL_MS: int
+    WRITE_BEHIND_MAX_BATCH: int
+    RATINGS_CACHE_SIZE: int  # entrées max du cache LRU des ratings
+    # Mode mémoire : base servie depuis :memory:, recopiée sur DB_PATH toutes les N s et à l'arrêt.
+    # Un crash (kill -9, OOM, panne) perd au plus les N dernières secondes d'écritures.
+    DB_IN_MEMORY: bool
+    DB_MEMORY_PERSIST_S: int
+    # Maintenance DB quotidienne (heure UTC, -1 = désactivée) et rétention
+    MAINTENANCE_HOUR: int
+    MAINTENANCE_SESSION_DAYS: int      # sessions TeamRoll inactives purgées après N jours
+    ARCHIVE_AFTER_DAYS: int            # tournois / arenas terminés déplacés dans les tables *_archive après N jours
+    TEAM_HISTORY_KEEP: int             # signatures conservées par bucket
+    SLOW_QUERY_MS: int                 # requêtes plus lentes journalisées (SQL + paramètres masqués), 0 = off
+    METRICS_HOST: str                  # interface du endpoint Prometheus GET /metrics
+    METRICS_PORT: int                  # port du endpoint /metrics, 0 = désactivé
+    LOOP_LAG_INTERVAL_MS: int          # période de mesure du retard de la boucle asyncio
+    LOOP_STALL_MS: int                 # blocage au-delà duquel la pile de la boucle est capturée, 0 = off
 
 def load_settings() -> Settings:
     # Charge .env à côté de ce fichier (si présent)
@@ -36,4 +64,22 @@ def load_settings() -> Settings:
         DB_PATH=Path(os.getenv("DB_PATH", str(Path(__file__).parents[1] / "skills.db"))),
         RIOT_API_KEY=os.getenv("RIOT_API_KEY") or None,
         ENABLE_TRASH_TALK=_str2bool(os.getenv("ENABLE_TRASH_TALK"), default=True),
+        DB_PROFILE=os.getenv("DB_PROFILE", "balanced").strip().lower(),
+        DB_MMAP_SIZE=_int_or_none(os.getenv("DB_MMAP_SIZE")),
+        DB_CACHE_SIZE=_int_or_none(os.getenv("DB_CACHE_SIZE")),
+        DB_BUSY_TIMEOUT_MS=_int_or_none(os.getenv("DB_BUSY_TIMEOUT_MS")),
+        WRITE_BEHIND_INTERVAL_MS=int(os.getenv("WRITE_BEHIND_INTERVAL_MS", "250")),
+        WRITE_BEHIND_MAX_BATCH=int(os.getenv("WRITE_BEHIND_MAX_BATCH", "64")),
+        RATINGS_CACHE_SIZE=int(os.getenv("RATINGS_CACHE_SIZE", "5000")),
+        DB_IN_MEMORY=_str2bool(os.getenv("DB_IN_MEMORY"), default=False),
+        DB_MEMORY_PERSIST_S=max(1, int(os.getenv("DB_MEMORY_PERSIST_S", "30"))),
+        MAINTENANCE_HOUR=int(os.getenv("MAINTENANCE_HOUR", "4")),
+        MAINTENANCE_SESSION_DAYS=int(os.getenv("MAINTENANCE_SESSION_DAYS", "90")),
+        ARCHIVE_AFTER_DAYS=int(os.getenv("ARCHIVE_AFTER_DAYS", "30")),
+        TEAM_HISTORY_KEEP=int(os.getenv("TEAM_HISTORY_KEEP", "200")),
+        SLOW_QUERY_MS=int(os.getenv("SLOW_QUERY_MS", "200")),
+        METRICS_HOST=os.getenv("METRICS_HOST", "127.0.0.1"),
+        METRICS_PORT=int(os.getenv("METRICS_PORT", "9108")),
+        LOOP_LAG_INTERVAL_MS=int(os.getenv("LOOP_LAG_INTERVAL_MS", "100")),
+        LOOP_STALL_MS=int(os.getenv("LOOP_STALL_MS", "250")),
     )
@@ -1,126 +1,434 @@
 # app/db.py
 from __future__ import annotations
 
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Optional, Tuple, List, Set, Dict, Iterable
-
+from typing import Optional, Tuple, List, Set, Dict, Iterable, AsyncIterator
+
+import asyncio
+import copy
+import csv
+import gzip
+import io
+import lzma
+import shutil
 import time
 import itertools
+import zipfile
+import sqlite3
 import aiosqlite
 import json
+from types import MappingProxyType
+
+from .cache import LRUCache, MISSING, cache_stats
+from .codec import decode_ids, encode_ids
+from .dbstats import instrument, query_stats, trace_connection, trace_sqlite3
+from .locks import lock_stats
+from .records import Arena, Match, Participant, Record, TeamTournament, Tournament
+from .writebehind import WriteBehindQueue
 
 
 # =========================
-# Init DB (toutes les tables)
+# Connexions : profil de performance SQLite
 # =========================
-async def init_db(db_path: Path):
-    async with aiosqlite.connect(db_path) as db:
-        # Important pour ON DELETE CASCADE
-        await db.execute("PRAGMA foreign_keys = ON;")
+# journal_mode est persistant (stocké dans le fichier) : appliqué une fois dans init_db.
+# Les autres PRAGMA sont par connexion : appliqués par connect() à chaque ouverture.
+DB_PROFILES: Dict[str, Dict[str, object]] = {
+    # Comportement historique (journal rollback, fsync à chaque commit)
+    "safe": {
+        "journal_mode": "DELETE", "synchronous": "FULL",
+        "mmap_size": 0, "cache_size": -2000, "temp_store": "DEFAULT", "busy_timeout": 5000,
+    },
+    # Défaut : WAL + synchronous=NORMAL (durable hors crash OS/coupure, fsync au checkpoint)
+    "balanced": {
+        "journal_mode": "WAL", "synchronous": "NORMAL",
+        "mmap_size": 64 * 1024 * 1024, "cache_size": -16000, "temp_store": "MEMORY", "busy_timeout": 5000,
+    },
+    # Débit max : plus aucun fsync — une coupure machine peut perdre les derniers commits
+    "fast": {
+        "journal_mode": "WAL", "synchronous": "OFF",
+        "mmap_size": 256 * 1024 * 1024, "cache_size": -64000, "temp_store": "MEMORY", "busy_timeout": 5000,
+    },
+}
+
+_PROFILE: Dict[str, object] = dict(DB_PROFILES["balanced"])
+
+
+def configure_db(profile: str = "balanced", **overrides) -> Dict[str, object]:
+    """
+    Choisit le profil appliqué par connect() / init_db.
+    overrides : mmap_size, cache_size, busy_timeout… (None = valeur du profil).
+    """
+    if profile not in DB_PROFILES:
+        raise ValueError(f"Profil DB inconnu: {profile} (attendu: {', '.join(DB_PROFILES)})")
+    conf = dict(DB_PROFILES[profile])
+    for k, v in overrides.items():
+        if k not in conf:
+            raise ValueError(f"PRAGMA non géré: {k}")
+        if v is not None:
+            conf[k] = v
+    _PROFILE.clear()
+    _PROFILE.update(conf)
+    return dict(_PROFILE)
+
+
+def _connection_pragmas() -> str:
+    return (
+        f"PRAGMA synchronous = {_PROFILE['synchronous']};"
+        f"PRAGMA mmap_size = {int(_PROFILE['mmap_size'])};"
+        f"PRAGMA cache_size = {int(_PROFILE['cache_size'])};"
+        f"PRAGMA temp_store = {_PROFILE['temp_store']};"
+        f"PRAGMA busy_timeout = {int(_PROFILE['busy_timeout'])};"
+    )
 
-        # ---- Skills / Liens LoL / Rang LoL ----
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS skills (
-            user_id TEXT PRIMARY KEY,
-            rating REAL NOT NULL
-        )""")
 
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS lol_links (
-            user_id TEXT PRIMARY KEY,
-            summoner_name TEXT NOT NULL,
-            region TEXT NOT NULL
-        )""")
+# =========================
+# Mode mémoire (DB_IN_MEMORY) : base chargée en :memory:, recopiée sur disque périodiquement
+# =========================
+class _MemoryDB:
+    """
+    Connexion :memory: unique, partagée par tous les repositories pour `disk_path`.
+    Accès sérialisé par un verrou (réentrant pour la tâche qui le détient) : chaque bloc
+    `async with connect(...)` garde ainsi sa transaction pour lui, comme avec une connexion dédiée.
+    Durabilité : tout ce qui est écrit depuis le dernier persist() est perdu en cas de crash.
+    """
 
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS lol_rank (
-            user_id TEXT PRIMARY KEY,
-            source TEXT NOT NULL, -- offline/riot
-            tier TEXT NOT NULL,
-            division TEXT,
-            lp INTEGER NOT NULL DEFAULT 0,
-            updated_at INTEGER NOT NULL
-        )""")
-
-        # ---- Tournoi (user vs user) ----
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS tournaments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            guild_id TEXT NOT NULL,
-            name TEXT NOT NULL,
-            state TEXT NOT NULL, -- setup | running | finished | cancelled
-            created_by TEXT NOT NULL,
-            created_at INTEGER NOT NULL,
-            started_at INTEGER
-        )""")
+    def __init__(self, disk_path, conn: aiosqlite.Connection):
+        self.disk_path = Path(disk_path)
+        self.aliases = {str(disk_path), str(self.disk_path), str(self.disk_path.resolve())}
+        self.conn = conn
+        self.lock = asyncio.Lock()
+        self.owner: Optional[asyncio.Task] = None
+        self.stats = {"persists": 0, "last_persist_ms": 0.0, "last_persist_at": 0}
+
+    def serves(self, db_path) -> bool:
+        return str(db_path) in self.aliases
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[aiosqlite.Connection]:
+        # Ne jamais attendre WRITE_BEHIND.flush() dans un bloc connect() : l'écrivain (autre tâche)
+        # a besoin de ce même verrou, tenu ici jusqu'à la fin du bloc -> interblocage en mode mémoire.
+        # Vider la file avant d'ouvrir la connexion (cf. load_team_signatures, run_maintenance).
+        task = asyncio.current_task()
+        if self.owner is task:
+            yield self.conn  # appel imbriqué dans la même tâche : même connexion, même transaction
+            return
+        async with self.lock:
+            self.owner = task
+            try:
+                yield self.conn
+            finally:
+                self.owner = None
+                # Une connexion dédiée fermée sans commit annule sa transaction : même contrat ici
+                if self.conn.in_transaction:
+                    await self.conn.rollback()
+
+    async def persist(self) -> float:
+        """Copie la base mémoire vers disk_path (API backup, état cohérent). Retourne la durée en ms."""
+        t0 = time.perf_counter()
+        async with self.session() as mem:
+            async with aiosqlite.connect(self.disk_path, check_same_thread=False,
+                                         timeout=int(_PROFILE["busy_timeout"]) / 1000) as disk:
+                await mem.backup(disk)
+        ms = (time.perf_counter() - t0) * 1000
+        self.stats.update(persists=self.stats["persists"] + 1, last_persist_ms=ms, last_persist_at=int(time.time()))
+        return ms
+
+
+_MEMORY: Optional[_MemoryDB] = None
+
+
+async def _open_memory_db(db_path) -> _MemoryDB:
+    global _MEMORY
+    if _MEMORY is not None:
+        return _MEMORY
+    mem = trace_connection(await aiosqlite.connect(":memory:", check_same_thread=False))
+    await mem.executescript(_connection_pragmas())
+    if Path(db_path).exists():
+        async with aiosqlite.connect(db_path, check_same_thread=False) as disk:
+            await disk.backup(mem)
+    _MEMORY = _MemoryDB(db_path, mem)
+    return _MEMORY
+
+
+async def persist_memory_db() -> Optional[float]:
+    """Mode mémoire : recopie immédiate sur disque (durée en ms) ; None si le mode n'est pas actif."""
+    return await _MEMORY.persist() if _MEMORY is not None else None
+
+
+async def close_memory_db():
+    """Mode mémoire : dernière recopie sur disque puis fermeture (appelé par TeamBot.close)."""
+    global _MEMORY
+    if _MEMORY is None:
+        return
+    await _MEMORY.persist()
+    await _MEMORY.conn.close()
+    _MEMORY = None
 
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS tournament_participants (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            tournament_id INTEGER NOT NULL,
-            user_id TEXT NOT NULL,
-            seed INTEGER NOT NULL,
-            rating REAL NOT NULL,
-            UNIQUE(tournament_id, user_id)
-        )""")
 
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS tournament_matches (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            tournament_id INTEGER NOT NULL,
-            round INTEGER NOT NULL,
-            pos_in_round INTEGER NOT NULL, -- index du match dans la ronde
-            p1_user_id TEXT,
-            p2_user_id TEXT,
-            p1_score INTEGER DEFAULT 0,
-            p2_score INTEGER DEFAULT 0,
-            best_of INTEGER NOT NULL DEFAULT 1,
-            winner_user_id TEXT,
-            status TEXT NOT NULL, -- pending | open | done
-            next_match_id INTEGER,
-            next_slot INTEGER -- 1 ou 2 (position dans le match suivant)
-        )""")
-
-        # ---- TeamRolls (sessions & paires) ----
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS team_sessions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            guild_id TEXT NOT NULL,
-            name TEXT NOT NULL,
-            created_at INTEGER NOT NULL
-        )""")
+def memory_db_stats() -> Optional[Dict[str, object]]:
+    return dict(_MEMORY.stats) if _MEMORY is not None else None
 
-        await db.execute("""
-        CREATE UNIQUE INDEX IF NOT EXISTS idx_team_sessions_unique
-        ON team_sessions(guild_id, name)
-        """)
 
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS team_pair_counts (
-            session_id INTEGER NOT NULL,
-            user_a TEXT NOT NULL,
-            user_b TEXT NOT NULL,
-            count INTEGER NOT NULL DEFAULT 0,
-            PRIMARY KEY (session_id, user_a, user_b),
-            FOREIGN KEY(session_id) REFERENCES team_sessions(id) ON DELETE CASCADE
-        )""")
+@asynccontextmanager
+async def connect(db_path) -> AsyncIterator[aiosqlite.Connection]:
+    """Ouvre une connexion configurée selon le profil courant (à utiliser partout à la place d'aiosqlite.connect)."""
+    if _MEMORY is not None and _MEMORY.serves(db_path):
+        async with _MEMORY.session() as db:
+            yield db
+        return
+    async with aiosqlite.connect(db_path, timeout=int(_PROFILE["busy_timeout"]) / 1000) as db:
+        await db.executescript(_connection_pragmas())
+        yield trace_connection(db)
 
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS team_last (
-            guild_id TEXT PRIMARY KEY,
-            snapshot_json TEXT NOT NULL,
-            updated_at INTEGER NOT NULL
-        )""")
 
-        await db.execute("""
-        CREATE INDEX IF NOT EXISTS idx_team_pairs_by_session
-        ON team_pair_counts(session_id)
-        """)
+# INSERT … RETURNING (SQLite >= 3.35) : la ligne créée revient avec l'INSERT, sans SELECT de relecture
+_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
 
-        # ---- Historique des compositions (signatures fortes) ----
-        await _ensure_team_history_table(db)
 
-        await db.commit()
+async def _insert_returning(db: aiosqlite.Connection, table: str, sql: str, params: tuple,
+                            columns: str = "*") -> dict:
+    """Exécute l'INSERT `sql` sur `table` et retourne `columns` de la ligne créée (repli : relecture par rowid)."""
+    if _HAS_RETURNING:
+        cur = await db.execute(f"{sql} RETURNING {columns}", params)
+    else:
+        cur = await db.execute(sql, params)
+        rowid = cur.lastrowid
+        await cur.close()
+        cur = await db.execute(f"SELECT {columns} FROM {table} WHERE rowid=?", (rowid,))
+    row = await cur.fetchone()
+    cols = [c[0] for c in cur.description]
+    await cur.close()
+    return dict(zip(cols, row))
+
+
+async def fetch_record(db: aiosqlite.Connection, cls: type, sql: str, params: tuple) -> Optional[Record]:
+    """Première ligne de `sql` (SELECT {cls.COLUMNS} …) sous forme de record, ou None."""
+    async with db.execute(sql, params) as cur:
+        cur.row_factory = cls.from_row
+        return await cur.fetchone()
+
+
+async def fetch_records(db: aiosqlite.Connection, cls: type, sql: str, params: tuple) -> list:
+    async with db.execute(sql, params) as cur:
+        cur.row_factory = cls.from_row
+        return await cur.fetchall()
+
+
+# Écritures non critiques différées (snapshot /team, signatures, pruning, rang LoL) :
+# les fonctions concernées acceptent defer=True ; leurs lectures passent par WRITE_BEHIND.flush().
+WRITE_BEHIND = WriteBehindQueue(connect)
+
+
+# =========================
+# Cache de l'état « compétition active » par serveur
+# =========================
+# (db_path, kind, guild_id) -> record de la compétition active (app/records.py), ou None (aucune :
+# résultat négatif caché). kind : 'tournament' | 'tt' | 'arena'. Rempli au premier accès, mis à jour par
+# chaque fonction de mutation. Les records sont immuables : servis tels quels, sans copie.
+ACTIVE_CACHE = LRUCache("active_state", maxsize=2048)
+ACTIVE_STATES = ("setup", "running")
+# Génération par clé : une lecture DB commencée avant une mutation ne doit pas écraser le cache après elle
+_ACTIVE_GEN: Dict[tuple, int] = {}
+
+
+def _active_key(db_path, kind: str, guild_id: int) -> tuple:
+    return (str(db_path), kind, int(guild_id))
+
+
+async def cached_active(db_path, kind: str, guild_id: int, loader) -> Optional[Record]:
+    """Lecture via le cache ; `loader()` (coroutine) n'est appelé qu'en cas d'absence."""
+    key = _active_key(db_path, kind, guild_id)
+    hit = ACTIVE_CACHE.get(key)
+    if hit is not MISSING:
+        return hit
+    gen = _ACTIVE_GEN.get(key, 0)
+    value = await loader()
+    if _ACTIVE_GEN.get(key, 0) == gen:
+        ACTIVE_CACHE.put(key, value)
+    return value
+
+
+def update_active_cache(db_path, kind: str, row: Optional[Record]) -> None:
+    """
+    Après une mutation : `row` est l'état relu de la compétition modifiée.
+    Toujours active -> elle devient l'entrée du cache ; terminée/annulée -> entrée oubliée
+    (relue au prochain accès, qui mettra en cache le résultat négatif).
+    """
+    if not row:
+        return
+    if row.state in ACTIVE_STATES:
+        key = _active_key(db_path, kind, row.guild_id)
+        _ACTIVE_GEN[key] = _ACTIVE_GEN.get(key, 0) + 1
+        ACTIVE_CACHE.put(key, row)
+    else:
+        _forget_active(db_path, kind, row.guild_id)
+
+
+def _forget_active(db_path, kind: str, guild_id: int) -> None:
+    """Oublie l'entrée du cache (relue au prochain accès)."""
+    key = _active_key(db_path, kind, guild_id)
+    _ACTIVE_GEN[key] = _ACTIVE_GEN.get(key, 0) + 1
+    ACTIVE_CACHE.pop(key)
+
+
+# Compétitions terminées déplacées dans les tables *_archive (cf. archive_competitions)
+def table_for(name: str, archived: bool = False) -> str:
+    return f"{name}_archive" if archived else name
+
+
+# =========================
+# Init DB : migrations versionnées (PRAGMA user_version)
+# =========================
+# Le schéma n'est créé / migré qu'ici, une seule fois au démarrage (setup_hook).
+# Les fonctions de repository ci-dessous ne font donc jamais de DDL.
+
+BASE_SCHEMA_SQL = """
+-- ---- Skills / Liens LoL / Rang LoL ----
+CREATE TABLE IF NOT EXISTS skills (
+    user_id TEXT PRIMARY KEY,
+    rating REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS lol_links (
+    user_id TEXT PRIMARY KEY,
+    summoner_name TEXT NOT NULL,
+    region TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS lol_rank (
+    user_id TEXT PRIMARY KEY,
+    source TEXT NOT NULL, -- offline/riot
+    tier TEXT NOT NULL,
+    division TEXT,
+    lp INTEGER NOT NULL DEFAULT 0,
+    updated_at INTEGER NOT NULL
+);
+
+-- ---- Tournoi (user vs user) ----
+CREATE TABLE IF NOT EXISTS tournaments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    state TEXT NOT NULL, -- setup | running | finished | cancelled
+    created_by TEXT NOT NULL,
+    created_at INTEGER NOT NULL,
+    started_at INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS tournament_participants (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tournament_id INTEGER NOT NULL,
+    user_id TEXT NOT NULL,
+    seed INTEGER NOT NULL,
+    rating REAL NOT NULL,
+    UNIQUE(tournament_id, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS tournament_matches (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tournament_id INTEGER NOT NULL,
+    round INTEGER NOT NULL,
+    pos_in_round INTEGER NOT NULL, -- index du match dans la ronde
+    p1_user_id TEXT,
+    p2_user_id TEXT,
+    p1_score INTEGER DEFAULT 0,
+    p2_score INTEGER DEFAULT 0,
+    best_of INTEGER NOT NULL DEFAULT 1,
+    winner_user_id TEXT,
+    status TEXT NOT NULL, -- pending | open | done
+    next_match_id INTEGER,
+    next_slot INTEGER -- 1 ou 2 (position dans le match suivant)
+);
+
+-- ---- TeamRolls (sessions & paires) ----
+CREATE TABLE IF NOT EXISTS team_sessions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    created_at INTEGER NOT NULL
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_team_sessions_unique
+ON team_sessions(guild_id, name);
+
+CREATE TABLE IF NOT EXISTS team_pair_counts (
+    session_id INTEGER NOT NULL,
+    user_a TEXT NOT NULL,
+    user_b TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (session_id, user_a, user_b),
+    FOREIGN KEY(session_id) REFERENCES team_sessions(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS team_last (
+    guild_id TEXT PRIMARY KEY,
+    snapshot_json TEXT NOT NULL,
+    updated_at INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_team_pairs_by_session
+ON team_pair_counts(session_id);
+
+-- ---- Historique des compositions (signatures fortes) ----
+CREATE TABLE IF NOT EXISTS team_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id INTEGER NOT NULL,
+    session TEXT NOT NULL,
+    players_fp TEXT NOT NULL,
+    sizes_fp TEXT NOT NULL,
+    signature TEXT NOT NULL,
+    created_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_th_lookup ON team_history(guild_id, session, players_fp, sizes_fp);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_th_unique ON team_history(guild_id, session, players_fp, sizes_fp, signature);
+
+-- ---- Tournoi Team vs Team ----
+CREATE TABLE IF NOT EXISTS team_tournaments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    state TEXT NOT NULL, -- setup | running | cancelled | finished
+    created_by INTEGER NOT NULL,
+    created_at INTEGER NOT NULL,
+    started_at INTEGER,
+    cancelled_at INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS team_matches (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tournament_id INTEGER NOT NULL,
+    round INTEGER NOT NULL,
+    pos_in_round INTEGER NOT NULL,
+    p1_team_json TEXT,          -- JSON [user_id...]
+    p2_team_json TEXT,          -- JSON [user_id...]
+    best_of INTEGER NOT NULL DEFAULT 1,
+    status TEXT NOT NULL,       -- pending | running | done
+    p1_score INTEGER NOT NULL DEFAULT 0,
+    p2_score INTEGER NOT NULL DEFAULT 0,
+    winner_team_json TEXT,      -- JSON gagnante [user_id...]
+    next_match_id INTEGER,      -- FK vers team_matches.id
+    next_slot INTEGER,          -- 1 ou 2
+    FOREIGN KEY (tournament_id) REFERENCES team_tournaments(id)
+)
+"""
+
+
+async def init_db(db_path: Path, in_memory: bool = False):
+    """
+    Applique, dans l'ordre, les migrations dont la version dépasse PRAGMA user_version.
+    in_memory=True : charge d'abord la base en :memory: (servie ensuite par connect()) ;
+    la recopie sur disque revient à l'appelant (persist_memory_db / close_memory_db).
+    """
+    if in_memory:
+        await _open_memory_db(db_path)
+    async with connect(db_path) as db:
+        await db.execute(f"PRAGMA journal_mode = {_PROFILE['journal_mode']};")
+        # Les reconstructions de tables (DROP + RENAME) exigent foreign_keys=OFF.
+        # Laissé OFF ensuite : c'est le réglage de toutes les connexions disque (défaut SQLite) et la
+        # connexion mémoire partagée doit se comporter pareil (suppressions, archivage : enfants d'abord)
+        await db.execute("PRAGMA foreign_keys = OFF;")
+        await _run_migrations(db)
 
 # --- helpers JSON sûrs (si pas déjà dans ton fichier)
 def _json_dump(x) -> str:
@@ -132,72 +440,64 @@ def _json_load(s, default):
     except Exception:
         return default
 
-async def ensure_arena_schema(db_path: str) -> None:
-    """Crée la table arena si manquante et ajoute la colonne 'reported' si absente."""
-    async with aiosqlite.connect(db_path) as db:
-        # 1) Table principale
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS arena (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            guild_id INTEGER NOT NULL,
-            creator_id INTEGER NOT NULL,
-            state TEXT NOT NULL,                 -- 'setup' | 'running' | 'finished' | 'cancelled'
-            participants TEXT NOT NULL,          -- JSON list[int]
-            schedule TEXT NOT NULL,              -- JSON list[list[[u1,u2],...]] par round
-            scores TEXT NOT NULL,                -- JSON dict[str->int]
-            current_round INTEGER NOT NULL,      -- 1-based
-            rounds_total INTEGER NOT NULL,
-            reported TEXT NOT NULL DEFAULT '{}', -- JSON dict[str(round)-> list['u1-u2']]
-            created_at INTEGER NOT NULL
-        );
-        """)
-        await db.execute("CREATE INDEX IF NOT EXISTS idx_arena_guild ON arena(guild_id);")
-
-        # 2) Migration légère : colonne 'reported' si elle n'existe pas
-        cur = await db.execute("PRAGMA table_info(arena);")
-        cols = [r[1] for r in await cur.fetchall()]
-        if "reported" not in cols:
-            await db.execute("ALTER TABLE arena ADD COLUMN reported TEXT NOT NULL DEFAULT '{}';")
-
-        await db.commit()
-
-
 # =========================
 # Repos Skills
 # =========================
+# Cache read-through des ratings : clé (db_path, user_id) -> rating, ou None si aucun rating en base.
+# Toutes les écritures de `skills` passent par set_rating (write-through) : la base n'est lue qu'au premier accès.
+RATINGS_CACHE = LRUCache("ratings", maxsize=5000)
+
+
+async def warm_ratings_cache(db_path: Path) -> int:
+    """Précharge le cache (dans la limite de sa taille) ; retourne le nombre d'entrées chargées."""
+    async with connect(db_path) as db:
+        async with db.execute("SELECT user_id, rating FROM skills LIMIT ?", (RATINGS_CACHE.maxsize,)) as cur:
+            rows = await cur.fetchall()
+    for uid, rating in rows:
+        RATINGS_CACHE.put((str(db_path), uid), float(rating))
+    return len(rows)
+
+
 async def get_rating(db_path: Path, user_id: int) -> Optional[float]:
-    async with aiosqlite.connect(db_path) as db:
-        async with db.execute("SELECT rating FROM skills WHERE user_id=?", (str(user_id),)) as cur:
+    key = (str(db_path), int(user_id))
+    cached = RATINGS_CACHE.get(key)
+    if cached is not MISSING:
+        return cached
+    async with connect(db_path) as db:
+        async with db.execute("SELECT rating FROM skills WHERE user_id=?", (int(user_id),)) as cur:
             row = await cur.fetchone()
-            return float(row[0]) if row else None
+    rating = float(row[0]) if row else None
+    RATINGS_CACHE.put(key, rating)
+    return rating
 
 
 async def set_rating(db_path: Path, user_id: int, rating: float):
-    async with aiosqlite.connect(db_path) as db:
+    async with connect(db_path) as db:
         await db.execute(
             "INSERT INTO skills(user_id, rating) VALUES(?, ?) "
             "ON CONFLICT(user_id) DO UPDATE SET rating=excluded.rating",
-            (str(user_id), float(rating)),
+            (int(user_id), float(rating)),
         )
         await db.commit()
+    RATINGS_CACHE.put((str(db_path), int(user_id)), float(rating))
 
 
 # =========================
 # Repos Liens LoL
 # =========================
 async def get_linked_lol(db_path: Path, user_id: int) -> Optional[Tuple[str, str]]:
-    async with aiosqlite.connect(db_path) as db:
-        async with db.execute("SELECT summoner_name, region FROM lol_links WHERE user_id=?", (str(user_id),)) as cur:
+    async with connect(db_path) as db:
+        async with db.execute("SELECT summoner_name, region FROM lol_links WHERE user_id=?", (int(user_id),)) as cur:
             row = await cur.fetchone()
             return (row[0], row[1]) if row else None
 
 
 async def link_lol(db_path: Path, user_id: int, summoner: str, region: str):
-    async with aiosqlite.connect(db_path) as db:
+    async with connect(db_path) as db:
         await db.execute(
             "INSERT INTO lol_links(user_id, summoner_name, region) VALUES(?, ?, ?) "
             "ON CONFLICT(user_id) DO UPDATE SET summoner_name=excluded.summoner_name, region=excluded.region",
-            (str(user_id), summoner, region),
+            (int(user_id), summoner, region),
         )
         await db.commit()
 
@@ -205,22 +505,32 @@ async def link_lol(db_path: Path, user_id: int, summoner: str, region: str):
 # =========================
 # Repos Rang LoL “humain”
 # =========================
+async def _set_lol_rank_tx(db: aiosqlite.Connection, user_id: int, source: str, tier: str,
+                           division: Optional[str], lp: int, updated_at: int):
+    await db.execute("""
+    INSERT INTO lol_rank (user_id, source, tier, division, lp, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(user_id) DO UPDATE SET
+      source=excluded.source, tier=excluded.tier, division=excluded.division,
+      lp=excluded.lp, updated_at=excluded.updated_at
+    """, (int(user_id), source, tier.upper(), division, int(lp or 0), updated_at))
+
+
 async def set_lol_rank(
     db_path: Path,
     user_id: int,
     source: str,
     tier: str,
     division: Optional[str],
-    lp: int
+    lp: int,
+    defer: bool = False,
 ):
-    async with aiosqlite.connect(db_path) as db:
-        await db.execute("""
-        INSERT INTO lol_rank (user_id, source, tier, division, lp, updated_at)
-        VALUES (?, ?, ?, ?, ?, ?)
-        ON CONFLICT(user_id) DO UPDATE SET
-          source=excluded.source, tier=excluded.tier, division=excluded.division,
-          lp=excluded.lp, updated_at=excluded.updated_at
-        """, (str(user_id), source, tier.upper(), division, int(lp or 0), int(time.time())))
+    args = (user_id, source, tier, division, lp, int(time.time()))
+    if defer:
+        WRITE_BEHIND.submit(db_path, lambda db: _set_lol_rank_tx(db, *args), key=("lol_rank", int(user_id)))
+        return
+    async with connect(db_path) as db:
+        await _set_lol_rank_tx(db, *args)
         await db.commit()
 
 
@@ -230,58 +540,51 @@ async def fetch_all_ratings_and_links(
     rows: list[tuple[int, float]] = []
     linked: set[int] = set()
     ranks: dict[int, tuple[str, Optional[str], int]] = {}
-    async with aiosqlite.connect(db_path) as db:
+    await WRITE_BEHIND.flush()
+    async with connect(db_path) as db:
         async with db.execute("SELECT user_id, rating FROM skills") as cur:
-            async for uid, rating in cur:
-                try:
-                    rows.append((int(uid), float(rating)))
-                except Exception:
-                    pass
+            rows = [(uid, float(rating)) async for uid, rating in cur]
         async with db.execute("SELECT user_id FROM lol_links") as cur:
-            async for (uid,) in cur:
-                try:
-                    linked.add(int(uid))
-                except Exception:
-                    pass
+            linked = {uid async for (uid,) in cur}
         async with db.execute("SELECT user_id, tier, division, lp FROM lol_rank") as cur:
             async for uid, tier, division, lp in cur:
-                try:
-                    ranks[int(uid)] = (str(tier or ""), (division if division else None), int(lp or 0))
-                except Exception:
-                    pass
+                ranks[uid] = (str(tier or ""), (division if division else None), int(lp or 0))
+    # lecture complète : on en profite pour rafraîchir le cache
+    for uid, rating in rows[:RATINGS_CACHE.maxsize]:
+        RATINGS_CACHE.put((str(db_path), uid), rating)
     return rows, linked, ranks
 
 
 # =========================
 # Repos Tournoi (user vs user)
 # =========================
+async def _tournament_row(db: aiosqlite.Connection, where: str, params: tuple) -> Optional[Tournament]:
+    return await fetch_record(db, Tournament, f"SELECT {Tournament.COLUMNS} FROM tournaments WHERE {where}", params)
+
+
 async def create_tournament(db_path: Path, guild_id: int, name: str, created_by: int) -> int:
-    async with aiosqlite.connect(db_path) as db:
-        await db.execute(
+    async with connect(db_path) as db:
+        row = await _insert_returning(
+            db, "tournaments",
             "INSERT INTO tournaments (guild_id, name, state, created_by, created_at) VALUES (?, ?, 'setup', ?, ?)",
-            (str(guild_id), name, str(created_by), int(time.time()))
+            (int(guild_id), name, int(created_by), int(time.time())), columns=Tournament.COLUMNS
         )
         await db.commit()
-        cur = await db.execute("SELECT last_insert_rowid()")
-        (tid,) = await cur.fetchone()
-        return int(tid)
+    update_active_cache(db_path, "tournament", Tournament(**row))
+    return int(row["id"])
 
 
-async def get_active_tournament(db_path: Path, guild_id: int) -> Optional[dict]:
-    async with aiosqlite.connect(db_path) as db:
-        async with db.execute(
-            "SELECT * FROM tournaments WHERE guild_id=? AND state IN ('setup','running') ORDER BY id DESC LIMIT 1",
-            (str(guild_id),)
-        ) as cur:
-            row = await cur.fetchone()
-            if not row:
-                return None
-            cols = [c[0] for c in cur.description]
-            return dict(zip(cols, row))
+async def get_active_tournament(db_path: Path, guild_id: int) -> Optional[Tournament]:
+    async def load():
+        async with connect(db_path) as db:
+            return await _tournament_row(
+                db, "guild_id=? AND state IN ('setup','running') ORDER BY id DESC LIMIT 1", (int(guild_id),)
+            )
+    return await cached_active(db_path, "tournament", guild_id, load)
 
 
 async def set_tournament_state(db_path: Path, tournament_id: int, new_state: str, started: bool = False):
-    async with aiosqlite.connect(db_path) as db:
+    async with connect(db_path) as db:
         if started:
             await db.execute(
                 "UPDATE tournaments SET state=?, started_at=? WHERE id=?",
@@ -290,31 +593,30 @@ async def set_tournament_state(db_path: Path, tournament_id: int, new_state: str
         else:
             await db.execute("UPDATE tournaments SET state=? WHERE id=?", (new_state, int(tournament_id)))
         await db.commit()
+        update_active_cache(db_path, "tournament", await _tournament_row(db, "id=?", (int(tournament_id),)))
 
 
 async def add_participant(db_path: Path, tournament_id: int, user_id: int, seed: int, rating: float):
-    async with aiosqlite.connect(db_path) as db:
+    async with connect(db_path) as db:
         await db.execute(
             "INSERT OR IGNORE INTO tournament_participants (tournament_id, user_id, seed, rating) VALUES (?, ?, ?, ?)",
-            (int(tournament_id), str(user_id), int(seed), float(rating))
+            (int(tournament_id), int(user_id), int(seed), float(rating))
         )
         await db.commit()
 
 
-async def list_participants(db_path: Path, tournament_id: int) -> list[dict]:
-    async with aiosqlite.connect(db_path) as db:
-        async with db.execute("""
-            SELECT user_id, seed, rating
-            FROM tournament_participants
+async def list_participants(db_path: Path, tournament_id: int, archived: bool = False) -> list[Participant]:
+    async with connect(db_path) as db:
+        return await fetch_records(db, Participant, f"""
+            SELECT {Participant.COLUMNS}
+            FROM {table_for("tournament_participants", archived)}
             WHERE tournament_id=?
             ORDER BY seed ASC
-        """, (int(tournament_id),)) as cur:
-            cols = [c[0] for c in cur.description]
-            return [dict(zip(cols, row)) async for row in cur]
+        """, (int(tournament_id),))
 
 
 async def clear_bracket(db_path: Path, tournament_id: int):
-    async with aiosqlite.connect(db_path) as db:
+    async with connect(db_path) as db:
         await db.execute("DELETE FROM tournament_matches WHERE tournament_id=?", (int(tournament_id),))
         await db.commit()
 
@@ -324,7 +626,7 @@ async def create_matches(db_path: Path, tournament_id: int, matches: list[dict])
     matches: liste de dicts:
       {round, pos_in_round, p1_user_id, p2_user_id, best_of, status, next_match_id, next_slot}
     """
-    async with aiosqlite.connect(db_path) as db:
+    async with connect(db_path) as db:
         for m in matches:
             await db.execute("""
                 INSERT INTO tournament_matches
@@ -332,34 +634,32 @@ async def create_matches(db_path: Path, tournament_id: int, matches: list[dict])
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
             """, (
                 int(tournament_id), int(m["round"]), int(m["pos_in_round"]),
-                str(m.get("p1_user_id")) if m.get("p1_user_id") else None,
-                str(m.get("p2_user_id")) if m.get("p2_user_id") else None,
+                int(m["p1_user_id"]) if m.get("p1_user_id") else None,
+                int(m["p2_user_id"]) if m.get("p2_user_id") else None,
                 int(m.get("best_of", 1)), m.get("status", "pending"),
                 m.get("next_match_id"), m.get("next_slot")
             ))
         await db.commit()
 
 
-async def list_matches(db_path: Path, tournament_id: int) -> list[dict]:
-    async with aiosqlite.connect(db_path) as db:
-        async with db.execute("""
-            SELECT * FROM tournament_matches
+async def list_matches(db_path: Path, tournament_id: int, archived: bool = False) -> list[Match]:
+    async with connect(db_path) as db:
+        return await fetch_records(db, Match, f"""
+            SELECT {Match.COLUMNS} FROM {table_for("tournament_matches", archived)}
             WHERE tournament_id=?
             ORDER BY round ASC, pos_in_round ASC
-        """, (int(tournament_id),)) as cur:
-            cols = [c[0] for c in cur.description]
-            return [dict(zip(cols, row)) async for row in cur]
+        """, (int(tournament_id),))
 
 
 async def update_match_participant(db_path: Path, match_id: int, slot: int, user_id: int):
     col = "p1_user_id" if slot == 1 else "p2_user_id"
-    async with aiosqlite.connect(db_path) as db:
-        await db.execute(f"UPDATE tournament_matches SET {col}=? WHERE id=?", (str(user_id), int(match_id)))
+    async with connect(db_path) as db:
+        await db.execute(f"UPDATE tournament_matches SET {col}=? WHERE id=?", (int(user_id), int(match_id)))
         await db.commit()
 
 
 async def set_match_open_if_ready(db_path: Path, match_id: int):
-    async with aiosqlite.connect(db_path) as db:
+    async with connect(db_path) as db:
         async with db.execute("SELECT p1_user_id, p2_user_id FROM tournament_matches WHERE id=?", (int(match_id),)) as cur:
             row = await cur.fetchone()
             if row and row[0] and row[1]:
@@ -379,7 +679,7 @@ async def report_match_result(
     Met à jour le match, propage le vainqueur au match suivant.
     Retourne l'ID du match suivant (ou None).
     """
-    async with aiosqlite.connect(db_path) as db:
+    async with connect(db_path) as db:
         async with db.execute("""
             SELECT id, p1_user_id, p2_user_id, next_match_id, next_slot
             FROM tournament_matches
@@ -394,7 +694,7 @@ async def report_match_result(
             UPDATE tournament_matches
             SET winner_user_id=?, p1_score=?, p2_score=?, status='done'
             WHERE id=? AND tournament_id=?
-        """, (str(winner_user_id), int(p1_score), int(p2_score), int(match_id), int(tournament_id)))
+        """, (int(winner_user_id), int(p1_score), int(p2_score), int(match_id), int(tournament_id)))
         await db.commit()
 
         if next_id:
@@ -408,22 +708,24 @@ async def report_match_result(
 # Repos TeamRolls (paires)
 # =========================
 async def get_or_create_session_id(db_path: Path, guild_id: int, name: str) -> int:
-    async with aiosqlite.connect(db_path) as db:
-        async with db.execute(
-            "SELECT id FROM team_sessions WHERE guild_id=? AND name=?",
-            (str(guild_id), name)
-        ) as cur:
-            row = await cur.fetchone()
-            if row:
-                return int(row[0])
-        await db.execute(
-            "INSERT INTO team_sessions(guild_id, name, created_at) VALUES(?,?,?)",
-            (str(guild_id), name, int(time.time()))
-        )
+    params = (int(guild_id), name, int(time.time()))
+    async with connect(db_path) as db:
+        if _HAS_RETURNING:
+            # Une seule instruction : crée la session, ou (conflit sur idx_team_sessions_unique) renvoie la sienne.
+            # DO UPDATE (no-op) plutôt que DO NOTHING : seul DO UPDATE fait remonter la ligne existante.
+            async with db.execute(
+                "INSERT INTO team_sessions(guild_id, name, created_at) VALUES(?,?,?) "
+                "ON CONFLICT(guild_id, name) DO UPDATE SET name=excluded.name RETURNING id",
+                params
+            ) as cur:
+                (sid,) = await cur.fetchone()
+            await db.commit()
+            return int(sid)
+        await db.execute("INSERT OR IGNORE INTO team_sessions(guild_id, name, created_at) VALUES(?,?,?)", params)
         await db.commit()
         async with db.execute(
             "SELECT id FROM team_sessions WHERE guild_id=? AND name=?",
-            (str(guild_id), name)
+            (int(guild_id), name)
         ) as cur:
             row = await cur.fetchone()
             return int(row[0])
@@ -431,13 +733,13 @@ async def get_or_create_session_id(db_path: Path, guild_id: int, name: str) -> i
 
 async def load_pair_counts(db_path: Path, session_id: int) -> Dict[Tuple[int, int], int]:
     out: Dict[Tuple[int, int], int] = {}
-    async with aiosqlite.connect(db_path) as db:
+    async with connect(db_path) as db:
         async with db.execute(
             "SELECT user_a, user_b, count FROM team_pair_counts WHERE session_id=?",
             (session_id,)
         ) as cur:
             async for ua, ub, c in cur:
-                out[(int(ua), int(ub))] = int(c)
+                out[(ua, ub)] = c
     return out
 
 
@@ -453,23 +755,23 @@ async def bump_pair_counts(db_path: Path, session_id: int, teams: Iterable[Itera
     if not pairs:
         return
 
-    async with aiosqlite.connect(db_path) as db:
+    async with connect(db_path) as db:
         for (a, b), inc in pairs.items():
             await db.execute("""
                 INSERT INTO team_pair_counts(session_id, user_a, user_b, count)
                 VALUES(?,?,?,?)
                 ON CONFLICT(session_id, user_a, user_b)
                 DO UPDATE SET count = count + excluded.count
-            """, (session_id, str(a), str(b), int(inc)))
+            """, (session_id, int(a), int(b), int(inc)))
         await db.commit()
 
 
 async def end_session(db_path: Path, guild_id: int, name: str) -> int:
     """Supprime la session + ses compteurs. Retourne 1 si supprimée, 0 sinon."""
-    async with aiosqlite.connect(db_path) as db:
+    async with connect(db_path) as db:
         async with db.execute(
             "SELECT id FROM team_sessions WHERE guild_id=? AND name=?",
-            (str(guild_id), name)
+            (int(guild_id), name)
         ) as cur:
             row = await cur.fetchone()
             if not row:
@@ -496,29 +798,75 @@ async def session_stats(db_path: Path, session_id: int, user_ids: Iterable[int])
     return seen, len(all_pairs)
 
 
-async def set_team_last(db_path: Path, guild_id: int, snapshot: dict) -> None:
+# Historique append-only des snapshots "dernière config" (/team, /teamroll, rounds Arena) :
+# une version croissante par serveur, seules les TEAM_LAST_KEEP dernières sont conservées.
+# La dernière version est gardée en mémoire : (db_path, guild_id) -> (version, snapshot | None).
+TEAM_LAST_KEEP = 20
+TEAM_LAST_CACHE = LRUCache("team_last", maxsize=1024)
+
+
+async def _append_team_last_tx(db: aiosqlite.Connection, guild_id: int, version: int, payload: str, created_at: int):
+    await db.execute("""
+        INSERT OR REPLACE INTO team_last_history(guild_id, version, snapshot_json, created_at)
+        VALUES(?, ?, ?, ?)
+    """, (int(guild_id), int(version), payload, created_at))
+
+
+async def _compact_team_last_tx(db: aiosqlite.Connection, guild_id: int, keep_from: int):
+    await db.execute(
+        "DELETE FROM team_last_history WHERE guild_id=? AND version < ?", (int(guild_id), int(keep_from))
+    )
+
+
+async def _team_last_latest(db_path: Path, guild_id: int) -> Tuple[int, Optional[dict]]:
+    key = (str(db_path), int(guild_id))
+    hit = TEAM_LAST_CACHE.get(key)
+    if hit is not MISSING:
+        return hit
+    await WRITE_BEHIND.flush()
+    async with connect(db_path) as db:
+        async with db.execute(
+            "SELECT version, snapshot_json FROM team_last_history WHERE guild_id=? ORDER BY version DESC LIMIT 1",
+            (int(guild_id),)
+        ) as cur:
+            row = await cur.fetchone()
+    latest = (int(row[0]), _json_load(row[1], None)) if row else (0, None)
+    # un set_team_last concurrent a pu publier une version plus récente pendant la lecture
+    if key not in TEAM_LAST_CACHE:
+        TEAM_LAST_CACHE.put(key, latest)
+    return TEAM_LAST_CACHE.get(key, latest)
+
+
+async def set_team_last(db_path: Path, guild_id: int, snapshot: dict, defer: bool = False) -> int:
+    """Ajoute une version au journal du serveur et retourne son numéro (visible immédiatement en mémoire)."""
+    # Sérialisé tout de suite : le snapshot peut être modifié par l'appelant avant l'écriture
     payload = json.dumps(snapshot, ensure_ascii=False)
-    async with aiosqlite.connect(db_path) as db:
-        await db.execute("""
-            INSERT INTO team_last(guild_id, snapshot_json, updated_at)
-            VALUES(?, ?, ?)
-            ON CONFLICT(guild_id) DO UPDATE SET
-              snapshot_json=excluded.snapshot_json,
-              updated_at=excluded.updated_at
-        """, (str(guild_id), payload, int(time.time())))
+    now = int(time.time())
+    prev, _ = await _team_last_latest(db_path, guild_id)
+    version = prev + 1
+    TEAM_LAST_CACHE.put((str(db_path), int(guild_id)), (version, json.loads(payload)))
+    keep_from = version - TEAM_LAST_KEEP + 1
+    if defer:
+        WRITE_BEHIND.submit(db_path, lambda db: _append_team_last_tx(db, guild_id, version, payload, now))
+        WRITE_BEHIND.submit(db_path, lambda db: _compact_team_last_tx(db, guild_id, keep_from),
+                            key=("team_last_compact", int(guild_id)))
+        return version
+    async with connect(db_path) as db:
+        await _append_team_last_tx(db, guild_id, version, payload, now)
+        await _compact_team_last_tx(db, guild_id, keep_from)
         await db.commit()
+    return version
+
+
+async def get_team_last_versioned(db_path: Path, guild_id: int) -> Tuple[int, Optional[dict]]:
+    """(version, snapshot) de la dernière config ; (0, None) si aucune. Servi depuis la mémoire."""
+    version, snap = await _team_last_latest(db_path, guild_id)
+    return version, copy.deepcopy(snap)
 
 
 async def get_team_last(db_path: Path, guild_id: int) -> Optional[dict]:
-    async with aiosqlite.connect(db_path) as db:
-        async with db.execute("SELECT snapshot_json FROM team_last WHERE guild_id=?", (str(guild_id),)) as cur:
-            row = await cur.fetchone()
-            if not row:
-                return None
-            try:
-                return json.loads(row[0])
-            except Exception:
-                return None
+    _version, snap = await get_team_last_versioned(db_path, guild_id)
+    return snap
 
 
 # =========================
@@ -529,17 +877,11 @@ async def set_next_links(db_path, tournament_id, updates):
     updates: list[(match_id, next_match_id, next_slot)]
     Met à jour next_match_id / next_slot sans recréer les matchs.
     """
-    async with aiosqlite.connect(db_path) as db:
-        # Détecte le bon nom de table utilisé par le schéma existant
-        cur = await db.execute(
-            "SELECT name FROM sqlite_master WHERE type='table' AND name IN ('matches','tournament_matches')"
+    async with connect(db_path) as db:
+        await db.executemany(
+            "UPDATE tournament_matches SET next_match_id=?, next_slot=? WHERE id=? AND tournament_id=?",
+            ((nmid, slot, mid, tournament_id) for (mid, nmid, slot) in updates)
         )
-        row = await cur.fetchone()
-        await cur.close()
-        table = row[0] if row else "matches"  # fallback
-
-        sql = f"UPDATE {table} SET next_match_id=?, next_slot=? WHERE id=? AND tournament_id=?"
-        await db.executemany(sql, ((nmid, slot, mid, tournament_id) for (mid, nmid, slot) in updates))
         await db.commit()
 
 
@@ -547,25 +889,9 @@ async def set_next_links(db_path, tournament_id, updates):
 # Historique compositions d'équipes (signatures fortes)
 # =========================
 
-async def _ensure_team_history_table(db: aiosqlite.Connection):
-    await db.execute("""
-    CREATE TABLE IF NOT EXISTS team_history (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        guild_id INTEGER NOT NULL,
-        session TEXT NOT NULL,
-        players_fp TEXT NOT NULL,
-        sizes_fp TEXT NOT NULL,
-        signature TEXT NOT NULL,
-        created_at INTEGER NOT NULL
-    );
-    """)
-    await db.execute("CREATE INDEX IF NOT EXISTS idx_th_lookup ON team_history(guild_id, session, players_fp, sizes_fp);")
-    await db.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_th_unique ON team_history(guild_id, session, players_fp, sizes_fp, signature);")
-
-
 async def load_team_signatures(db_path: str, guild_id: int, session: str, players_fp: str, sizes_fp: str) -> set[str]:
-    async with aiosqlite.connect(db_path) as db:
-        await _ensure_team_history_table(db)
+    await WRITE_BEHIND.flush()
+    async with connect(db_path) as db:
         cur = await db.execute("""
             SELECT signature
             FROM team_history
@@ -576,45 +902,64 @@ async def load_team_signatures(db_path: str, guild_id: int, session: str, player
         return {r[0] for r in rows}
 
 
-async def add_team_signature(db_path: str, guild_id: int, session: str, players_fp: str, sizes_fp: str, signature: str, created_at: int) -> bool:
-    async with aiosqlite.connect(db_path) as db:
-        await _ensure_team_history_table(db)
-        try:
-            await db.execute("""
-                INSERT INTO team_history (guild_id, session, players_fp, sizes_fp, signature, created_at)
-                VALUES (?, ?, ?, ?, ?, ?);
-            """, (guild_id, session, players_fp, sizes_fp, signature, created_at))
-            await db.commit()
-            return True
-        except Exception:
-            # Signature déjà vue (unique constraint)
-            return False
+async def _add_team_signature_tx(db: aiosqlite.Connection, guild_id: int, session: str, players_fp: str,
+                                 sizes_fp: str, signature: str, created_at: int) -> bool:
+    # Signature déjà vue (unique constraint) -> ignorée
+    cur = await db.execute("""
+        INSERT OR IGNORE INTO team_history (guild_id, session, players_fp, sizes_fp, signature, created_at)
+        VALUES (?, ?, ?, ?, ?, ?);
+    """, (guild_id, session, players_fp, sizes_fp, signature, created_at))
+    return cur.rowcount > 0
 
 
-async def prune_team_signatures(db_path: str, guild_id: int, session: str, players_fp: str, sizes_fp: str, keep_last: int) -> int:
+async def add_team_signature(db_path: str, guild_id: int, session: str, players_fp: str, sizes_fp: str, signature: str, created_at: int,
+                             defer: bool = False) -> Optional[bool]:
+    """Retourne True si la signature est nouvelle (None si defer=True : écriture différée)."""
+    args = (guild_id, session, players_fp, sizes_fp, signature, created_at)
+    if defer:
+        WRITE_BEHIND.submit(db_path, lambda db: _add_team_signature_tx(db, *args))
+        return None
+    async with connect(db_path) as db:
+        added = await _add_team_signature_tx(db, *args)
+        await db.commit()
+        return added
+
+
+async def _prune_team_signatures_tx(db: aiosqlite.Connection, guild_id: int, session: str, players_fp: str,
+                                    sizes_fp: str, keep_last: int) -> int:
+    cur = await db.execute("""
+        SELECT id
+        FROM team_history
+        WHERE guild_id=? AND session=? AND players_fp=? AND sizes_fp=?
+        ORDER BY created_at DESC, id DESC
+    """, (guild_id, session, players_fp, sizes_fp))
+    rows = await cur.fetchall()
+    await cur.close()
+    ids = [r[0] for r in rows]
+    if len(ids) <= keep_last:
+        return 0
+    to_delete = ids[keep_last:]
+    qmarks = ",".join("?" for _ in to_delete)
+    await db.execute(f"DELETE FROM team_history WHERE id IN ({qmarks})", to_delete)
+    return len(to_delete)
+
+
+async def prune_team_signatures(db_path: str, guild_id: int, session: str, players_fp: str, sizes_fp: str, keep_last: int,
+                                defer: bool = False) -> int:
     """
     Ne conserve que les 'keep_last' dernières signatures (créées les plus récentes en premier)
     pour (guild_id, session, players_fp, sizes_fp).
-    Retourne le nombre de lignes supprimées.
+    Retourne le nombre de lignes supprimées (0 si defer=True : le pruning est coalescé par clé).
     """
-    async with aiosqlite.connect(db_path) as db:
-        await _ensure_team_history_table(db)
-        cur = await db.execute("""
-            SELECT id
-            FROM team_history
-            WHERE guild_id=? AND session=? AND players_fp=? AND sizes_fp=?
-            ORDER BY created_at DESC, id DESC
-        """, (guild_id, session, players_fp, sizes_fp))
-        rows = await cur.fetchall()
-        await cur.close()
-        ids = [r[0] for r in rows]
-        if len(ids) <= keep_last:
-            return 0
-        to_delete = ids[keep_last:]
-        qmarks = ",".join("?" for _ in to_delete)
-        await db.execute(f"DELETE FROM team_history WHERE id IN ({qmarks})", to_delete)
+    args = (guild_id, session, players_fp, sizes_fp, keep_last)
+    if defer:
+        WRITE_BEHIND.submit(db_path, lambda db: _prune_team_signatures_tx(db, *args),
+                            key=("prune_team_signatures", guild_id, session, players_fp, sizes_fp))
+        return 0
+    async with connect(db_path) as db:
+        n = await _prune_team_signatures_tx(db, *args)
         await db.commit()
-        return len(to_delete)
+        return n
 
 
 async def clear_team_signatures(db_path: str, guild_id: int, session: str, players_fp: str = "", sizes_fp: str = "") -> int:
@@ -624,8 +969,8 @@ async def clear_team_signatures(db_path: str, guild_id: int, session: str, playe
       - si players_fp & sizes_fp fournis: purge ciblée (set + tailles)
       - sinon: purge toute la session
     """
-    async with aiosqlite.connect(db_path) as db:
-        await _ensure_team_history_table(db)
+    await WRITE_BEHIND.flush()  # sinon une signature encore en file réapparaîtrait après la purge
+    async with connect(db_path) as db:
         if session and players_fp and sizes_fp:
             cur = await db.execute("""
                 DELETE FROM team_history
@@ -649,7 +994,15 @@ async def clear_team_signatures(db_path: str, guild_id: int, session: str, playe
         return n
 
 
+
+
 # ====== Arena (tournoi LoL 2v2, classement individuel) ======
+#
+# État normalisé :
+#   arena_tournaments  : 1 ligne par tournoi (état, round courant)
+#   arena_participants : score de chaque joueur (seat = ordre d'inscription)
+#   arena_duos         : planning (round, duo_idx) -> (u1, u2)
+#   arena_reports      : top saisi pour un duo d'un round (UPSERT)
 
 ARENA_TABLE_SQL = """
 CREATE TABLE IF NOT EXISTS arena_tournaments (
@@ -660,241 +1013,1311 @@ CREATE TABLE IF NOT EXISTS arena_tournaments (
   created_at INTEGER NOT NULL,
   rounds_total INTEGER NOT NULL,
   current_round INTEGER NOT NULL,  -- 1-based, prochain round à jouer
-  participants_json TEXT NOT NULL, -- [user_id,...] (ordre stable)
-  schedule_json TEXT NOT NULL,     -- [[ [u1,u2], [u3,u4], ... ], ...] rounds -> duos
-  scores_json TEXT NOT NULL        -- {user_id: points}
+  version INTEGER NOT NULL DEFAULT 0 -- plus écrite (ancien contrôle optimiste), gardée pour les bases migrées
 );
 CREATE INDEX IF NOT EXISTS idx_arena_by_guild ON arena_tournaments(guild_id, state);
+
+CREATE TABLE IF NOT EXISTS arena_participants (
+  arena_id INTEGER NOT NULL,
+  user_id INTEGER NOT NULL,
+  seat INTEGER NOT NULL,           -- ordre stable d'inscription
+  score INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (arena_id, user_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS arena_duos (
+  arena_id INTEGER NOT NULL,
+  round INTEGER NOT NULL,          -- 1-based
+  duo_idx INTEGER NOT NULL,        -- 1-based (Duo 1..N)
+  u1 INTEGER NOT NULL,
+  u2 INTEGER NOT NULL,
+  PRIMARY KEY (arena_id, round, duo_idx)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS arena_reports (
+  arena_id INTEGER NOT NULL,
+  round INTEGER NOT NULL,
+  duo_idx INTEGER NOT NULL,
+  rank INTEGER,                    -- top 1..8 (NULL si migré d'un ancien report)
+  points INTEGER NOT NULL DEFAULT 0,
+  reported_at INTEGER NOT NULL,
+  PRIMARY KEY (arena_id, round, duo_idx)
+) WITHOUT ROWID;
 """
 
-async def _arena_ensure_tables(db_path: str):
-    async with aiosqlite.connect(db_path) as db:
-        await db.executescript(ARENA_TABLE_SQL)
-        await db.commit()
+
+def _pair_key(a: int, b: int) -> str:
+    x, y = sorted((int(a), int(b)))
+    return f"{x}-{y}"
+
+
+async def _exec_statements(db: aiosqlite.Connection, script: str):
+    """Comme executescript, mais sans COMMIT implicite (reste dans la transaction courante)."""
+    for stmt in script.split(";"):
+        if stmt.strip():
+            await db.execute(stmt)
+
+
+async def _arena_insert_children(db: aiosqlite.Connection, arena_id: int, participants: list[int],
+                                 schedule: list, scores: Dict[int, int], reported: dict, now: int):
+    """Insère participants / duos / reports d'un tournoi (création ou migration)."""
+    await db.executemany(
+        "INSERT OR IGNORE INTO arena_participants (arena_id, user_id, seat, score) VALUES (?, ?, ?, ?)",
+        [(arena_id, int(uid), seat, int(scores.get(int(uid), 0))) for seat, uid in enumerate(participants, start=1)]
+    )
+    duos = []
+    idx_by_pair: Dict[Tuple[int, str], int] = {}
+    for rnd, pairs in enumerate(schedule, start=1):
+        for duo_idx, (u1, u2) in enumerate(pairs, start=1):
+            duos.append((arena_id, rnd, duo_idx, int(u1), int(u2)))
+            idx_by_pair[(rnd, _pair_key(u1, u2))] = duo_idx
+    await db.executemany(
+        "INSERT OR IGNORE INTO arena_duos (arena_id, round, duo_idx, u1, u2) VALUES (?, ?, ?, ?, ?)",
+        duos
+    )
+    reports = []
+    for rkey, keys in (reported or {}).items():
+        for k in keys or []:
+            duo_idx = idx_by_pair.get((int(rkey), k))
+            if duo_idx is not None:
+                reports.append((arena_id, int(rkey), duo_idx, now))
+    await db.executemany(
+        "INSERT OR IGNORE INTO arena_reports (arena_id, round, duo_idx, rank, points, reported_at) "
+        "VALUES (?, ?, ?, NULL, 0, ?)",
+        reports
+    )
+
+
+async def _arena_migrate_legacy(db: aiosqlite.Connection):
+    """
+    Migration des anciens formats (JSON) vers les tables normalisées :
+    - arena_tournaments avec participants_json / schedule_json / scores_json / reported_json
+      -> reconstruite sans colonnes JSON (ids conservés)
+    - table legacy `arena` (participants / schedule / scores / reported) -> recopiée puis supprimée
+    """
+    now = int(time.time())
+
+    cur = await db.execute("PRAGMA table_info(arena_tournaments);")
+    cols = [r[1] for r in await cur.fetchall()]
+    await cur.close()
+    if "version" not in cols and "participants_json" not in cols:
+        await db.execute("ALTER TABLE arena_tournaments ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+    if "participants_json" in cols:
+        cur = await db.execute("SELECT * FROM arena_tournaments")
+        names = [c[0] for c in cur.description]
+        rows = [dict(zip(names, r)) for r in await cur.fetchall()]
+        await cur.close()
+
+        await db.execute("ALTER TABLE arena_tournaments RENAME TO arena_tournaments_legacy")
+        await db.execute("DROP INDEX IF EXISTS idx_arena_by_guild")
+        await _exec_statements(db, ARENA_TABLE_SQL)
+        for rec in rows:
+            await db.execute("""
+                INSERT INTO arena_tournaments (id, guild_id, state, created_by, created_at, rounds_total, current_round)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (rec["id"], rec["guild_id"], rec["state"], rec["created_by"], rec["created_at"],
+                  rec["rounds_total"], rec["current_round"]))
+            scores = {int(k): int(v) for k, v in _json_load(rec.get("scores_json"), {}).items()}
+            await _arena_insert_children(
+                db, int(rec["id"]),
+                _json_load(rec.get("participants_json"), []),
+                _json_load(rec.get("schedule_json"), []),
+                scores,
+                _json_load(rec.get("reported_json"), {}),
+                now,
+            )
+        await db.execute("DROP TABLE arena_tournaments_legacy")
+
+    cur = await db.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='arena'")
+    legacy = await cur.fetchone()
+    await cur.close()
+    if legacy:
+        cur = await db.execute("SELECT * FROM arena")
+        names = [c[0] for c in cur.description]
+        rows = [dict(zip(names, r)) for r in await cur.fetchall()]
+        await cur.close()
+        for rec in rows:
+            cur = await db.execute("""
+                INSERT INTO arena_tournaments (guild_id, state, created_by, created_at, rounds_total, current_round)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (rec["guild_id"], rec["state"], rec["creator_id"], rec["created_at"],
+                  rec["rounds_total"], rec["current_round"]))
+            scores = {int(k): int(v) for k, v in _json_load(rec.get("scores"), {}).items()}
+            await _arena_insert_children(
+                db, int(cur.lastrowid),
+                _json_load(rec.get("participants"), []),
+                _json_load(rec.get("schedule"), []),
+                scores,
+                _json_load(rec.get("reported"), {}),
+                now,
+            )
+        await db.execute("DROP TABLE arena")
+
+
+async def _arena_fetch(db: aiosqlite.Connection, where: str, params: tuple, archived: bool = False) -> Optional[Arena]:
+    """Charge un tournoi Arena + participants/scores, planning et reports (record Arena)."""
+    rec = await fetch_record(
+        db, Arena, f"SELECT {Arena.COLUMNS} FROM {table_for('arena_tournaments', archived)} WHERE {where}", params
+    )
+    if rec is None:
+        return None
+    aid = rec.id
+
+    participants: list[int] = []
+    scores: Dict[int, int] = {}
+    async with db.execute(
+        f"SELECT user_id, score FROM {table_for('arena_participants', archived)} WHERE arena_id=? ORDER BY seat", (aid,)
+    ) as cur:
+        async for uid, score in cur:
+            participants.append(int(uid))
+            scores[int(uid)] = int(score)
+
+    schedule: list[list[tuple[int, int]]] = []
+    async with db.execute(
+        f"SELECT round, u1, u2 FROM {table_for('arena_duos', archived)} WHERE arena_id=? ORDER BY round, duo_idx", (aid,)
+    ) as cur:
+        async for rnd, u1, u2 in cur:
+            while len(schedule) < int(rnd):
+                schedule.append([])
+            schedule[int(rnd) - 1].append((int(u1), int(u2)))
+
+    reported: Dict[str, list[str]] = {}
+    async with db.execute(f"""
+        SELECT r.round, d.u1, d.u2
+        FROM {table_for('arena_reports', archived)} r
+        JOIN {table_for('arena_duos', archived)} d ON d.arena_id=r.arena_id AND d.round=r.round AND d.duo_idx=r.duo_idx
+        WHERE r.arena_id=?
+        ORDER BY r.round, r.duo_idx
+    """, (aid,)) as cur:
+        async for rnd, u1, u2 in cur:
+            reported.setdefault(str(int(rnd)), []).append(_pair_key(u1, u2))
+
+    return rec._replace(
+        participants=tuple(participants),
+        schedule=tuple(tuple(r) for r in schedule),
+        scores=MappingProxyType(scores),
+        reported=MappingProxyType({k: tuple(v) for k, v in reported.items()}),
+    )
+
 
 async def arena_get_active(db_path: str, guild_id: int):
-    """Retourne le tournoi Arena actif (setup/running) sous forme de dict Python (JSON déjà décodés), ou None."""
-    await _arena_ensure_tables(db_path)
-    async with aiosqlite.connect(db_path) as db:
-        async with db.execute(
-            "SELECT * FROM arena_tournaments WHERE guild_id=? AND state IN ('setup','running') ORDER BY id DESC LIMIT 1",
-            (int(guild_id),)
-        ) as cur:
-            row = await cur.fetchone()
-            if not row:
-                return None
-            cols = [c[0] for c in cur.description]
-            rec = dict(zip(cols, row))
-            rec["participants"] = json.loads(rec["participants_json"])
-            rec["schedule"] = json.loads(rec["schedule_json"])
-            rec["scores"] = json.loads(rec["scores_json"])
-            return rec
+    """Retourne le tournoi Arena actif (setup/running) sous forme de record Arena, ou None (via ACTIVE_CACHE)."""
+    async def load():
+        async with connect(db_path) as db:
+            return await _arena_fetch(
+                db, "guild_id=? AND state IN ('setup','running') ORDER BY id DESC LIMIT 1", (int(guild_id),)
+            )
+    return await cached_active(db_path, "arena", guild_id, load)
+
 
 async def arena_create(db_path: str, guild_id: int, created_by: int, rounds_total: int,
                        participants: list[int], schedule: list[list[list[int]]]) -> int:
     """Crée un tournoi Arena en état 'running' (round courant = 1). Retourne l'id."""
-    await _arena_ensure_tables(db_path)
-    async with aiosqlite.connect(db_path) as db:
-        scores = {str(uid): 0 for uid in participants}
-        await db.execute("""
+    async with connect(db_path) as db:
+        now = int(time.time())
+        row = await _insert_returning(db, "arena_tournaments", """
             INSERT INTO arena_tournaments
-            (guild_id, state, created_by, created_at, rounds_total, current_round, participants_json, schedule_json, scores_json)
-            VALUES (?, 'running', ?, ?, ?, 1, ?, ?, ?)
-        """, (
-            int(guild_id), int(created_by), int(time.time()), int(rounds_total),
-            json.dumps(participants), json.dumps(schedule), json.dumps(scores)
-        ))
+            (guild_id, state, created_by, created_at, rounds_total, current_round)
+            VALUES (?, 'running', ?, ?, ?, 1)
+        """, (int(guild_id), int(created_by), now, int(rounds_total)), columns="id")
+        tid = int(row["id"])
+        await _arena_insert_children(db, tid, participants, schedule, {}, {}, now)
         await db.commit()
-        cur = await db.execute("SELECT last_insert_rowid()")
-        (tid,) = await cur.fetchone()
-        return int(tid)
+        update_active_cache(db_path, "arena", await _arena_fetch(db, "id=?", (tid,)))
+        return tid
 
-async def arena_update_scores_and_advance(db_path: str, arena_id: int, new_scores: dict[int, int]):
-    """Ajoute des points aux joueurs et passe au round suivant (ou termine si dernier round atteint)."""
-    async with aiosqlite.connect(db_path) as db:
-        async with db.execute(
-            "SELECT rounds_total, current_round, scores_json FROM arena_tournaments WHERE id=?",
-            (int(arena_id),)
-        ) as cur:
-            row = await cur.fetchone()
-            if not row:
-                return
-            rounds_total, current_round, scores_json = row
-            scores = json.loads(scores_json)
 
-        for uid, pts in (new_scores or {}).items():
-            scores[str(int(uid))] = int(scores.get(str(int(uid)), 0)) + int(pts)
+async def arena_get_by_id(db_path: str, arena_id: int, archived: bool = False):
+    """Récupère un tournoi Arena par id (record Arena) ; archived=True : le cherche dans les archives."""
+    async with connect(db_path) as db:
+        return await _arena_fetch(db, "id=?", (int(arena_id),), archived=archived)
 
-        next_round = int(current_round) + 1
-        state = "running" if next_round <= int(rounds_total) else "finished"
 
-        await db.execute("""
-            UPDATE arena_tournaments
-            SET scores_json=?, current_round=?, state=?
-            WHERE id=?
-        """, (
-            json.dumps(scores),
-            int(next_round if state == "running" else current_round),
-            state,
-            int(arena_id)
-        ))
+async def arena_set_state(db_path: str, arena_id: int, new_state: str):
+    """Force l'état (running/finished/cancelled)."""
+    async with connect(db_path) as db:
+        await db.execute(
+            "UPDATE arena_tournaments SET state=? WHERE id=?", (new_state, int(arena_id))
+        )
         await db.commit()
+        update_active_cache(db_path, "arena", await _arena_fetch(db, "id=?", (int(arena_id),)))
 
-async def arena_get_by_id(db_path: str, arena_id: int):
-    """Récupère un tournoi Arena par id (dict avec JSON décodés)."""
-    await _arena_ensure_tables(db_path)
-    async with aiosqlite.connect(db_path) as db:
-        async with db.execute("SELECT * FROM arena_tournaments WHERE id=?", (int(arena_id),)) as cur:
-            row = await cur.fetchone()
+
+async def arena_mark_results(db_path: str, arena_id: int, round_index: int,
+                             results: Dict[Tuple[int, int], Tuple[int, int]]) -> Arena:
+    """
+    Report (éventuellement partiel) d'un round :
+    - `results` : {(u1, u2): (top, points)} pour les duos saisis
+    - UPSERT dans arena_reports ; un duo re-reporté remplace son report précédent
+      (les scores sont corrigés du delta de points, pas cumulés deux fois)
+    - Avance si tous les duos du round courant ont un report (COUNT)
+    - RuntimeError si le tournoi n'est pas en cours ou si `round_index` n'est pas son round courant
+    Concurrence : lecture de l'état et écritures dans une même transaction BEGIN IMMEDIATE
+    (verrou d'écriture pris dès le début) : les reports simultanés sont sérialisés, chacun
+    relit l'état laissé par le précédent ; ils se cumulent et le round n'avance qu'une fois.
+    Retourne le tournoi rechargé (même forme que arena_get_by_id).
+    """
+    aid = int(arena_id)
+    rnd = int(round_index)
+    async with connect(db_path) as db:
+        await db.execute("BEGIN IMMEDIATE")
+        try:
+            async with db.execute(
+                "SELECT state, current_round, rounds_total FROM arena_tournaments WHERE id=?", (aid,)
+            ) as cur:
+                row = await cur.fetchone()
             if not row:
-                return None
-            cols = [c[0] for c in cur.description]
-            rec = dict(zip(cols, row))
-            rec["participants"] = json.loads(rec["participants_json"])
-            rec["schedule"] = json.loads(rec["schedule_json"])
-            rec["scores"] = json.loads(rec["scores_json"])
-            return rec
+                raise RuntimeError("Arena introuvable")
+            state, cur_round, rounds_total = row[0], int(row[1]), int(row[2])
+            if state != "running":
+                raise RuntimeError(f"Arena {aid} non en cours ({state})")
+            if rnd != cur_round:
+                raise RuntimeError(f"Arena {aid} : report du round {rnd}, round courant {cur_round}")
+
+            now = int(time.time())
+            for (a, b), (rank, pts) in (results or {}).items():
+                async with db.execute("""
+                    SELECT d.duo_idx, r.points
+                    FROM arena_duos d
+                    LEFT JOIN arena_reports r
+                      ON r.arena_id=d.arena_id AND r.round=d.round AND r.duo_idx=d.duo_idx
+                    WHERE d.arena_id=? AND d.round=? AND ((d.u1=? AND d.u2=?) OR (d.u1=? AND d.u2=?))
+                """, (aid, rnd, int(a), int(b), int(b), int(a))) as cur:
+                    hit = await cur.fetchone()
+                if not hit:
+                    continue
+                duo_idx, old_pts = hit
+                await db.execute("""
+                    INSERT INTO arena_reports (arena_id, round, duo_idx, rank, points, reported_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(arena_id, round, duo_idx) DO UPDATE SET
+                      rank=excluded.rank, points=excluded.points, reported_at=excluded.reported_at
+                """, (aid, rnd, int(duo_idx), int(rank), int(pts), now))
+                delta = int(pts) - int(old_pts or 0)
+                if delta:
+                    await db.execute(
+                        "UPDATE arena_participants SET score = score + ? WHERE arena_id=? AND user_id IN (?, ?)",
+                        (delta, aid, int(a), int(b))
+                    )
+
+            # Complétude du round courant
+            async with db.execute("""
+                SELECT (SELECT COUNT(*) FROM arena_duos WHERE arena_id=? AND round=?),
+                       (SELECT COUNT(*) FROM arena_reports WHERE arena_id=? AND round=?)
+            """, (aid, cur_round, aid, cur_round)) as cur:
+                needed, have = await cur.fetchone()
+
+            if needed and have >= needed:
+                if cur_round + 1 > rounds_total:
+                    state = "finished"
+                else:
+                    cur_round += 1
 
-async def arena_set_state(db_path: str, arena_id: int, new_state: str):
-    """Force l'état (running/finished/cancelled)."""
-    await _arena_ensure_tables(db_path)
-    async with aiosqlite.connect(db_path) as db:
-        await db.execute("UPDATE arena_tournaments SET state=? WHERE id=?", (new_state, int(arena_id)))
+            await db.execute(
+                "UPDATE arena_tournaments SET current_round=?, state=? WHERE id=?",
+                (cur_round, state, aid)
+            )
+            await db.commit()
+        except BaseException:
+            await db.rollback()
+            raise
+        arena = await _arena_fetch(db, "id=?", (aid,))
+        update_active_cache(db_path, "arena", arena)
+        return arena
+
+
+# =========================
+# Sauvegarde en ligne (API backup de SQLite)
+# =========================
+BACKUP_COMPRESSIONS = {"gzip": (".gz", gzip.open), "xz": (".xz", lzma.open)}
+
+
+def _backup_sync(db_path, dest: Path, compression: str, pages: int, sleep_s: float) -> int:
+    """
+    Copie cohérente de la base (même en WAL, même pendant une transaction) vers `dest`, compressée.
+    Copie par lots de `pages` pages : les écrivains ne sont bloqués que le temps d'un lot.
+    Retourne la taille de la base non compressée.
+    """
+    raw = dest.with_suffix("")
+    src = sqlite3.connect(str(db_path), timeout=int(_PROFILE["busy_timeout"]) / 1000)
+    dst = sqlite3.connect(str(raw))
+    try:
+        src.backup(dst, pages=pages, sleep=sleep_s)
+    finally:
+        dst.close()
+        src.close()
+    try:
+        raw_size = raw.stat().st_size
+        _suffix, opener = BACKUP_COMPRESSIONS[compression]
+        with open(raw, "rb") as fin, opener(dest, "wb") as fout:
+            shutil.copyfileobj(fin, fout, 1024 * 1024)
+    finally:
+        raw.unlink(missing_ok=True)
+    return raw_size
+
+
+async def backup_db(db_path, dest_dir, compression: str = "gzip", pages: int = 256,
+                    sleep_s: float = 0.005) -> Dict[str, object]:
+    """
+    Instantané compressé de la base dans `dest_dir`, réalisé dans un thread (la boucle n'est jamais bloquée).
+    Les écritures différées sont vidées avant. Retourne {path, raw_size, size, seconds}.
+    """
+    if compression not in BACKUP_COMPRESSIONS:
+        raise ValueError(f"Compression inconnue: {compression} (attendu: {', '.join(BACKUP_COMPRESSIONS)})")
+    await WRITE_BEHIND.flush()
+    await persist_memory_db()  # mode mémoire : le fichier lu ci-dessous doit être à jour
+    suffix, _opener = BACKUP_COMPRESSIONS[compression]
+    ts = time.strftime("%Y-%m-%d_%H-%M-%S", time.gmtime())
+    dest = Path(dest_dir) / f"{Path(db_path).stem}-{ts}.db{suffix}"
+    t0 = time.perf_counter()
+    raw_size = await asyncio.to_thread(_backup_sync, db_path, dest, compression, pages, sleep_s)
+    info = {
+        "path": dest,
+        "raw_size": raw_size,
+        "size": dest.stat().st_size,
+        "seconds": time.perf_counter() - t0,
+    }
+    print(f"[db] sauvegarde {dest.name} : {raw_size} o -> {info['size']} o en {info['seconds']:.2f}s")
+    return info
+
+
+# =========================
+# Export CSV (zip en flux, hors boucle)
+# =========================
+# Tables sans guild_id / created_at : filtrées via leur tournoi / session parent
+_EXPORT_PARENTS: Dict[str, Tuple[str, str]] = {
+    "tournament_participants": ("tournament_id", "tournaments"),
+    "tournament_matches": ("tournament_id", "tournaments"),
+    "team_pair_counts": ("session_id", "team_sessions"),
+    "tt_teams": ("tournament_id", "team_tournaments"),
+    "team_matches": ("tournament_id", "team_tournaments"),
+    "arena_participants": ("arena_id", "arena_tournaments"),
+    "arena_duos": ("arena_id", "arena_tournaments"),
+    "arena_reports": ("arena_id", "arena_tournaments"),
+}
+# … et leurs archives, rattachées aux compétitions archivées
+_EXPORT_PARENTS.update({
+    f"{child}_archive": (fk, f"{parent}_archive")
+    for child, (fk, parent) in list(_EXPORT_PARENTS.items()) if child != "team_pair_counts"
+})
+# Colonnes BLOB (app.codec) rendues lisibles dans le CSV
+_EXPORT_DECODERS = {
+    ("tt_teams", "members"): lambda v: json.dumps(decode_ids(v)),
+    ("tt_teams_archive", "members"): lambda v: json.dumps(decode_ids(v)),
+    ("export_watermarks", "open_ids"): lambda v: json.dumps(decode_ids(v)),
+}
+
+
+def _export_where(con: sqlite3.Connection, table: str, guild_id: Optional[int],
+                  since: Optional[int], until: Optional[int]) -> Tuple[str, list]:
+    """Clause WHERE des filtres serveur / période pour `table` ("" si la table n'est pas concernée)."""
+    def direct(t: str) -> Tuple[List[str], list]:
+        cols = {r[1] for r in con.execute(f"PRAGMA table_info({t})")}
+        conds, params = [], []
+        if guild_id is not None and "guild_id" in cols:
+            conds.append("guild_id=?"); params.append(int(guild_id))
+        if since is not None and "created_at" in cols:
+            conds.append("created_at>=?"); params.append(int(since))
+        if until is not None and "created_at" in cols:
+            conds.append("created_at<?"); params.append(int(until))
+        return conds, params
+
+    conds, params = direct(table)
+    if not conds and table in _EXPORT_PARENTS:
+        fk, parent = _EXPORT_PARENTS[table]
+        pconds, params = direct(parent)
+        if pconds:
+            conds = [f"{fk} IN (SELECT id FROM {parent} WHERE {' AND '.join(pconds)})"]
+    return (" WHERE " + " AND ".join(conds)) if conds else "", params
+
+
+def _open_export_snapshot(db_path, workdir: Path) -> Tuple[sqlite3.Connection, Optional[Path]]:
+    """
+    Connexion en lecture seule sur un état figé de la base : (connexion, copie temporaire à supprimer ou None).
+    WAL : un BEGIN suffit (cohérent entre tables, n'arrête pas les écrivains).
+    Journal rollback : une lecture longue bloquerait les écritures -> on lit une copie (API backup).
+    """
+    con = trace_sqlite3(sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True,
+                                        timeout=int(_PROFILE["busy_timeout"]) / 1000))
+    if con.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal":
+        con.execute("BEGIN")
+        return con, None
+    snap = workdir / f".snapshot-{time.time_ns()}.db"
+    copy_con = trace_sqlite3(sqlite3.connect(str(snap)))
+    try:
+        con.backup(copy_con, pages=256, sleep=0.005)
+    finally:
+        con.close()
+    return copy_con, snap
+
+
+def _export_tables(con: sqlite3.Connection) -> List[str]:
+    return [r[0] for r in con.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+    )]
+
+
+def _write_part(z: zipfile.ZipFile, table: str, cur: sqlite3.Cursor, fmt: str, chunk: int) -> int:
+    """Écrit le résultat de `cur` dans l'entrée `<table>.<fmt>` de l'archive, par paquets de `chunk` lignes."""
+    cols = [c[0] for c in cur.description]
+    decoders = {i: _EXPORT_DECODERS[(table, c)] for i, c in enumerate(cols) if (table, c) in _EXPORT_DECODERS}
+    n = 0
+    with z.open(f"{table}.{fmt}", "w", force_zip64=True) as raw, \
+            io.TextIOWrapper(raw, encoding="utf-8", newline="") as f:
+        writer = csv.writer(f) if fmt == "csv" else None
+        if writer:
+            writer.writerow(cols)
+        while True:
+            rows = cur.fetchmany(chunk)
+            if not rows:
+                break
+            if decoders:
+                rows = [[decoders[i](v) if i in decoders else v for i, v in enumerate(r)] for r in rows]
+            if writer:
+                writer.writerows(rows)
+            else:
+                f.writelines(json.dumps(dict(zip(cols, r)), ensure_ascii=False) + "\n" for r in rows)
+            n += len(rows)
+    return n
+
+
+def _export_sync(db_path, dest: Path, tables: Optional[List[str]], guild_id: Optional[int],
+                 since: Optional[int], until: Optional[int], chunk: int) -> Dict[str, int]:
+    """
+    Écrit chaque table en CSV directement dans l'archive `dest` (pas de fichiers intermédiaires),
+    par paquets de `chunk` lignes, depuis un instantané en lecture seule.
+    """
+    con, snap = _open_export_snapshot(db_path, dest.parent)
+    try:
+        counts: Dict[str, int] = {}
+        with zipfile.ZipFile(dest, "w", compression=zipfile.ZIP_DEFLATED) as z:
+            for t in _export_tables(con):
+                if tables and t not in tables:
+                    continue
+                where, params = _export_where(con, t, guild_id, since, until)
+                counts[t] = _write_part(z, t, con.execute(f"SELECT * FROM {t}{where}", params), "csv", chunk)
+        return counts
+    finally:
+        con.close()
+        if snap is not None:
+            snap.unlink(missing_ok=True)
+
+
+async def export_csv_zip(db_path, dest_dir, tables: Optional[List[str]] = None, guild_id: Optional[int] = None,
+                         since: Optional[int] = None, until: Optional[int] = None,
+                         chunk: int = 5000) -> Dict[str, object]:
+    """
+    Export CSV zippé (un fichier par table) réalisé dans un thread.
+    Filtres optionnels : tables, serveur (guild_id), période [since, until[ en timestamps.
+    Retourne {path, tables: {table: nb_lignes}, size, seconds}.
+    """
+    await WRITE_BEHIND.flush()
+    await persist_memory_db()  # mode mémoire : le fichier lu ci-dessous doit être à jour
+    ts = time.strftime("%Y-%m-%d_%H-%M-%S", time.gmtime())
+    dest = Path(dest_dir) / f"export-{ts}.zip"
+    t0 = time.perf_counter()
+    counts = await asyncio.to_thread(_export_sync, db_path, dest, tables, guild_id, since, until, chunk)
+    info = {"path": dest, "tables": counts, "size": dest.stat().st_size, "seconds": time.perf_counter() - t0}
+    print(f"[db] export {dest.name} : {len(counts)} tables, {sum(counts.values())} lignes, "
+          f"{info['size']} o en {info['seconds']:.2f}s")
+    return info
+
+
+# =========================
+# Export incrémental (filigranes par table, table export_watermarks)
+# =========================
+# Lignes jamais modifiées après insertion : filigrane = plus grand rowid exporté
+_INCR_ROWID = ("team_history", "team_sessions")
+# Journaux horodatés (dont les archives, alimentées par lots) : filigrane = horodatage
+# (la seconde en cours part au prochain export)
+_INCR_TIME = {
+    "team_last_history": "created_at",
+    **{f"{t}_archive": "archived_at" for t in (
+        "tournaments", "tournament_participants", "tournament_matches",
+        "team_tournaments", "tt_teams", "team_matches",
+        "arena_tournaments", "arena_participants", "arena_duos", "arena_reports",
+    )},
+}
+# Compétitions : leurs lignes changent tant qu'elles sont actives (scores, états, brackets régénérés).
+# parent -> (colonne FK des enfants, enfants). Filigrane = plus grand id parent exporté + ids encore
+# actifs à ce moment-là, ré-exportés (parent et enfants) à chaque passage jusqu'à leur clôture.
+_INCR_FAMILIES: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "tournaments": ("tournament_id", ("tournament_participants", "tournament_matches")),
+    "team_tournaments": ("tournament_id", ("tt_teams", "team_matches")),
+    "arena_tournaments": ("arena_id", ("arena_participants", "arena_duos", "arena_reports")),
+}
+# Toute autre table (ratings, liens LoL, compteurs de paires…) : instantané complet à chaque export
+
+
+def _export_incremental_sync(db_path, dest: Path, fmt: str, full: bool, chunk: int):
+    """Retourne (manifeste par table, nouveaux filigranes [(table, mark, ids_ouverts)])."""
+    con, snap = _open_export_snapshot(db_path, dest.parent)
+    try:
+        marks: Dict[str, Tuple[int, List[int]]] = {}
+        if not full:
+            for tbl, mark, open_ids in con.execute("SELECT tbl, mark, open_ids FROM export_watermarks"):
+                marks[tbl] = (int(mark), decode_ids(open_ids))
+        now = int(time.time())
+        tables = [t for t in _export_tables(con) if t != "export_watermarks"]
+
+        # Sélection des compétitions à (ré)exporter, partagée par le parent et ses enfants
+        family_sel: Dict[str, Tuple[str, list]] = {}
+        new_marks: List[Tuple[str, int, List[int]]] = []
+        for parent in _INCR_FAMILIES:
+            if parent not in tables:
+                continue
+            old, old_open = marks.get(parent, (None, []))
+            (hi,) = con.execute(f"SELECT COALESCE(MAX(id), 0) FROM {parent}").fetchone()
+            active = [r[0] for r in con.execute(
+                f"SELECT id FROM {parent} WHERE state IN ({','.join('?' * len(ACTIVE_STATES))})", ACTIVE_STATES
+            )]
+            reopen = sorted(set(old_open) | set(active))
+            # « OR col IN () » ferait perdre l'index (scan complet) : omis quand rien n'est à rouvrir
+            family_sel[parent] = (
+                f"({{col}} > ? OR {{col}} IN ({','.join('?' * len(reopen))}))" if reopen else "{col} > ?",
+                [-1 if old is None else old, *reopen],
+            )
+            new_marks.append((parent, hi, active))
+        child_of = {c: (parent, fk) for parent, (fk, children) in _INCR_FAMILIES.items() for c in children}
+
+        manifest: Dict[str, dict] = {}
+        with zipfile.ZipFile(dest, "w", compression=zipfile.ZIP_DEFLATED) as z:
+            for t in tables:
+                old = marks.get(t, (None, []))[0]
+                entry: Dict[str, object] = {"from": old}
+                if t in _INCR_ROWID:
+                    (hi,) = con.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {t}").fetchone()
+                    cur = con.execute(f"SELECT * FROM {t} WHERE rowid > ? ORDER BY rowid", (old or 0,))
+                    entry.update(mode="rowid", to=hi)
+                    new_marks.append((t, hi, []))
+                elif t in _INCR_TIME:
+                    col, hi = _INCR_TIME[t], now - 1
+                    cur = con.execute(f"SELECT * FROM {t} WHERE {col} > ? AND {col} <= ?",
+                                      (-1 if old is None else old, hi))
+                    entry.update(mode="time", to=hi)
+                    new_marks.append((t, hi, []))
+                elif t in family_sel or (t in child_of and child_of[t][0] in family_sel):
+                    parent, col = (t, "id") if t in family_sel else child_of[t]
+                    where, params = family_sel[parent]
+                    cur = con.execute(f"SELECT * FROM {t} WHERE {where.format(col=col)}", params)
+                    entry.update(mode="upsert", parent=parent, **{"from": marks.get(parent, (None, []))[0]})
+                else:
+                    cur = con.execute(f"SELECT * FROM {t}")
+                    entry.update(mode="full")
+                entry["rows"] = _write_part(z, t, cur, fmt, chunk)
+                manifest[t] = entry
+            z.writestr("manifest.json", json.dumps(
+                {"generated_at": now, "format": fmt, "full": full or not marks, "tables": manifest}, indent=2
+            ))
+        return manifest, new_marks
+    finally:
+        con.close()
+        if snap is not None:
+            snap.unlink(missing_ok=True)
+
+
+async def export_incremental(db_path, dest_dir, fmt: str = "jsonl", full: bool = False,
+                             chunk: int = 5000) -> Dict[str, object]:
+    """
+    Export des seules lignes nouvelles depuis le dernier export validé (JSONL ou CSV, une partie par table
+    + manifest.json). Les filigranes ne sont PAS enregistrés ici : appeler commit_export_watermarks(info["marks"])
+    une fois l'archive livrée. Le premier export (ou full=True) contient tout.
+    """
+    if fmt not in ("jsonl", "csv"):
+        raise ValueError(f"Format inconnu: {fmt} (attendu: jsonl, csv)")
+    await WRITE_BEHIND.flush()
+    await persist_memory_db()  # mode mémoire : le fichier lu ci-dessous doit être à jour
+    ts = time.strftime("%Y-%m-%d_%H-%M-%S", time.gmtime())
+    dest = Path(dest_dir) / f"incremental-{ts}.zip"
+    t0 = time.perf_counter()
+    manifest, marks = await asyncio.to_thread(_export_incremental_sync, db_path, dest, fmt, full, chunk)
+    info = {
+        "path": dest,
+        "tables": {t: e["rows"] for t, e in manifest.items()},
+        "manifest": manifest,
+        "marks": marks,
+        "size": dest.stat().st_size,
+        "seconds": time.perf_counter() - t0,
+    }
+    print(f"[db] export incrémental {dest.name} : {sum(info['tables'].values())} lignes, "
+          f"{info['size']} o en {info['seconds']:.2f}s")
+    return info
+
+
+async def commit_export_watermarks(db_path, marks: List[Tuple[str, int, List[int]]]):
+    """Enregistre les filigranes d'un export incrémental livré (le prochain repartira de là)."""
+    now = int(time.time())
+    async with connect(db_path) as db:
+        await db.executemany("""
+            INSERT INTO export_watermarks (tbl, mark, open_ids, updated_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(tbl) DO UPDATE SET
+              mark=excluded.mark, open_ids=excluded.open_ids, updated_at=excluded.updated_at
+        """, [(t, int(m), encode_ids(open_ids), now) for t, m, open_ids in marks])
         await db.commit()
 
 
+# =========================
+# Maintenance périodique (lancée par TeamBot à l'heure creuse)
+# =========================
+TEAM_HISTORY_KEEP = 200  # signatures conservées par bucket (guild, session, joueurs, tailles)
+
+# Archivage : (kind du cache actif, parent, [(enfant, colonne FK)]) — enfants d'abord à la suppression
+_ARCHIVE_FAMILIES = (
+    ("tournament", "tournaments", (("tournament_participants", "tournament_id"), ("tournament_matches", "tournament_id"))),
+    ("tt", "team_tournaments", (("team_matches", "tournament_id"), ("tt_teams", "tournament_id"))),
+    ("arena", "arena_tournaments", (("arena_reports", "arena_id"), ("arena_duos", "arena_id"),
+                                    ("arena_participants", "arena_id"))),
+)
+# États terminaux (+ 'setup' : préparation abandonnée, une fois passé le délai d'archivage)
+ARCHIVE_STATES = ("finished", "cancelled", "setup")
+
+
+async def _archive_competitions_tx(db: aiosqlite.Connection, db_path, cutoff: int) -> Dict[str, int]:
+    """Déplace vers *_archive les compétitions terminées créées avant `cutoff` (dans la transaction courante)."""
+    now = int(time.time())
+    out: Dict[str, int] = {}
+    await db.execute("CREATE TEMP TABLE IF NOT EXISTS _archive_ids (id INTEGER PRIMARY KEY, guild_id INTEGER, state TEXT)")
+    for kind, parent, children in _ARCHIVE_FAMILIES:
+        await db.execute("DELETE FROM _archive_ids")
+        await db.execute(
+            f"INSERT INTO _archive_ids SELECT id, guild_id, state FROM {parent} "
+            f"WHERE state IN ({','.join('?' * len(ARCHIVE_STATES))}) AND created_at < ?",
+            (*ARCHIVE_STATES, cutoff)
+        )
+        for table, fk in ((parent, "id"), *children):
+            async with db.execute(f"PRAGMA table_info({table})") as cur:
+                cols = ", ".join(r[1] for r in await cur.fetchall())
+            await db.execute(
+                f"INSERT INTO {table}_archive ({cols}, archived_at) "
+                f"SELECT {cols}, ? FROM {table} WHERE {fk} IN (SELECT id FROM _archive_ids)", (now,)
+            )
+        for table, fk in (*children, (parent, "id")):
+            await db.execute(f"DELETE FROM {table} WHERE {fk} IN (SELECT id FROM _archive_ids)")
+        async with db.execute("SELECT guild_id, state FROM _archive_ids") as cur:
+            moved = await cur.fetchall()
+        # Une préparation abandonnée était l'entrée « active » du cache : on l'oublie
+        for guild_id, state in moved:
+            if state in ACTIVE_STATES:
+                _forget_active(db_path, kind, guild_id)
+        out[parent] = len(moved)
+    return out
 
-def _pair_key(a: int, b: int) -> str:
-    x, y = sorted((int(a), int(b)))
-    return f"{x}-{y}"
 
-async def arena_mark_results(db_path: str, arena_id: int, round_index: int,
-                             new_scores: Dict[int, int],
-                             reported_pairs: List[Tuple[int, int]]) -> Dict:
+async def archive_competitions(db_path, older_than_days: int = 30) -> Dict[str, int]:
     """
-    - Ajoute `new_scores` aux scores
-    - Marque les `reported_pairs` pour le round `round_index`
-    - Avance si le round courant est complet
-    - Migration à la volée: ajoute reported_json à arena_tournaments si absente
+    Archive (tables *_archive) les tournois / tournois Teams / arenas terminés, annulés ou restés en
+    préparation, créés il y a plus de `older_than_days` jours. Retourne le nombre de compétitions par table.
+    Lecture ensuite via archived=True (list_matches, list_participants, arena_get_by_id, list_competitions…).
     """
-    import aiosqlite, json
+    cutoff = int(time.time()) - int(older_than_days) * 86400
+    async with connect(db_path) as db:
+        await db.execute("BEGIN")
+        try:
+            out = await _archive_competitions_tx(db, db_path, cutoff)
+            await db.commit()
+        except BaseException:
+            await db.rollback()
+            raise
+    return out
+
+
+_COMPETITION_RECORDS = {"tournament": Tournament, "tt": TeamTournament, "arena": Arena}
+
+
+async def list_competitions(db_path, kind: str, guild_id: int, archived: bool = False, limit: int = 50) -> List[Record]:
+    """
+    Compétitions d'un serveur (plus récentes d'abord) ; kind : 'tournament' | 'tt' | 'arena'.
+    Ligne parente seule (pour Arena : participants / planning / scores vides, cf. arena_get_by_id).
+    """
+    parent = {k: p for k, p, _c in _ARCHIVE_FAMILIES}[kind]
+    cls = _COMPETITION_RECORDS[kind]
+    async with connect(db_path) as db:
+        return await fetch_records(
+            db, cls, f"SELECT {cls.COLUMNS} FROM {table_for(parent, archived)} WHERE guild_id=? ORDER BY id DESC LIMIT ?",
+            (int(guild_id), int(limit))
+        )
 
-    def _pair_key(a: int, b: int) -> str:
-        x, y = sorted((int(a), int(b)))
-        return f"{x}-{y}"
 
-    async with aiosqlite.connect(db_path) as db:
-        db.row_factory = aiosqlite.Row
 
-        # --- MIGRATION à la volée : s'assurer que reported_json existe
-        # (ne casse rien si la colonne est déjà là)
+
+async def run_maintenance(db_path, keep_signatures: int = TEAM_HISTORY_KEEP, session_max_age_days: int = 90,
+                          archive_after_days: int = 30, vacuum_pages: int = 2000) -> Dict[str, int]:
+    """
+    Une passe de maintenance ; retourne le nombre de lignes touchées par étape (+ pages libérées).
+    Étapes : pruning des signatures par bucket, purge des sessions inactives (compteurs et signatures compris),
+    archivage des compétitions terminées, ANALYZE borné + PRAGMA optimize, incremental_vacuum,
+    checkpoint WAL (TRUNCATE).
+    """
+    await WRITE_BEHIND.flush()
+    now = int(time.time())
+    session_cutoff = now - int(session_max_age_days) * 86400
+    archive_cutoff = now - int(archive_after_days) * 86400
+    out: Dict[str, int] = {}
+    async with connect(db_path) as db:
+        await db.execute("BEGIN")
         try:
-            cur = await db.execute("PRAGMA table_info(arena_tournaments);")
-            cols = [r[1] for r in await cur.fetchall()]
-            await cur.close()
-            if "reported_json" not in cols:
-                await db.execute(
-                    "ALTER TABLE arena_tournaments "
-                    "ADD COLUMN reported_json TEXT NOT NULL DEFAULT '{}';"
+            # 1) Signatures : une seule requête pour tous les buckets (remplace le pruning après chaque roll)
+            cur = await db.execute("""
+                DELETE FROM team_history WHERE id IN (
+                    SELECT id FROM (
+                        SELECT id, ROW_NUMBER() OVER (
+                            PARTITION BY guild_id, session, players_fp, sizes_fp
+                            ORDER BY created_at DESC, id DESC
+                        ) AS rn
+                        FROM team_history
+                    ) WHERE rn > ?
                 )
-                await db.commit()
-        except Exception:
-            # On ignore silencieusement : si la table n'existe pas encore, on tombera sur la table legacy plus bas
-            pass
+            """, (int(keep_signatures),))
+            out["signatures"] = cur.rowcount
 
-        # 1) On tente la table moderne
-        cur = await db.execute("SELECT * FROM arena_tournaments WHERE id=?", (int(arena_id),))
-        row = await cur.fetchone()
-        await cur.close()
+            # 2) Sessions TeamRoll sans activité (ni création ni signature) depuis session_max_age_days,
+            #    avec leurs signatures : une session recréée sous le même nom repart d'un historique vide
+            cur = await db.execute("""
+                SELECT s.id, s.guild_id, s.name FROM team_sessions s
+                WHERE s.created_at < ? AND NOT EXISTS (
+                    SELECT 1 FROM team_history h
+                    WHERE h.guild_id=s.guild_id AND h.session=s.name AND h.created_at >= ?
+                )
+            """, (session_cutoff, session_cutoff))
+            stale = await cur.fetchall()
+            await cur.close()
+            sids = [(sid,) for sid, _g, _n in stale]
+            await db.executemany("DELETE FROM team_pair_counts WHERE session_id=?", sids)
+            await db.executemany("DELETE FROM team_history WHERE guild_id=? AND session=?",
+                                 [(g, name) for _s, g, name in stale])
+            await db.executemany("DELETE FROM team_sessions WHERE id=?", sids)
+            out["sessions"] = len(sids)
+
+            # 3) Compétitions terminées -> tables *_archive (tables chaudes réduites aux compétitions récentes)
+            archived = await _archive_competitions_tx(db, db_path, archive_cutoff)
+            out["archived"] = sum(archived.values())
+            await db.commit()
+        except BaseException:
+            await db.rollback()
+            raise
+
+        # 4) Statistiques du planificateur (ANALYZE borné : coût constant quelle que soit la taille)
+        await db.execute("PRAGMA analysis_limit = 400")
+        await db.execute("ANALYZE")
+        await db.execute("PRAGMA optimize")
+        await db.commit()
 
-        table = "arena_tournaments"
-        if not row:
-            # 2) Fallback vers la table legacy
-            table = "arena"
-            cur = await db.execute("SELECT * FROM arena WHERE id=?", (int(arena_id),))
-            row = await cur.fetchone()
+        # 5) Rendre les pages libres au système (auto_vacuum=INCREMENTAL, posé par la migration 10)
+        async with db.execute("PRAGMA auto_vacuum") as c:
+            (auto_vacuum,) = await c.fetchone()
+        out["vacuum_pages"] = 0
+        if auto_vacuum == 2:
+            async with db.execute("PRAGMA freelist_count") as c:
+                (free_before,) = await c.fetchone()
+            async with db.execute(f"PRAGMA incremental_vacuum({int(vacuum_pages)})") as c:
+                await c.fetchall()  # une page libérée par pas : il faut itérer jusqu'au bout
+            async with db.execute("PRAGMA freelist_count") as c:
+                (free_after,) = await c.fetchone()
+            out["vacuum_pages"] = free_before - free_after
+
+        # 6) Checkpoint WAL complet et remise à zéro du fichier -wal
+        async with db.execute("PRAGMA journal_mode") as c:
+            (mode,) = await c.fetchone()
+        if str(mode).lower() == "wal":
+            async with db.execute("PRAGMA wal_checkpoint(TRUNCATE)") as c:
+                busy, _log, checkpointed = await c.fetchone()
+            out["wal_frames"] = max(0, checkpointed) if not busy else 0
+    return out
+
+
+# =========================
+# Migrations
+# =========================
+async def _m001_base_schema(db: aiosqlite.Connection):
+    """Schéma historique complet (idempotent : CREATE … IF NOT EXISTS)."""
+    await _exec_statements(db, BASE_SCHEMA_SQL)
+    await _exec_statements(db, ARENA_TABLE_SQL)
+
+
+async def _m002_arena_normalized(db: aiosqlite.Connection):
+    """Arena : blobs JSON -> tables participants / duos / reports, colonne version."""
+    await _arena_migrate_legacy(db)
+
+
+HOT_INDEXES_SQL = """
+-- Tournoi actif d'un serveur : WHERE guild_id=? AND state IN (...) ORDER BY id DESC
+CREATE INDEX IF NOT EXISTS idx_tournaments_active ON tournaments(guild_id, state, id);
+CREATE INDEX IF NOT EXISTS idx_team_tournaments_active ON team_tournaments(guild_id, state, id);
+
+-- Bracket : WHERE tournament_id=? ORDER BY round, pos_in_round
+CREATE INDEX IF NOT EXISTS idx_tournament_matches_bracket ON tournament_matches(tournament_id, round, pos_in_round);
+CREATE INDEX IF NOT EXISTS idx_team_matches_bracket ON team_matches(tournament_id, round, pos_in_round);
+
+-- list_participants : couvrant (aucun accès à la table)
+CREATE INDEX IF NOT EXISTS idx_tournament_participants_seed
+ON tournament_participants(tournament_id, seed, user_id, rating);
+
+-- prune_team_signatures : ORDER BY created_at DESC, id DESC sans tri temporaire
+CREATE INDEX IF NOT EXISTS idx_th_recent
+ON team_history(guild_id, session, players_fp, sizes_fp, created_at DESC, id DESC)
+"""
+
+
+async def _m003_hot_indexes(db: aiosqlite.Connection):
+    """Index des requêtes chaudes par serveur / par tournoi (cf. scripts/check_query_plans.py)."""
+    await _exec_statements(db, HOT_INDEXES_SQL)
+
+
+INTEGER_IDS_SQL = """
+CREATE TABLE skills_new (
+    user_id INTEGER PRIMARY KEY,
+    rating REAL NOT NULL
+);
+INSERT INTO skills_new (user_id, rating)
+SELECT CAST(user_id AS INTEGER), rating FROM skills;
+DROP TABLE skills;
+ALTER TABLE skills_new RENAME TO skills;
+
+CREATE TABLE lol_links_new (
+    user_id INTEGER PRIMARY KEY,
+    summoner_name TEXT NOT NULL,
+    region TEXT NOT NULL
+);
+INSERT INTO lol_links_new (user_id, summoner_name, region)
+SELECT CAST(user_id AS INTEGER), summoner_name, region FROM lol_links;
+DROP TABLE lol_links;
+ALTER TABLE lol_links_new RENAME TO lol_links;
+
+CREATE TABLE lol_rank_new (
+    user_id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL, -- offline/riot
+    tier TEXT NOT NULL,
+    division TEXT,
+    lp INTEGER NOT NULL DEFAULT 0,
+    updated_at INTEGER NOT NULL
+);
+INSERT INTO lol_rank_new (user_id, source, tier, division, lp, updated_at)
+SELECT CAST(user_id AS INTEGER), source, tier, division, lp, updated_at FROM lol_rank;
+DROP TABLE lol_rank;
+ALTER TABLE lol_rank_new RENAME TO lol_rank;
+
+CREATE TABLE tournaments_new (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    state TEXT NOT NULL, -- setup | running | finished | cancelled
+    created_by INTEGER NOT NULL,
+    created_at INTEGER NOT NULL,
+    started_at INTEGER
+);
+INSERT INTO tournaments_new (id, guild_id, name, state, created_by, created_at, started_at)
+SELECT id, CAST(guild_id AS INTEGER), name, state, CAST(created_by AS INTEGER), created_at, started_at
+FROM tournaments;
+DROP TABLE tournaments;
+ALTER TABLE tournaments_new RENAME TO tournaments;
+
+-- l'id technique n'était jamais lu : la clé naturelle devient la clé primaire
+CREATE TABLE tournament_participants_new (
+    tournament_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    seed INTEGER NOT NULL,
+    rating REAL NOT NULL,
+    PRIMARY KEY (tournament_id, user_id)
+) WITHOUT ROWID;
+INSERT OR IGNORE INTO tournament_participants_new (tournament_id, user_id, seed, rating)
+SELECT tournament_id, CAST(user_id AS INTEGER), seed, rating FROM tournament_participants;
+DROP TABLE tournament_participants;
+ALTER TABLE tournament_participants_new RENAME TO tournament_participants;
+
+CREATE TABLE tournament_matches_new (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tournament_id INTEGER NOT NULL,
+    round INTEGER NOT NULL,
+    pos_in_round INTEGER NOT NULL, -- index du match dans la ronde
+    p1_user_id INTEGER,
+    p2_user_id INTEGER,
+    p1_score INTEGER DEFAULT 0,
+    p2_score INTEGER DEFAULT 0,
+    best_of INTEGER NOT NULL DEFAULT 1,
+    winner_user_id INTEGER,
+    status TEXT NOT NULL, -- pending | open | done
+    next_match_id INTEGER,
+    next_slot INTEGER -- 1 ou 2 (position dans le match suivant)
+);
+INSERT INTO tournament_matches_new
+SELECT id, tournament_id, round, pos_in_round,
+       CAST(p1_user_id AS INTEGER), CAST(p2_user_id AS INTEGER),
+       p1_score, p2_score, best_of, CAST(winner_user_id AS INTEGER),
+       status, next_match_id, next_slot
+FROM tournament_matches;
+DROP TABLE tournament_matches;
+ALTER TABLE tournament_matches_new RENAME TO tournament_matches;
+
+CREATE TABLE team_sessions_new (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    created_at INTEGER NOT NULL
+);
+INSERT INTO team_sessions_new (id, guild_id, name, created_at)
+SELECT id, CAST(guild_id AS INTEGER), name, created_at FROM team_sessions;
+DROP TABLE team_sessions;
+ALTER TABLE team_sessions_new RENAME TO team_sessions;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_team_sessions_unique ON team_sessions(guild_id, name);
+
+-- (session_id, user_a, user_b) couvre aussi les lectures par session : idx_team_pairs_by_session disparaît
+CREATE TABLE team_pair_counts_new (
+    session_id INTEGER NOT NULL,
+    user_a INTEGER NOT NULL,
+    user_b INTEGER NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (session_id, user_a, user_b),
+    FOREIGN KEY(session_id) REFERENCES team_sessions(id) ON DELETE CASCADE
+) WITHOUT ROWID;
+INSERT INTO team_pair_counts_new (session_id, user_a, user_b, count)
+SELECT session_id,
+       MIN(CAST(user_a AS INTEGER), CAST(user_b AS INTEGER)),
+       MAX(CAST(user_a AS INTEGER), CAST(user_b AS INTEGER)),
+       SUM(count)
+FROM team_pair_counts
+GROUP BY 1, 2, 3;
+DROP TABLE team_pair_counts;
+ALTER TABLE team_pair_counts_new RENAME TO team_pair_counts;
+
+CREATE TABLE team_last_new (
+    guild_id INTEGER PRIMARY KEY,
+    snapshot_json TEXT NOT NULL,
+    updated_at INTEGER NOT NULL
+);
+INSERT INTO team_last_new (guild_id, snapshot_json, updated_at)
+SELECT CAST(guild_id AS INTEGER), snapshot_json, updated_at FROM team_last;
+DROP TABLE team_last;
+ALTER TABLE team_last_new RENAME TO team_last
+"""
+
+
+async def _m004_integer_ids(db: aiosqlite.Connection):
+    """
+    IDs Discord (user/guild) en INTEGER partout : reconstruction des tables qui les stockaient en TEXT.
+    Clés naturelles en INTEGER PRIMARY KEY (alias du rowid) ou WITHOUT ROWID pour les clés composites.
+    """
+    await _exec_statements(db, INTEGER_IDS_SQL)
+    # Les index des tables reconstruites sont partis avec elles
+    await _exec_statements(db, HOT_INDEXES_SQL)
+    async with db.execute("PRAGMA foreign_key_check") as cur:
+        orphans = await cur.fetchall()
+    if orphans:
+        print(f"[db] migration 4 : {len(orphans)} ligne(s) orpheline(s) conservée(s) (foreign_key_check)")
+
+
+TEAM_LAST_HISTORY_SQL = """
+CREATE TABLE IF NOT EXISTS team_last_history (
+    guild_id INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    snapshot_json TEXT NOT NULL,
+    created_at INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, version)
+) WITHOUT ROWID;
+INSERT INTO team_last_history (guild_id, version, snapshot_json, created_at)
+SELECT guild_id, 1, snapshot_json, updated_at FROM team_last;
+DROP TABLE team_last
+"""
+
+
+async def _m005_team_last_history(db: aiosqlite.Connection):
+    """team_last (1 snapshot écrasé par serveur) -> journal versionné team_last_history."""
+    await _exec_statements(db, TEAM_LAST_HISTORY_SQL)
+
+
+TT_TEAMS_SQL = """
+CREATE TABLE IF NOT EXISTS tt_teams (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tournament_id INTEGER NOT NULL,
+    seed INTEGER NOT NULL,       -- ordre d'entrée dans le bracket (1..N)
+    members BLOB NOT NULL,       -- app.codec.encode_ids([user_id...])
+    UNIQUE (tournament_id, seed),
+    FOREIGN KEY (tournament_id) REFERENCES team_tournaments(id)
+);
+CREATE TABLE team_matches_new (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tournament_id INTEGER NOT NULL,
+    round INTEGER NOT NULL,
+    pos_in_round INTEGER NOT NULL,
+    p1_team_id INTEGER,          -- FK vers tt_teams.id (NULL = bye / à venir)
+    p2_team_id INTEGER,
+    best_of INTEGER NOT NULL DEFAULT 1,
+    status TEXT NOT NULL,        -- pending | running | done
+    p1_score INTEGER NOT NULL DEFAULT 0,
+    p2_score INTEGER NOT NULL DEFAULT 0,
+    winner_team_id INTEGER,
+    next_match_id INTEGER,       -- FK vers team_matches.id
+    next_slot INTEGER,           -- 1 ou 2
+    FOREIGN KEY (tournament_id) REFERENCES team_tournaments(id),
+    FOREIGN KEY (p1_team_id) REFERENCES tt_teams(id),
+    FOREIGN KEY (p2_team_id) REFERENCES tt_teams(id),
+    FOREIGN KEY (winner_team_id) REFERENCES tt_teams(id)
+)
+"""
+
+
+async def _m006_tt_teams(db: aiosqlite.Connection):
+    """
+    Team vs Team : listes de membres recopiées dans chaque match (p1/p2/winner_team_json)
+    -> table tt_teams (une ligne par équipe) ; les matches ne portent plus que des ids d'équipe.
+    """
+    await _exec_statements(db, TT_TEAMS_SQL)
+    async with db.execute("SELECT * FROM team_matches ORDER BY tournament_id, round, pos_in_round, id") as cur:
+        names = [c[0] for c in cur.description]
+        rows = [dict(zip(names, r)) for r in await cur.fetchall()]
+
+    team_ids: Dict[Tuple[int, Tuple[int, ...]], int] = {}
+    seeds: Dict[int, int] = {}
+
+    async def team_id(tournament_id: int, value) -> Optional[int]:
+        members = tuple(decode_ids(value))
+        if not members:
+            return None
+        key = (tournament_id, members)
+        if key not in team_ids:
+            seeds[tournament_id] = seeds.get(tournament_id, 0) + 1
+            cur = await db.execute(
+                "INSERT INTO tt_teams (tournament_id, seed, members) VALUES (?, ?, ?)",
+                (tournament_id, seeds[tournament_id], encode_ids(members)),
+            )
+            team_ids[key] = cur.lastrowid
             await cur.close()
+        return team_ids[key]
 
-        if not row:
-            raise RuntimeError("Arena introuvable")
-
-        # --- Convertir en dict pour .get()
-        rec = {k: row[k] for k in row.keys()}
-
-        # --- Décodage JSON double schéma
-        if "participants_json" in rec:  # nouveau schéma
-            participants = json.loads(rec["participants_json"]) if rec.get("participants_json") else []
-            schedule = json.loads(rec["schedule_json"]) if rec.get("schedule_json") else []
-            scores = {int(k): int(v) for k, v in (json.loads(rec["scores_json"]) if rec.get("scores_json") else {}).items()}
-            reported = json.loads(rec.get("reported_json") or "{}")
-        else:  # legacy
-            def _jload(val, default):
-                try:
-                    return json.loads(val) if isinstance(val, (str, bytes, bytearray)) else (val or default)
-                except Exception:
-                    return default
-            participants = _jload(rec.get("participants"), [])
-            schedule = _jload(rec.get("schedule"), [])
-            scores = {int(k): int(v) for k, v in _jload(rec.get("scores"), {}).items()}
-            reported = _jload(rec.get("reported"), {})
-
-        if not isinstance(reported, dict):
-            reported = {}
-
-        # --- 1) MAJ scores
-        for uid, pts in (new_scores or {}).items():
-            uid = int(uid)
-            scores[uid] = int(scores.get(uid, 0)) + int(pts)
-
-        # --- 2) Marquer les paires reportées
-        rkey = str(int(round_index))
-        seen = set(reported.get(rkey, []))
-        for (a, b) in (reported_pairs or []):
-            seen.add(_pair_key(a, b))
-        reported[rkey] = sorted(seen)
-
-        # --- 3) Complétude du round courant
-        cur_round = int(rec["current_round"])
-        rounds_total = int(rec["rounds_total"])
-        state = rec["state"]
-
-        this_pairs = schedule[cur_round - 1] if 1 <= cur_round <= len(schedule) else []
-        needed = {_pair_key(p[0], p[1]) for p in this_pairs}
-        have = set(reported.get(str(cur_round), []))
-        complete = (needed and have.issuperset(needed))
-
-        if complete:
-            next_round = cur_round + 1
-            if next_round > rounds_total:
-                state = "finished"
-            else:
-                state = "running"
-                cur_round = next_round
+    for m in rows:
+        tid = m["tournament_id"]
+        p1 = await team_id(tid, m["p1_team_json"])
+        p2 = await team_id(tid, m["p2_team_json"])
+        winner = await team_id(tid, m["winner_team_json"])
+        await db.execute("""
+            INSERT INTO team_matches_new
+            (id, tournament_id, round, pos_in_round, p1_team_id, p2_team_id, best_of, status,
+             p1_score, p2_score, winner_team_id, next_match_id, next_slot)
+            VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)
+        """, (m["id"], tid, m["round"], m["pos_in_round"], p1, p2, m["best_of"], m["status"],
+              m["p1_score"], m["p2_score"], winner, m["next_match_id"], m["next_slot"]))
+
+    await db.execute("DROP TABLE team_matches")
+    await db.execute("ALTER TABLE team_matches_new RENAME TO team_matches")
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_team_matches_bracket ON team_matches(tournament_id, round, pos_in_round)"
+    )
+
+
+EXPORT_WATERMARKS_SQL = """
+CREATE TABLE IF NOT EXISTS export_watermarks (
+    tbl TEXT PRIMARY KEY,
+    mark INTEGER NOT NULL,       -- dernier rowid / horodatage / id de compétition exporté
+    open_ids BLOB,               -- compétitions encore actives à ce moment-là (app.codec)
+    updated_at INTEGER NOT NULL
+) WITHOUT ROWID
+"""
 
-        # --- 4) Persist
-        if table == "arena_tournaments":
-            await db.execute("""
-                UPDATE arena_tournaments
-                SET scores_json=?, reported_json=?, current_round=?, state=?
-                WHERE id=?
-            """, (json.dumps(scores), json.dumps(reported), cur_round, state, int(arena_id)))
-        else:
-            await db.execute("""
-                UPDATE arena
-                SET scores=?, reported=?, current_round=?, state=?
-                WHERE id=?
-            """, (json.dumps(scores), json.dumps(reported), cur_round, state, int(arena_id)))
 
-        await db.commit()
+async def _m007_export_watermarks(db: aiosqlite.Connection):
+    """Filigranes de l'export incrémental (export_incremental / commit_export_watermarks)."""
+    await _exec_statements(db, EXPORT_WATERMARKS_SQL)
+
 
-        # --- 5) Retour
-        return {
-            "id": int(arena_id),
-            "participants": participants,
-            "schedule": schedule,
-            "scores": scores,
-            "reported": reported,
-            "current_round": cur_round,
-            "rounds_total": rounds_total,
-            "state": state,
-        }
+ARCHIVE_TABLES_SQL = """
+-- Mêmes colonnes que les tables chaudes + archived_at (contraintes allégées : données figées)
+CREATE TABLE IF NOT EXISTS tournaments_archive (
+    id INTEGER PRIMARY KEY,
+    guild_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    state TEXT NOT NULL,
+    created_by INTEGER NOT NULL,
+    created_at INTEGER NOT NULL,
+    started_at INTEGER,
+    archived_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tournaments_archive_guild ON tournaments_archive(guild_id, id);
+CREATE TABLE IF NOT EXISTS tournament_participants_archive (
+    tournament_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    seed INTEGER NOT NULL,
+    rating REAL NOT NULL,
+    archived_at INTEGER NOT NULL,
+    PRIMARY KEY (tournament_id, user_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS tournament_matches_archive (
+    id INTEGER PRIMARY KEY,
+    tournament_id INTEGER NOT NULL,
+    round INTEGER NOT NULL,
+    pos_in_round INTEGER NOT NULL,
+    p1_user_id INTEGER,
+    p2_user_id INTEGER,
+    p1_score INTEGER,
+    p2_score INTEGER,
+    best_of INTEGER NOT NULL,
+    winner_user_id INTEGER,
+    status TEXT NOT NULL,
+    next_match_id INTEGER,
+    next_slot INTEGER,
+    archived_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tournament_matches_archive_bracket
+ON tournament_matches_archive(tournament_id, round, pos_in_round);
+
+CREATE TABLE IF NOT EXISTS team_tournaments_archive (
+    id INTEGER PRIMARY KEY,
+    guild_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    state TEXT NOT NULL,
+    created_by INTEGER NOT NULL,
+    created_at INTEGER NOT NULL,
+    started_at INTEGER,
+    cancelled_at INTEGER,
+    archived_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_team_tournaments_archive_guild ON team_tournaments_archive(guild_id, id);
+CREATE TABLE IF NOT EXISTS tt_teams_archive (
+    id INTEGER PRIMARY KEY,
+    tournament_id INTEGER NOT NULL,
+    seed INTEGER NOT NULL,
+    members BLOB NOT NULL,
+    archived_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tt_teams_archive_tournament ON tt_teams_archive(tournament_id, seed);
+CREATE TABLE IF NOT EXISTS team_matches_archive (
+    id INTEGER PRIMARY KEY,
+    tournament_id INTEGER NOT NULL,
+    round INTEGER NOT NULL,
+    pos_in_round INTEGER NOT NULL,
+    p1_team_id INTEGER,
+    p2_team_id INTEGER,
+    best_of INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    p1_score INTEGER NOT NULL,
+    p2_score INTEGER NOT NULL,
+    winner_team_id INTEGER,
+    next_match_id INTEGER,
+    next_slot INTEGER,
+    archived_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_team_matches_archive_bracket ON team_matches_archive(tournament_id, round, pos_in_round);
+
+CREATE TABLE IF NOT EXISTS arena_tournaments_archive (
+    id INTEGER PRIMARY KEY,
+    guild_id INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    created_by INTEGER NOT NULL,
+    created_at INTEGER NOT NULL,
+    rounds_total INTEGER NOT NULL,
+    current_round INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    archived_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_arena_tournaments_archive_guild ON arena_tournaments_archive(guild_id, id);
+CREATE TABLE IF NOT EXISTS arena_participants_archive (
+    arena_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    seat INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    archived_at INTEGER NOT NULL,
+    PRIMARY KEY (arena_id, user_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS arena_duos_archive (
+    arena_id INTEGER NOT NULL,
+    round INTEGER NOT NULL,
+    duo_idx INTEGER NOT NULL,
+    u1 INTEGER NOT NULL,
+    u2 INTEGER NOT NULL,
+    archived_at INTEGER NOT NULL,
+    PRIMARY KEY (arena_id, round, duo_idx)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS arena_reports_archive (
+    arena_id INTEGER NOT NULL,
+    round INTEGER NOT NULL,
+    duo_idx INTEGER NOT NULL,
+    rank INTEGER,
+    points INTEGER NOT NULL,
+    reported_at INTEGER NOT NULL,
+    archived_at INTEGER NOT NULL,
+    PRIMARY KEY (arena_id, round, duo_idx)
+) WITHOUT ROWID
+"""
+
+
+async def _m008_archive_tables(db: aiosqlite.Connection):
+    """Tables *_archive des compétitions terminées (cf. archive_competitions)."""
+    await _exec_statements(db, ARCHIVE_TABLES_SQL)
+
+
+# export_incremental : filigrane horodaté des archives (archived_at > ? AND archived_at <= ?)
+ARCHIVE_EXPORT_INDEXES_SQL = "\n".join(
+    f"CREATE INDEX IF NOT EXISTS idx_{t}_archived_at ON {t}(archived_at);"
+    for t, col in _INCR_TIME.items() if col == "archived_at"
+)
+
+
+async def _m009_archive_export_indexes(db: aiosqlite.Connection):
+    """Index archived_at des tables *_archive : l'export incrémental ne relit que le dernier lot archivé."""
+    await _exec_statements(db, ARCHIVE_EXPORT_INDEXES_SQL)
+
+
+async def _m010_incremental_vacuum(db: aiosqlite.Connection):
+    """
+    auto_vacuum=INCREMENTAL (run_maintenance rend ensuite les pages libres par incremental_vacuum).
+    Le changement exige un VACUUM complet, hors transaction : fait ici une seule fois, au démarrage
+    (init_db, avant la connexion au gateway), jamais sur la base servie.
+    """
+    async with db.execute("PRAGMA auto_vacuum") as cur:
+        (auto_vacuum,) = await cur.fetchone()
+    if auto_vacuum == 2:
+        return
+    await db.commit()  # VACUUM refuse de tourner dans la transaction ouverte par _run_migrations
+    await db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    await db.execute("VACUUM")
+    await db.execute("BEGIN")
+
+
+# (version cible, étape) — toujours ajouter à la fin, ne jamais renuméroter
+MIGRATIONS = [
+    (1, _m001_base_schema),
+    (2, _m002_arena_normalized),
+    (3, _m003_hot_indexes),
+    (4, _m004_integer_ids),
+    (5, _m005_team_last_history),
+    (6, _m006_tt_teams),
+    (7, _m007_export_watermarks),
+    (8, _m008_archive_tables),
+    (9, _m009_archive_export_indexes),
+    (10, _m010_incremental_vacuum),
+]
+
+
+async def _run_migrations(db: aiosqlite.Connection):
+    async with db.execute("PRAGMA user_version") as cur:
+        (version,) = await cur.fetchone()
+    for target, step in MIGRATIONS:
+        if version >= target:
+            continue
+        await db.execute("BEGIN")
+        try:
+            await step(db)
+            await db.execute(f"PRAGMA user_version = {int(target)}")
+            await db.commit()
+        except BaseException:
+            await db.rollback()
+            raise
+        print(f"[db] migration {target} ({step.__name__}) appliquée")
+        version = target
+
+
+# =========================
+# Monitoring
+# =========================
+def db_metrics(top: Optional[int] = None) -> Dict[str, object]:
+    """Instantané de toutes les statistiques DB du process (pour /dbstats, export de métriques…)."""
+    return {
+        "at": int(time.time()),
+        "queries": query_stats(top),
+        "locks": lock_stats(),
+        "caches": cache_stats(),
+        "write_behind": {**WRITE_BEHIND.stats, "pending": WRITE_BEHIND.pending},
+        "memory_db": memory_db_stats(),
+    }
+
+
+# Toutes les coroutines publiques ci-dessus sont chronométrées (app/dbstats.py, /dbstats)
+instrument(globals(), __name__)
@@ -0,0 +1,276 @@
+# app/dbstats.py
+from __future__ import annotations
+
+import functools
+import inspect
+import math
+import re
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+from aiosqlite.context import Result
+
+# Statistiques d'accès DB, en mémoire du process (remises à zéro au redémarrage) :
+# - par fonction de repository (app/db.py, helpers de team_tournament.py) : appels, erreurs,
+#   durée totale / max / percentiles (sur les SAMPLE_SIZE derniers appels), lignes renvoyées
+# - par requête SQL (connexions ouvertes par app.db.connect) : durée de l'execute ; au-delà de
+#   SLOW_QUERY_MS, la requête part dans le journal des requêtes lentes, paramètres masqués.
+# La durée mesurée par requête est celle de l'execute (premier pas : tri, agrégat, écriture) ;
+# les fetch suivants sont comptés dans la fonction appelante.
+
+SAMPLE_SIZE = 512
+SLOW_LOG_SIZE = 50
+_CONF = {"slow_ms": 200.0}
+
+# Fonction de repository appelée par le cog (la plus externe) : une requête lente lui est attribuée
+_CURRENT_FN: ContextVar[Optional[str]] = ContextVar("db_current_fn", default=None)
+# Listes ouvertes par capture_statements() : chaque requête tracée y est ajoutée (vide hors outillage)
+_CAPTURES: List[list] = []
+
+
+class _FnStats:
+    __slots__ = ("calls", "errors", "total_s", "max_s", "rows", "samples")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self.rows = 0
+        self.samples: Deque[float] = deque(maxlen=SAMPLE_SIZE)
+
+
+FN_STATS: Dict[str, _FnStats] = {}
+STATEMENT_STATS = {"statements": 0, "total_s": 0.0, "slow": 0}
+SLOW_LOG: Deque[Dict[str, object]] = deque(maxlen=SLOW_LOG_SIZE)
+
+
+def configure(slow_ms: Optional[float] = None) -> None:
+    """slow_ms : seuil du journal des requêtes lentes (<= 0 : journal désactivé)."""
+    if slow_ms is not None:
+        _CONF["slow_ms"] = float(slow_ms)
+
+
+def _rows_of(result) -> int:
+    # liste -> nombre de lignes ; None -> 0 ; objet unique (record, dict, valeur) -> 1
+    if result is None:
+        return 0
+    if isinstance(result, list):
+        return len(result)
+    return 1
+
+
+def timed(fn, name: Optional[str] = None):
+    """Décore une coroutine : chaque appel alimente FN_STATS[name]."""
+    name = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        st = FN_STATS.get(name)
+        if st is None:
+            st = FN_STATS[name] = _FnStats()
+        token = _CURRENT_FN.set(name) if _CURRENT_FN.get() is None else None
+        t0 = time.perf_counter()
+        try:
+            result = await fn(*args, **kwargs)
+        except BaseException:
+            st.errors += 1
+            raise
+        finally:
+            dt = time.perf_counter() - t0
+            if token is not None:
+                _CURRENT_FN.reset(token)
+            st.calls += 1
+            st.total_s += dt
+            st.samples.append(dt)
+            if dt > st.max_s:
+                st.max_s = dt
+        st.rows += _rows_of(result)
+        return result
+
+    wrapper.__timed__ = True
+    return wrapper
+
+
+def instrument(namespace: dict, module: str) -> List[str]:
+    """
+    Enveloppe par timed() toutes les coroutines publiques définies dans `module` et déjà présentes
+    dans `namespace` (à appeler en fin de section, avec globals() et __name__).
+    Les appels internes passent par les globals du module : ils sont mesurés eux aussi.
+    Les helpers qui reçoivent une connexion (1er paramètre `db`) sont laissés à leur appelant.
+    """
+    wrapped = []
+    for attr, obj in list(namespace.items()):
+        if (attr.startswith("_") or not inspect.iscoroutinefunction(obj)
+                or getattr(obj, "__module__", None) != module or getattr(obj, "__timed__", False)):
+            continue
+        params = list(inspect.signature(obj).parameters)
+        if params and params[0] == "db":
+            continue
+        namespace[attr] = timed(obj)
+        wrapped.append(attr)
+    return wrapped
+
+
+# ---------- requêtes : traçage des connexions ----------
+
+_WS = re.compile(r"\s+")
+
+
+def _short_sql(sql: str, limit: int = 400) -> str:
+    s = _WS.sub(" ", sql).strip()
+    return s if len(s) <= limit else s[:limit] + "…"
+
+
+def redact_params(params) -> str:
+    """Paramètres masqués : seuls le type et la taille apparaissent (jamais la valeur)."""
+    if params is None:
+        return "()"
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{k}: {_redact_one(v)}" for k, v in params.items()) + "}"
+    return "(" + ", ".join(_redact_one(v) for v in params) + ")"
+
+
+def _redact_one(v) -> str:
+    if v is None:
+        return "NULL"
+    if isinstance(v, (bytes, bytearray, memoryview)):
+        return f"blob[{len(v)}]"
+    if isinstance(v, str):
+        return f"str[{len(v)}]"
+    return type(v).__name__
+
+
+def _capture(sql: str, params) -> None:
+    entry = (_CURRENT_FN.get(), sql, params)
+    for captured in _CAPTURES:
+        captured.append(entry)
+
+
+def _statement(sql: str, params, dt: float, many: int = 0) -> None:
+    STATEMENT_STATS["statements"] += 1
+    STATEMENT_STATS["total_s"] += dt
+    ms = dt * 1000
+    threshold = _CONF["slow_ms"]
+    if threshold <= 0 or ms < threshold:
+        return
+    STATEMENT_STATS["slow"] += 1
+    entry = {
+        "at": int(time.time()),
+        "ms": round(ms, 1),
+        "fn": _CURRENT_FN.get(),
+        "sql": _short_sql(sql),
+        "params": f"{many} lots" if many else redact_params(params),
+    }
+    SLOW_LOG.append(entry)
+    print(f"[db] requête lente {entry['ms']:.0f} ms ({entry['fn'] or '?'}) : {entry['sql']} | params {entry['params']}")
+
+
+def trace_connection(db):
+    """Mesure chaque execute / executemany de la connexion aiosqlite `db` (une fois par connexion)."""
+    if getattr(db, "_dbstats_traced", False):
+        return db
+    raw_execute, raw_executemany = db.execute, db.executemany
+
+    async def _execute(sql, parameters):
+        t0 = time.perf_counter()
+        try:
+            return await raw_execute(sql, parameters)
+        finally:
+            _statement(sql, parameters, time.perf_counter() - t0)
+            if _CAPTURES:
+                _capture(sql, parameters)
+
+    async def _executemany(sql, parameters):
+        parameters = parameters if isinstance(parameters, (list, tuple)) else list(parameters)
+        t0 = time.perf_counter()
+        try:
+            return await raw_executemany(sql, parameters)
+        finally:
+            _statement(sql, None, time.perf_counter() - t0, many=len(parameters))
+            if _CAPTURES and parameters:  # sans lot, rien n'a été exécuté
+                _capture(sql, parameters[0])
+
+    # Même interface qu'aiosqlite : awaitable et `async with db.execute(...) as cur`
+    def execute(sql, parameters=None):
+        return Result(_execute(sql, parameters))
+
+    def executemany(sql, parameters):
+        return Result(_executemany(sql, parameters))
+
+    db.execute = execute
+    db.executemany = executemany
+    db._dbstats_traced = True
+    return db
+
+
+def trace_sqlite3(con):
+    """
+    Connexion sqlite3 brute (exports, dans un thread) : ses requêtes sont visibles de capture_statements().
+    Sans capture en cours, rien n'est branché (pas de coût sur les exports).
+    """
+    if _CAPTURES:
+        # SQL déjà développé par SQLite (paramètres en ligne) : rejouable tel quel
+        con.set_trace_callback(lambda sql: _capture(sql, None))
+    return con
+
+
+@contextmanager
+def capture_statements() -> Iterator[List[Tuple[Optional[str], str, object]]]:
+    """
+    Outillage (scripts/check_query_plans.py) : liste des requêtes exécutées pendant le bloc, par les
+    connexions tracées, sous forme (fonction de repository, SQL, paramètres ; 1er lot pour executemany).
+    """
+    captured: list = []
+    _CAPTURES.append(captured)
+    try:
+        yield captured
+    finally:
+        _CAPTURES.remove(captured)
+
+
+# ---------- instantanés ----------
+
+def _pct(sorted_vals: List[float], p: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    # rang le plus proche
+    k = max(1, math.ceil(p / 100 * len(sorted_vals)))
+    return sorted_vals[k - 1]
+
+
+def query_stats(top: Optional[int] = None) -> Dict[str, object]:
+    """Instantané (pour /dbstats, métriques…) ; fonctions triées par durée totale décroissante."""
+    fns = []
+    for name, st in FN_STATS.items():
+        samples = sorted(st.samples)
+        fns.append({
+            "name": name,
+            "calls": st.calls,
+            "errors": st.errors,
+            "rows": st.rows,
+            "total_ms": round(st.total_s * 1000, 2),
+            "avg_ms": round(st.total_s * 1000 / st.calls, 3) if st.calls else 0.0,
+            "p50_ms": round(_pct(samples, 50) * 1000, 3),
+            "p95_ms": round(_pct(samples, 95) * 1000, 3),
+            "p99_ms": round(_pct(samples, 99) * 1000, 3),
+            "max_ms": round(st.max_s * 1000, 3),
+        })
+    fns.sort(key=lambda f: f["total_ms"], reverse=True)
+    return {
+        "slow_ms": _CONF["slow_ms"],
+        "statements": STATEMENT_STATS["statements"],
+        "statements_total_ms": round(STATEMENT_STATS["total_s"] * 1000, 2),
+        "slow": STATEMENT_STATS["slow"],
+        "functions": fns[:top] if top else fns,
+        "slow_log": list(SLOW_LOG),
+    }
+
+
+def reset_query_stats() -> None:
+    FN_STATS.clear()
+    SLOW_LOG.clear()
+    STATEMENT_STATS.update(statements=0, total_s=0.0, slow=0)
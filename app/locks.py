@@ -0,0 +1,59 @@
+# app/locks.py
+from __future__ import annotations
+
+import asyncio
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
+
+# Registre des verrous par (guild_id, ressource).
+# Références faibles : un verrou que plus personne ne tient ni n'attend est libéré automatiquement,
+# donc le registre ne grossit pas avec le nombre de serveurs inactifs.
+_LOCKS: "weakref.WeakValueDictionary[tuple[int, str], asyncio.Lock]" = weakref.WeakValueDictionary()
+
+# LOCK_WAIT_STATS[ressource] = {"acquired", "contended", "wait_total_s", "wait_max_s"}
+LOCK_WAIT_STATS: Dict[str, Dict[str, float]] = {}
+
+
+def _get_lock(guild_id: int, resource: str) -> asyncio.Lock:
+    key = (int(guild_id), resource)
+    lock = _LOCKS.get(key)
+    if lock is None:
+        lock = asyncio.Lock()
+        _LOCKS[key] = lock
+    return lock
+
+
+def _record_wait(resource: str, waited: float, contended: bool):
+    st = LOCK_WAIT_STATS.setdefault(
+        resource, {"acquired": 0, "contended": 0, "wait_total_s": 0.0, "wait_max_s": 0.0}
+    )
+    st["acquired"] += 1
+    if contended:
+        st["contended"] += 1
+    st["wait_total_s"] += waited
+    if waited > st["wait_max_s"]:
+        st["wait_max_s"] = waited
+
+
+@asynccontextmanager
+async def guild_lock(guild_id: int, resource: str) -> AsyncIterator[None]:
+    """
+    Sérialise les transitions d'état d'une ressource ('tournament', 'tt', 'arena', 'teamroll'…)
+    au sein d'un serveur. Deux serveurs différents ne se bloquent jamais entre eux.
+    """
+    lock = _get_lock(guild_id, resource)
+    contended = lock.locked()
+    t0 = time.perf_counter()
+    async with lock:
+        _record_wait(resource, time.perf_counter() - t0, contended)
+        yield
+
+
+def lock_stats() -> Dict[str, object]:
+    """Instantané des statistiques d'attente (pour /dbstats, métriques…)."""
+    return {
+        "live_locks": len(_LOCKS),
+        "resources": {k: dict(v) for k, v in LOCK_WAIT_STATS.items()},
+    }
@@ -0,0 +1,184 @@
+# app/loopwatch.py
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from .metrics import LOOP_LAG, gauge, register_collector
+
+# Surveillance de la boucle asyncio :
+# - une tâche « battement » dort LOOP_LAG_INTERVAL_MS et mesure son retard au réveil (lag)
+# - un thread watchdog vérifie le dernier battement ; si la boucle ne s'est pas réveillée depuis
+#   LOOP_STALL_MS au-delà de l'échéance, il capture la pile du thread de la boucle
+#   (sys._current_frames) : c'est le code synchrone qui bloque (calcul, I/O disque, zip…)
+# La pile est journalisée aussitôt (même si la boucle ne revient jamais), la durée totale du blocage
+# est complétée au réveil. Percentiles du lag et blocages récents : /metrics.
+
+SAMPLE_SIZE = 3000          # ~5 min de mesures à 100 ms
+STALL_LOG_SIZE = 20
+STACK_DEPTH = 25
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+_ASYNCIO_DIR = os.path.dirname(asyncio.__file__)
+_ROOT_DIR = os.path.dirname(_APP_DIR)
+
+
+def _short_path(filename: str) -> str:
+    path = os.path.abspath(filename)
+    return os.path.relpath(path, _ROOT_DIR) if path.startswith(_ROOT_DIR + os.sep) else filename
+
+
+def _pct(sorted_vals: List[float], p: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    k = max(1, math.ceil(p / 100 * len(sorted_vals)))
+    return sorted_vals[k - 1]
+
+
+class LoopMonitor:
+    def __init__(self, interval_s: float = 0.1, stall_s: float = 0.25):
+        self.interval_s = interval_s
+        self.stall_s = stall_s          # <= 0 : pas de watchdog (lag mesuré quand même)
+        self.samples: Deque[float] = deque(maxlen=SAMPLE_SIZE)
+        self.max_s = 0.0
+        self.stall_count = 0
+        self.stalls: Deque[Dict[str, object]] = deque(maxlen=STALL_LOG_SIZE)
+        self._beat = 0.0                # monotonic du dernier passage de la tâche
+        self._captured_beat = None      # battement déjà capturé par le watchdog (une capture par blocage)
+        self._pending: Optional[Dict[str, object]] = None
+        self._loop_tid: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def configure(self, interval_ms: Optional[int] = None, stall_ms: Optional[int] = None) -> None:
+        if interval_ms is not None:
+            self.interval_s = max(10, int(interval_ms)) / 1000
+        if stall_ms is not None:
+            self.stall_s = max(0, int(stall_ms)) / 1000
+
+    def start(self) -> None:
+        """À appeler depuis la boucle à surveiller."""
+        if self._task is not None and not self._task.done():
+            return
+        self._loop_tid = threading.get_ident()
+        self._beat = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._run(), name="loop-monitor")
+        if self.stall_s > 0:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._watchdog, name="loop-watchdog", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+
+    # ---------- côté boucle ----------
+
+    async def _run(self):
+        while True:
+            self._beat = t0 = time.monotonic()
+            await asyncio.sleep(self.interval_s)
+            now = time.monotonic()
+            lag = max(0.0, now - t0 - self.interval_s)
+            self._beat = now
+            self.samples.append(lag)
+            if lag > self.max_s:
+                self.max_s = lag
+            LOOP_LAG.observe(lag)
+            entry, self._pending = self._pending, None
+            if entry is not None:
+                entry["blocked_ms"] = round(lag * 1000, 1)
+                print(f"[loop] fin du blocage : {entry['blocked_ms']:.0f} ms au total ({entry['culprit']})")
+
+    # ---------- côté watchdog (thread) ----------
+
+    def _watchdog(self):
+        check_s = max(0.02, self.stall_s / 4)
+        while not self._stop.wait(check_s):
+            beat = self._beat
+            blocked = time.monotonic() - beat - self.interval_s
+            if blocked >= self.stall_s and self._captured_beat != beat:
+                self._captured_beat = beat
+                self._capture(blocked)
+
+    def _capture(self, blocked_s: float) -> None:
+        frame = sys._current_frames().get(self._loop_tid)
+        if frame is None:
+            return
+        # Les frames de la mécanique asyncio (run_forever, _run_once…) n'apprennent rien : retirées
+        stack = [fs for fs in traceback.extract_stack(frame)
+                 if not fs.filename.startswith(_ASYNCIO_DIR)][-STACK_DEPTH:]
+        del frame
+        frames = [f"{_short_path(fs.filename)}:{fs.lineno} in {fs.name}" for fs in stack]
+        # Coupable : la frame la plus interne du code du bot (sinon la plus interne tout court)
+        culprit = next(
+            (frames[i] for i in range(len(stack) - 1, -1, -1)
+             if os.path.abspath(stack[i].filename).startswith(_APP_DIR + os.sep)
+             and not stack[i].filename.endswith(("loopwatch.py", "dbstats.py"))),
+            frames[-1] if frames else "?",
+        )
+        entry = {
+            "at": int(time.time()),
+            "blocked_ms": round(blocked_s * 1000, 1),   # complété au réveil de la boucle
+            "culprit": culprit,
+            "stack": frames,
+        }
+        self.stall_count += 1
+        self.stalls.append(entry)
+        self._pending = entry
+        print(f"[loop] boucle bloquée depuis {entry['blocked_ms']:.0f} ms — {culprit}\n"
+              + "\n".join(f"    {f}" for f in frames))
+
+    # ---------- instantané ----------
+
+    def stats(self) -> Dict[str, object]:
+        samples = sorted(self.samples)
+        return {
+            "interval_ms": round(self.interval_s * 1000),
+            "stall_ms": round(self.stall_s * 1000),
+            "samples": len(samples),
+            "last_ms": round(self.samples[-1] * 1000, 3) if self.samples else 0.0,
+            "p50_ms": round(_pct(samples, 50) * 1000, 3),
+            "p95_ms": round(_pct(samples, 95) * 1000, 3),
+            "p99_ms": round(_pct(samples, 99) * 1000, 3),
+            "max_ms": round(self.max_s * 1000, 3),
+            "stalls": self.stall_count,
+            "recent_stalls": [{k: v for k, v in e.items() if k != "stack"} for e in self.stalls],
+        }
+
+
+LOOP_MONITOR = LoopMonitor()
+
+
+def _loop_collector():
+    m = LOOP_MONITOR
+    samples = sorted(m.samples)
+    lines = ["# HELP teambot_event_loop_lag_recent_seconds Retard de la boucle sur les dernières mesures.",
+             "# TYPE teambot_event_loop_lag_recent_seconds summary"]
+    for q in (0.5, 0.95, 0.99):
+        lines.append(f'teambot_event_loop_lag_recent_seconds{{quantile="{q}"}} {_pct(samples, q * 100)}')
+    lines.append(f"teambot_event_loop_lag_recent_seconds_sum {sum(samples)}")
+    lines.append(f"teambot_event_loop_lag_recent_seconds_count {len(samples)}")
+    lines += gauge("teambot_event_loop_lag_max_seconds", "Retard max de la boucle depuis le démarrage.",
+                   [({}, m.max_s)])
+    lines += gauge("teambot_event_loop_stalls_total", "Blocages de la boucle au-delà de LOOP_STALL_MS.",
+                   [({}, m.stall_count)], kind="counter")
+    # Coupables des blocages récents (frame du bot la plus interne), pour repérer les points chauds
+    culprits: Dict[str, int] = {}
+    for e in m.stalls:
+        culprits[e["culprit"]] = culprits.get(e["culprit"], 0) + 1
+    lines += gauge("teambot_event_loop_recent_stalls", "Blocages récents par frame coupable.",
+                   (({"culprit": c}, n) for c, n in culprits.items()))
+    return lines
+
+
+register_collector(_loop_collector)
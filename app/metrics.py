@@ -0,0 +1,231 @@
+# app/metrics.py
+from __future__ import annotations
+
+import bisect
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+
+# Métriques au format texte Prometheus (exposition 0.0.4), servies par le process du bot :
+#   GET http://METRICS_HOST:METRICS_PORT/metrics   (ex. curl -s localhost:9108/metrics)
+# Pas de dépendance en plus : compteurs / histogrammes minimalistes ci-dessous, plus des
+# « collecteurs » qui lisent à la demande les statistiques existantes (DB, caches, verrous, bot).
+
+_COUNTERS: List["Counter"] = []
+_COLLECTORS: List[Callable[[], Iterable[str]]] = []
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _esc(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    parts = [f'{n}="{_esc(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(v) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class Counter:
+    """Compteur monotone, éventuellement étiqueté : COUNTER.inc(command="team")."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.doc = doc
+        self.labels = tuple(labels)
+        self.values: Dict[Tuple, float] = {}
+        _COUNTERS.append(self)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(labels.get(n, "") for n in self.labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.doc}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for key, v in self.values.items():
+            yield f"{self.name}{_labels(self.labels, key)} {_num(v)}"
+
+
+class Histogram(Counter):
+    """Histogramme cumulatif (buckets fixes) : HIST.observe(0.12, command="team")."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, doc, labels)
+        self.buckets = tuple(sorted(buckets))
+        self.series: Dict[Tuple, list] = {}  # key -> [compte par bucket…, somme, total]
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(labels.get(n, "") for n in self.labels)
+        s = self.series.get(key)
+        if s is None:
+            s = self.series[key] = [0] * len(self.buckets) + [0.0, 0]
+        i = bisect.bisect_left(self.buckets, value)
+        if i < len(self.buckets):
+            s[i] += 1
+        s[-2] += value
+        s[-1] += 1
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.doc}"
+        yield f"# TYPE {self.name} histogram"
+        for key, s in self.series.items():
+            acc = 0
+            for le, n in zip(self.buckets, s):
+                acc += n
+                le_label = 'le="%s"' % _num(le)
+                yield f"{self.name}_bucket{_labels(self.labels, key, le_label)} {acc}"
+            inf_label = 'le="+Inf"'
+            yield f"{self.name}_bucket{_labels(self.labels, key, inf_label)} {s[-1]}"
+            yield f"{self.name}_sum{_labels(self.labels, key)} {_num(s[-2])}"
+            yield f"{self.name}_count{_labels(self.labels, key)} {s[-1]}"
+
+
+def register_collector(fn: Callable[[], Iterable[str]]) -> None:
+    """fn() renvoie des lignes au format texte, calculées à chaque scrape."""
+    _COLLECTORS.append(fn)
+
+
+def gauge(name: str, doc: str, samples: Iterable[Tuple[Dict[str, object], float]], kind: str = "gauge") -> List[str]:
+    """Bloc HELP/TYPE + échantillons [(labels, valeur)] pour un collecteur."""
+    lines = [f"# HELP {name} {doc}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        lines.append(f"{name}{_labels(list(labels), list(labels.values()))} {_num(value)}")
+    return lines
+
+
+def render() -> str:
+    lines: List[str] = []
+    for c in _COUNTERS:
+        lines.extend(c.render())
+    for fn in _COLLECTORS:
+        try:
+            lines.extend(fn())
+        except Exception as e:  # un collecteur en erreur ne casse pas tout le scrape
+            lines.append(f"# collecteur {getattr(fn, '__name__', '?')} en erreur : {_esc(e)}")
+    return "\n".join(lines) + "\n"
+
+
+# =========================
+# Métriques alimentées par le code applicatif
+# =========================
+COMMAND_CALLS = Counter("teambot_command_invocations_total", "Commandes slash exécutées.", ("command", "status"))
+COMMAND_LATENCY = Histogram("teambot_command_duration_seconds", "Durée des commandes slash (handler complet).",
+                            ("command",))
+RIOT_CALLS = Counter("teambot_riot_api_calls_total", "Appels à l'API Riot.", ("endpoint", "status"))
+VOICE_MOVES = Counter("teambot_voice_moves_total", "Déplacements de membres entre salons vocaux.", ("result",))
+# alimenté par app/loopwatch.py
+LOOP_LAG = Histogram("teambot_event_loop_lag_seconds", "Retard de la boucle asyncio (réveil planifié vs effectif).",
+                     buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0))
+
+
+def observe_command(command: str, status: str, seconds: Optional[float]) -> None:
+    COMMAND_CALLS.inc(command=command, status=status)
+    if seconds is not None:
+        COMMAND_LATENCY.observe(seconds, command=command)
+
+
+
+# =========================
+# Collecteurs : statistiques existantes lues à chaque scrape
+# =========================
+def _db_collector() -> Iterable[str]:
+    from .db import db_metrics  # import tardif : app.db n'est pas nécessaire pour rendre les compteurs
+
+    m = db_metrics()
+    q = m["queries"]
+    fns = q["functions"]
+    lines = gauge("teambot_db_function_calls_total", "Appels par fonction de repository DB.",
+                  (({"function": f["name"]}, f["calls"]) for f in fns), kind="counter")
+    lines += gauge("teambot_db_function_errors_total", "Appels en erreur par fonction de repository DB.",
+                   (({"function": f["name"]}, f["errors"]) for f in fns), kind="counter")
+    lines += gauge("teambot_db_function_rows_total", "Lignes renvoyées par fonction de repository DB.",
+                   (({"function": f["name"]}, f["rows"]) for f in fns), kind="counter")
+    # summary : quantiles sur les derniers appels + somme / nombre depuis le démarrage
+    lines += ["# HELP teambot_db_function_duration_seconds Durée des fonctions de repository DB.",
+              "# TYPE teambot_db_function_duration_seconds summary"]
+    for f in fns:
+        fn = _esc(f["name"])
+        for qtl, key in (("0.5", "p50_ms"), ("0.95", "p95_ms"), ("0.99", "p99_ms")):
+            lines.append(f'teambot_db_function_duration_seconds{{function="{fn}",quantile="{qtl}"}} {f[key] / 1000}')
+        lines.append(f'teambot_db_function_duration_seconds_sum{{function="{fn}"}} {f["total_ms"] / 1000}')
+        lines.append(f'teambot_db_function_duration_seconds_count{{function="{fn}"}} {f["calls"]}')
+    lines += gauge("teambot_db_statements_total", "Requêtes SQL exécutées.", [({}, q["statements"])], kind="counter")
+    lines += gauge("teambot_db_slow_statements_total", "Requêtes SQL au-delà de SLOW_QUERY_MS.",
+                   [({}, q["slow"])], kind="counter")
+
+    caches = m["caches"].items()
+    for metric, key, doc, kind in (
+        ("teambot_cache_hits_total", "hits", "Succès par cache.", "counter"),
+        ("teambot_cache_misses_total", "misses", "Échecs par cache.", "counter"),
+        ("teambot_cache_evictions_total", "evictions", "Évictions par cache.", "counter"),
+        ("teambot_cache_entries", "size", "Entrées par cache.", "gauge"),
+        ("teambot_cache_hit_ratio", "hit_ratio", "Taux de succès par cache.", "gauge"),
+    ):
+        lines += gauge(metric, doc, (({"cache": name}, c[key]) for name, c in caches), kind=kind)
+
+    res = m["locks"]["resources"].items()
+    lines += gauge("teambot_lock_acquired_total", "Verrous de serveur acquis.",
+                   (({"resource": r}, st["acquired"]) for r, st in res), kind="counter")
+    lines += gauge("teambot_lock_contended_total", "Acquisitions de verrou ayant attendu.",
+                   (({"resource": r}, st["contended"]) for r, st in res), kind="counter")
+    lines += gauge("teambot_lock_wait_seconds_total", "Attente cumulée sur les verrous.",
+                   (({"resource": r}, st["wait_total_s"]) for r, st in res), kind="counter")
+
+    wb = m["write_behind"]
+    lines += gauge("teambot_write_behind_total", "Écritures différées par issue.",
+                   (({"outcome": k}, wb[k]) for k in ("submitted", "coalesced", "written", "failed")), kind="counter")
+    lines += gauge("teambot_write_behind_pending", "Écritures différées en attente.", [({}, wb["pending"])])
+    if m["memory_db"]:
+        lines += gauge("teambot_memory_db_persists_total", "Recopies de la base mémoire sur disque.",
+                       [({}, m["memory_db"]["persists"])], kind="counter")
+        lines += gauge("teambot_memory_db_last_persist_seconds", "Durée de la dernière recopie.",
+                       [({}, m["memory_db"]["last_persist_ms"] / 1000)])
+    return lines
+
+
+register_collector(_db_collector)
+
+
+def _bot_collector(bot) -> Callable[[], Iterable[str]]:
+    def collect() -> Iterable[str]:
+        lat = bot.latency
+        lines = gauge("teambot_gateway_latency_seconds", "Latence du heartbeat gateway Discord.",
+                      [({}, lat)] if lat == lat and lat != float("inf") else [])  # NaN / inf avant connexion
+        lines += gauge("teambot_guilds", "Serveurs où le bot est présent.", [({}, len(bot.guilds))])
+        return lines
+    collect.__name__ = "bot"
+    return collect
+
+
+# =========================
+# Serveur HTTP (aiohttp)
+# =========================
+async def start_metrics_server(bot, host: str, port: int) -> web.AppRunner:
+    """Démarre GET /metrics sur host:port (dans la boucle du bot) ; à arrêter par runner.cleanup()."""
+    register_collector(_bot_collector(bot))
+
+    async def metrics(_request: web.Request) -> web.Response:
+        return web.Response(body=render().encode("utf-8"), headers={
+            "Content-Type": "text/plain; version=0.0.4; charset=utf-8",
+            "X-Content-Type-Options": "nosniff",
+        })
+
+    app = web.Application()
+    app.router.add_get("/metrics", metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,189 @@
+# app/profiling.py
+from __future__ import annotations
+
+import asyncio
+import cProfile
+import io
+import marshal
+import pstats
+import time
+import tracemalloc
+from typing import Optional, Tuple
+
+# Profilage à la demande du process en production (/profile start|stop|snapshot, owner) :
+# - "cpu"    : cProfile sur le thread de la boucle, pour toute la fenêtre ou seulement pendant une
+#              commande slash (activé par TeamTree.interaction_check, coupé à la fin de la commande ;
+#              ce que la boucle exécute en parallèle pendant un await est compté aussi)
+# - "memory" : tracemalloc ; chaque snapshot est comparé au précédent (le premier est pris au start)
+# Les rapports (tri pstats, compare_to) sont calculés hors de la boucle (asyncio.to_thread).
+
+MAX_WINDOW_S = 4 * 3600
+PSTATS_SORTS = ("cumulative", "tottime", "ncalls")
+
+_MEM_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+class _FrozenStats:
+    # pstats.Stats() accepte tout objet exposant create_stats() + stats
+    def __init__(self, stats: dict):
+        self.stats = stats
+
+    def create_stats(self) -> None:
+        pass
+
+
+def _matches(name: str, wanted: str) -> bool:
+    # "teamroll" couvre aussi ses sous-commandes ("arena report" -> "arena")
+    return name == wanted or name.split(" ", 1)[0] == wanted
+
+
+class Profiler:
+    def __init__(self):
+        self.mode: Optional[str] = None      # "cpu" | "memory" | None (inactif)
+        self.command: Optional[str] = None
+        self.running = False                 # False avec mode défini : fenêtre écoulée, résultats à récupérer
+        self.started_at = 0.0
+        self.ended_at: Optional[float] = None
+        self.invocations = 0
+        self._prof: Optional[cProfile.Profile] = None
+        self._depth = 0                      # commandes filtrées en cours (profil CPU actif si > 0)
+        self._prev_snapshot: Optional[tracemalloc.Snapshot] = None
+        self._final: Optional[Tuple[tracemalloc.Snapshot, Tuple[int, int]]] = None
+        self._window: Optional[asyncio.Task] = None
+
+    # ---------- cycle de vie ----------
+
+    def start(self, mode: str, command: Optional[str] = None, seconds: int = 0, frames: int = 10) -> None:
+        """Démarre une session ; RuntimeError si une session est déjà ouverte."""
+        if self.mode:
+            raise RuntimeError(f"profil {self.mode} déjà en cours : `/profile stop` d'abord")
+        command = (command or "").strip().lstrip("/").lower() or None
+        if mode == "cpu":
+            self._prof = cProfile.Profile()
+            if command is None:
+                self._prof.enable()
+        elif mode == "memory":
+            if command:
+                raise RuntimeError("le filtre par commande ne s'applique qu'au profil CPU")
+            if tracemalloc.is_tracing():
+                raise RuntimeError("tracemalloc est déjà actif dans ce process (PYTHONTRACEMALLOC ?)")
+            tracemalloc.start(frames)
+            self._prev_snapshot = tracemalloc.take_snapshot()
+        else:
+            raise ValueError(f"mode inconnu : {mode}")
+        self.mode, self.command, self.running = mode, command, True
+        self.started_at, self.ended_at, self.invocations, self._depth = time.time(), None, 0, 0
+        if seconds:
+            self._window = asyncio.get_running_loop().create_task(
+                self._expire(min(int(seconds), MAX_WINDOW_S)), name="profile-window")
+
+    async def _expire(self, seconds: int):
+        await asyncio.sleep(seconds)
+        await self._end_collection()
+
+    async def _end_collection(self) -> None:
+        if not self.running:
+            return
+        self.running = False
+        self.ended_at = time.time()
+        if self.mode == "cpu":
+            self._depth = 0
+            self._prof.disable()
+        else:
+            snap = await asyncio.to_thread(tracemalloc.take_snapshot)
+            self._final = (snap, tracemalloc.get_traced_memory())
+            tracemalloc.stop()
+
+    async def snapshot(self, top: int = 40, sort: str = "cumulative") -> Tuple[str, Optional[bytes]]:
+        """Rapport intermédiaire (la collecte continue) : (texte, contenu .pstats ou None)."""
+        if not self.mode:
+            raise RuntimeError("aucun profil en cours : `/profile start`")
+        if self.mode == "cpu":
+            return await self._cpu_report(top, sort)
+        return await self._memory_report(top), None
+
+    async def stop(self, top: int = 40, sort: str = "cumulative") -> Tuple[str, Optional[bytes]]:
+        """Arrête la collecte, renvoie le rapport final et libère la session."""
+        if not self.mode:
+            raise RuntimeError("aucun profil en cours : `/profile start`")
+        if self._window:
+            self._window.cancel()
+        await self._end_collection()
+        try:
+            return await self.snapshot(top, sort)
+        finally:
+            self.mode = self.command = None
+            self._prof = self._prev_snapshot = self._final = self._window = None
+
+    # ---------- filtre par commande (appelé par TeamTree) ----------
+
+    def command_started(self, name: str) -> None:
+        if self.mode != "cpu" or not self.running or not self.command or not _matches(name, self.command):
+            return
+        self.invocations += 1
+        if self._depth == 0:
+            self._prof.enable()
+        self._depth += 1
+
+    def command_finished(self, name: str) -> None:
+        if self._depth == 0 or not self.command or not _matches(name, self.command):
+            return
+        self._depth -= 1
+        if self._depth == 0 and self.running:
+            self._prof.disable()
+
+    # ---------- rapports ----------
+
+    def _header(self) -> str:
+        elapsed = (self.ended_at or time.time()) - self.started_at
+        scope = f"commande /{self.command} ({self.invocations} appel(s))" if self.command else "tout le process"
+        state = "en cours" if self.running else "collecte terminée"
+        return f"Profil {self.mode} — {scope} — {elapsed:.0f}s ({state})"
+
+    async def _cpu_report(self, top: int, sort: str) -> Tuple[str, bytes]:
+        # disable/enable sur le thread de la boucle ; le profil continue de s'accumuler ensuite
+        active = self.running and (not self.command or self._depth > 0)
+        self._prof.disable()
+        self._prof.create_stats()
+        stats = dict(self._prof.stats)
+        if active:
+            self._prof.enable()
+        header = self._header()
+
+        def build() -> Tuple[str, bytes]:
+            raw = marshal.dumps(stats)  # même format que pstats.Stats.dump_stats
+            buf = io.StringIO()
+            st = pstats.Stats(_FrozenStats(stats), stream=buf)
+            st.strip_dirs().sort_stats(sort if sort in PSTATS_SORTS else "cumulative").print_stats(top)
+            return f"{header}\n{buf.getvalue().strip()}\n", raw
+
+        return await asyncio.to_thread(build)
+
+    async def _memory_report(self, top: int) -> str:
+        if self._final is not None:
+            snap, (current, peak) = self._final
+        else:
+            snap = await asyncio.to_thread(tracemalloc.take_snapshot)
+            current, peak = tracemalloc.get_traced_memory()
+        prev = self._prev_snapshot
+        header = self._header()
+
+        def build() -> str:
+            diff = snap.filter_traces(_MEM_FILTERS).compare_to(prev.filter_traces(_MEM_FILTERS), "lineno")
+            lines = [header,
+                     f"mémoire tracée : {current / 1024 / 1024:.1f} Mo (pic {peak / 1024 / 1024:.1f} Mo)",
+                     f"top {top} des écarts depuis le snapshot précédent :"]
+            lines += [str(s) for s in diff[:top]]
+            return "\n".join(lines) + "\n"
+
+        text = await asyncio.to_thread(build)
+        self._prev_snapshot = snap
+        return text
+
+
+PROFILER = Profiler()
@@ -0,0 +1,110 @@
+# app/records.py
+from __future__ import annotations
+
+from types import MappingProxyType
+from typing import Mapping, NamedTuple, Optional, Tuple, Union
+
+# Lignes des tables de compétition : tuples nommés (__slots__ vides, attributs typés) au lieu de dicts.
+# - COLUMNS : liste du SELECT, dans l'ordre des champs (jamais SELECT * : l'ordre physique des
+#   colonnes diffère entre tables migrées et tables *_archive)
+# - from_row : row_factory de curseur (`cur.row_factory = Match.from_row`)
+# - immuables : une même instance peut être servie par ACTIVE_CACHE sans copie défensive
+
+
+def _from_row(cls, _cursor, row: tuple):
+    return cls(*row)
+
+
+def _record(cls, children: Tuple[str, ...] = ()):
+    cls.COLUMNS = ", ".join(f for f in cls._fields if f not in children)
+    cls.from_row = classmethod(_from_row)
+    return cls
+
+
+@_record
+class Tournament(NamedTuple):
+    id: int
+    guild_id: int
+    name: str
+    state: str
+    created_by: int
+    created_at: int
+    started_at: Optional[int]
+
+
+@_record
+class Participant(NamedTuple):
+    user_id: int
+    seed: int
+    rating: float
+
+
+@_record
+class Match(NamedTuple):
+    id: int
+    tournament_id: int
+    round: int
+    pos_in_round: int
+    p1_user_id: Optional[int]
+    p2_user_id: Optional[int]
+    p1_score: int
+    p2_score: int
+    best_of: int
+    winner_user_id: Optional[int]
+    status: str
+    next_match_id: Optional[int]
+    next_slot: Optional[int]
+
+
+@_record
+class TeamTournament(NamedTuple):
+    id: int
+    guild_id: int
+    name: str
+    state: str
+    created_by: int
+    created_at: int
+    started_at: Optional[int]
+    cancelled_at: Optional[int]
+
+
+@_record
+class TeamMatch(NamedTuple):
+    id: int
+    tournament_id: int
+    round: int
+    pos_in_round: int
+    p1_team_id: Optional[int]
+    p2_team_id: Optional[int]
+    best_of: int
+    status: str
+    p1_score: int
+    p2_score: int
+    winner_team_id: Optional[int]
+    next_match_id: Optional[int]
+    next_slot: Optional[int]
+
+
+_EMPTY: Mapping = MappingProxyType({})
+
+
+class Arena(NamedTuple):
+    id: int
+    guild_id: int
+    state: str
+    created_by: int
+    created_at: int
+    rounds_total: int
+    current_round: int
+    version: int
+    # Tables filles (hors COLUMNS, vides pour list_competitions) : participants par siège,
+    # schedule[round-1] = ((u1, u2), ...), scores {user_id: points}, reported {"round": ("u1-u2", ...)}
+    participants: Tuple[int, ...] = ()
+    schedule: Tuple[Tuple[Tuple[int, int], ...], ...] = ()
+    scores: Mapping[int, int] = _EMPTY
+    reported: Mapping[str, Tuple[str, ...]] = _EMPTY
+
+
+_record(Arena, children=("participants", "schedule", "scores", "reported"))
+
+Record = Union[Tournament, Participant, Match, TeamTournament, TeamMatch, Arena]
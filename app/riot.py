@@ -2,6 +2,7 @@
 from __future__ import annotations
 from typing import Optional, Tuple
 import aiohttp
+from .metrics import RIOT_CALLS
 
 PLATFORM_MAP = {
     "EUW":"euw1","EUNE":"eun1","NA":"na1","KR":"kr","BR":"br1",
@@ -26,11 +27,13 @@ async def fetch_lol_rank_info(riot_key: Optional[str], region_code: str, summone
     base = f"https://{region_code}.api.riotgames.com"
     async with aiohttp.ClientSession() as session:
         async with session.get(f"{base}/lol/summoner/v4/summoners/by-name/{summoner_name}", headers=headers) as r:
+            RIOT_CALLS.inc(endpoint="summoner/by-name", status=r.status)
             if r.status != 200: return None
             summ = await r.json()
         summ_id = summ.get("id")
         if not summ_id: return None
         async with session.get(f"{base}/lol/league/v4/entries/by-summoner/{summ_id}", headers=headers) as r:
+            RIOT_CALLS.inc(endpoint="league/entries", status=r.status)
             if r.status != 200: return None
             entries = await r.json()
     chosen = next((e for e in entries if e.get("queueType")=="RANKED_SOLO_5x5"), entries[0] if entries else None)
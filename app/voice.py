@@ -7,6 +7,8 @@ from typing import List, Dict, Optional
 
 import discord
 
+from .metrics import VOICE_MOVES
+
 # TEMP_CHANNELS[guild_id][channel_id] = expires_at (timestamp en secondes)
 # On ne suit QUE les salons créés par le bot.
 TEMP_CHANNELS: Dict[int, Dict[int, float]] = {}
@@ -277,10 +279,11 @@ async def create_and_move_voice(
             if m.voice and m.voice.channel and m.voice.channel.id != dest.id:
                 try:
                     await m.move_to(dest, reason="TeamBuilder move")
+                    VOICE_MOVES.inc(result="ok")
                 except discord.Forbidden:
-                    pass
+                    VOICE_MOVES.inc(result="forbidden")
                 except discord.HTTPException:
-                    pass
+                    VOICE_MOVES.inc(result="error")
 
     # Lobby + épinglage en haut (optionnel)
     if pin_on_top or create_lobby:
@@ -0,0 +1,151 @@
+# app/writebehind.py
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import itertools
+import traceback
+from collections import OrderedDict
+from typing import Awaitable, Callable, Hashable, Optional
+
+import aiosqlite
+
+# Une écriture différée : coroutine exécutée dans la transaction du lot
+WriteOp = Callable[[aiosqlite.Connection], Awaitable[object]]
+
+
+class WriteBehindQueue:
+    """
+    File d'écritures différées pour la persistance non critique (snapshot /team, signatures,
+    pruning, rang LoL) : l'interaction n'attend plus les fsync.
+
+    - une seule tâche d'écriture ; lots vidés toutes les `interval_ms` ou dès `max_batch` éléments
+    - coalescence : une nouvelle écriture sur une clé déjà en attente remplace l'ancienne
+      (et passe en fin de file, pour rester ordonnée après les écritures précédentes)
+    - un lot = une transaction par base ; chaque écriture est isolée par un SAVEPOINT
+    - flush() : barrière « read-your-writes » ; drain() : vidage complet à l'arrêt
+    """
+
+    def __init__(self, opener, interval_ms: int = 250, max_batch: int = 64, max_attempts: int = 3):
+        self._open = opener  # ex. app.db.connect
+        self.interval_s = interval_ms / 1000
+        self.max_batch = max_batch
+        self.max_attempts = max_attempts
+        self._pending: "OrderedDict[Hashable, tuple[int, str, WriteOp]]" = OrderedDict()
+        self._anon = itertools.count()
+        self._seq = 0
+        self._done_seq = 0
+        self._cond: Optional[asyncio.Condition] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        self.stats = {"submitted": 0, "coalesced": 0, "written": 0, "failed": 0, "batches": 0}
+
+    def configure(self, interval_ms: Optional[int] = None, max_batch: Optional[int] = None):
+        if interval_ms is not None:
+            self.interval_s = max(1, int(interval_ms)) / 1000
+        if max_batch is not None:
+            self.max_batch = max(1, int(max_batch))
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._cond = asyncio.Condition()
+            self._wake = asyncio.Event()
+            # Contexte vierge : la tâche ne doit pas hériter des ContextVar de l'appel qui l'a démarrée
+            # (ex. fonction de repository en cours, cf. app/dbstats.py)
+            self._task = contextvars.Context().run(
+                asyncio.get_running_loop().create_task, self._run(), name="write-behind"
+            )
+
+    def submit(self, db_path, op: WriteOp, key: Optional[Hashable] = None) -> None:
+        """Met en file `op(db)`. key=None : jamais coalescée (ex. insertion de signature)."""
+        if self._closed:
+            raise RuntimeError("write-behind fermé")
+        self._ensure_started()
+        k = (str(db_path), key) if key is not None else ("#", next(self._anon))
+        if k in self._pending:
+            self.stats["coalesced"] += 1
+            del self._pending[k]
+        self._seq += 1
+        self._pending[k] = (self._seq, str(db_path), op)
+        self.stats["submitted"] += 1
+        if len(self._pending) >= self.max_batch:
+            self._wake.set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def flush(self) -> None:
+        """Attend que tout ce qui a été soumis avant l'appel soit écrit (ou abandonné)."""
+        target = self._seq
+        if self._task is None or self._done_seq >= target:
+            return
+        self._wake.set()
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._done_seq >= target or self._task.done())
+
+    async def drain(self) -> None:
+        """Vide la file puis arrête la tâche d'écriture (appelé par TeamBot.close)."""
+        self._closed = True
+        if self._task is None:
+            return
+        await self.flush()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval_s)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            while self._pending:
+                batch = []
+                while self._pending and len(batch) < self.max_batch:
+                    batch.append(self._pending.popitem(last=False)[1])
+                await self._write_batch(batch)
+                async with self._cond:
+                    self._done_seq = batch[-1][0]
+                    self._cond.notify_all()
+
+    async def _write_batch(self, batch):
+        # Regroupe les écritures consécutives d'une même base (ordre de soumission conservé)
+        for db_path, group in itertools.groupby(batch, key=lambda it: it[1]):
+            ops = [op for _seq, _p, op in group]
+            for attempt in range(1, self.max_attempts + 1):
+                try:
+                    await self._write_group(db_path, ops)
+                    self.stats["batches"] += 1
+                    break
+                except Exception as e:
+                    if attempt == self.max_attempts:
+                        self.stats["failed"] += len(ops)
+                        print(f"[write-behind] lot abandonné ({len(ops)} écritures) : {e}")
+                    else:
+                        await asyncio.sleep(0.05 * attempt)
+
+    async def _write_group(self, db_path: str, ops):
+        async with self._open(db_path) as db:
+            await db.execute("BEGIN")
+            try:
+                for op in ops:
+                    await db.execute("SAVEPOINT wb")
+                    try:
+                        await op(db)
+                        await db.execute("RELEASE wb")
+                        self.stats["written"] += 1
+                    except Exception:
+                        # une écriture invalide n'annule pas le reste du lot
+                        await db.execute("ROLLBACK TO wb")
+                        await db.execute("RELEASE wb")
+                        self.stats["failed"] += 1
+                        traceback.print_exc()
+                await db.commit()
+            except BaseException:
+                await db.rollback()
+                raise
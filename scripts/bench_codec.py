@@ -0,0 +1,80 @@
+# scripts/bench_codec.py
+"""
+Compare app.codec (array('Q') packé) à json.dumps / json.loads sur :
+- un planning Arena 16 joueurs / 15 rounds (liste de rounds, chaque round = ids des duos à plat),
+  au format liste de listes ci-dessous (non utilisé en base : l'Arena est en tables, cf. migration 2)
+- une équipe de 5 joueurs (format 0x01 de app.codec : tt_teams, filigranes d'export)
+
+Usage : python -m scripts.bench_codec [--n 20000]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import struct
+import timeit
+from itertools import chain
+
+from app import codec
+
+# Liste de listes : [0x02][uint32 nb_listes][uint32 longueurs * nb][Q * total], little-endian
+FMT_NESTED = 0x02
+_U32 = struct.Struct("<I")
+
+
+def encode_nested(lists: list[list[int]]) -> bytes:
+    lengths = [len(x) for x in lists]
+    flat = list(chain.from_iterable(lists))
+    return struct.pack(f"<BI{len(lengths)}I{len(flat)}Q", FMT_NESTED, len(lengths), *lengths, *flat)
+
+
+def decode_nested(value: bytes) -> list[list[int]]:
+    (n,) = _U32.unpack_from(value, 1)
+    start = 1 + _U32.size
+    lengths = struct.unpack_from(f"<{n}I", value, start)
+    flat = list(struct.unpack_from(f"<{sum(lengths)}Q", value, start + 4 * n))
+    out, pos = [], 0
+    for ln in lengths:
+        out.append(flat[pos:pos + ln])
+        pos += ln
+    return out
+
+
+def arena_schedule(players: int = 16, rounds: int = 15) -> list[list[int]]:
+    rng = random.Random(42)
+    ids = [rng.randrange(10**17, 10**18) for _ in range(players)]
+    out = []
+    for _ in range(rounds):
+        rng.shuffle(ids)
+        out.append(list(ids))  # duos = paires consécutives
+    return out
+
+
+def bench(label: str, value, enc, dec, n: int):
+    blob = enc(value)
+    text = json.dumps(value)
+    assert dec(blob) == value and json.loads(text) == value
+    t_enc_json = timeit.timeit(lambda: json.dumps(value), number=n)
+    t_enc_bin = timeit.timeit(lambda: enc(value), number=n)
+    t_dec_json = timeit.timeit(lambda: json.loads(text), number=n)
+    t_dec_bin = timeit.timeit(lambda: dec(blob), number=n)
+    us = 1e6 / n
+    print(f"{label}")
+    print(f"  taille   json {len(text):6d} o | codec {len(blob):6d} o")
+    print(f"  encode   json {t_enc_json * us:7.2f} us | codec {t_enc_bin * us:7.2f} us | x{t_enc_json / t_enc_bin:.1f}")
+    print(f"  decode   json {t_dec_json * us:7.2f} us | codec {t_dec_bin * us:7.2f} us | x{t_dec_json / t_dec_bin:.1f}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=20000)
+    args = ap.parse_args()
+    bench("Planning Arena 16 joueurs x 15 rounds (format 0x02)",
+          arena_schedule(), encode_nested, decode_nested, args.n)
+    team = arena_schedule(5, 1)[0]
+    bench("Équipe de 5 (format 0x01)", team, codec.encode_ids, codec.decode_ids, args.n)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# scripts/bench_db_profiles.py
+"""
+Benchmark des profils SQLite (app.db.DB_PROFILES) sur les chemins d'écriture chauds :
+- commit d'un /teamroll : session -> bump_pair_counts -> add_team_signature -> prune_team_signatures
+- report Arena : arena_mark_results concurrents (BEGIN IMMEDIATE)
+
+Usage : python -m scripts.bench_db_profiles [--rolls 200] [--arenas 20] [--dir /data]
+(--dir : lancer sur le volume réel pour mesurer le coût de fsync, ex. Railway)
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from app import db as D
+
+
+async def bench_rolls(db_path: str, n: int) -> float:
+    guild_id, session = 1, "bench"
+    players = list(range(100, 110))
+    t0 = time.perf_counter()
+    for i in range(n):
+        random.shuffle(players)
+        teams = [players[:5], players[5:]]
+        sid = await D.get_or_create_session_id(db_path, guild_id, session)
+        await D.bump_pair_counts(db_path, sid, teams)
+        sig = "|".join(",".join(map(str, sorted(t))) for t in teams) + f"#{i}"
+        await D.add_team_signature(db_path, guild_id, session, "p", "5x2", sig, int(time.time()))
+        await D.prune_team_signatures(db_path, guild_id, session, "p", "5x2", 200)
+    return time.perf_counter() - t0
+
+
+async def bench_arena(db_path: str, n: int) -> float:
+    ids = list(range(1, 17))
+    schedule = [
+        [[ids[i], ids[(i + r + 1) % 16]] for i in range(0, 16, 2)]
+        for r in range(3)
+    ]
+    t0 = time.perf_counter()
+    for g in range(n):
+        aid = await D.arena_create(db_path, 1000 + g, 1, len(schedule), ids, schedule)
+        for r, duos in enumerate(schedule, start=1):
+            await asyncio.gather(*[
+                D.arena_mark_results(db_path, aid, r, {tuple(p): (k + 1, 8 - k)})
+                for k, p in enumerate(duos)
+            ])
+    return time.perf_counter() - t0
+
+
+async def run(profile: str, args) -> None:
+    D.configure_db(profile)
+    fd, path = tempfile.mkstemp(suffix=".db", dir=args.dir)
+    os.close(fd)
+    try:
+        await D.init_db(path)
+        t_roll = await bench_rolls(path, args.rolls)
+        t_arena = await bench_arena(path, args.arenas)
+        reports = args.arenas * 3 * 8
+        print(
+            f"{profile:<9} rolls: {args.rolls / t_roll:8.1f}/s ({t_roll:6.2f}s) | "
+            f"arena reports: {reports / t_arena:8.1f}/s ({t_arena:6.2f}s)"
+        )
+    finally:
+        for suffix in ("", "-wal", "-shm", "-journal"):
+            try:
+                os.remove(path + suffix)
+            except FileNotFoundError:
+                pass
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rolls", type=int, default=200)
+    ap.add_argument("--arenas", type=int, default=20)
+    ap.add_argument("--dir", default=None)
+    ap.add_argument("--profiles", default=",".join(D.DB_PROFILES))
+    args = ap.parse_args()
+    for profile in args.profiles.split(","):
+        asyncio.run(run(profile.strip(), args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# scripts/check_arena_concurrency.py
+"""
+Stress des reports Arena concurrents : sur une base temporaire, les 8 duos d'un round reportent
+en même temps (8 appels arena_mark_results simultanés, une connexion chacun).
+Vérifie que chaque score est exact (aucun report écrasé ni compté deux fois) et que le round
+n'avance qu'une seule fois. Répété ROUNDS fois sur des arenas neuves pour varier l'entrelacement.
+Vérifie aussi qu'un report en retard (round déjà passé) ou sur une arena close est refusé sans rien écrire.
+
+Usage : python -m scripts.check_arena_concurrency   (code retour 1 si une vérification échoue)
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+import tempfile
+
+from app import db as D
+
+PLAYERS = 16
+ROUNDS = 20
+GUILD_ID = 1
+
+
+def _schedule(ids: list[int]) -> list[list[list[int]]]:
+    # 3 rounds : un round qui avancerait deux fois finirait en 3, pas en 2
+    n = len(ids)
+    return [[[ids[i], ids[(i + 1 + 2 * r) % n]] for i in range(0, n, 2)] for r in range(3)]
+
+
+async def _one_round(path: str, attempt: int) -> list[str]:
+    ids = list(range(1, PLAYERS + 1))
+    schedule = _schedule(ids)
+    aid = await D.arena_create(path, GUILD_ID, 1, len(schedule), ids, schedule)
+    duos = schedule[0]
+    # points distincts par duo : un report perdu ou doublé se voit sur le score
+    points = {tuple(duo): 10 * (k + 1) for k, duo in enumerate(duos)}
+    outcomes = await asyncio.gather(*(
+        D.arena_mark_results(path, aid, 1, {duo: (k + 1, pts)})
+        for k, (duo, pts) in enumerate(points.items())
+    ), return_exceptions=True)
+    errors = [f"#{attempt} arena {aid}: report en erreur : {e!r}" for e in outcomes if isinstance(e, BaseException)]
+    arena = await D.arena_get_by_id(path, aid)
+    if arena.current_round != 2 or arena.state != "running":
+        errors.append(f"#{attempt} arena {aid}: round {arena.current_round} / {arena.state} (attendu 2 / running)")
+    for (u1, u2), pts in points.items():
+        for uid in (u1, u2):
+            if arena.scores.get(uid) != pts:
+                errors.append(f"#{attempt} arena {aid}: score de {uid} = {arena.scores.get(uid)} (attendu {pts})")
+    reported = arena.reported.get("1", ())
+    if len(reported) != len(duos):
+        errors.append(f"#{attempt} arena {aid}: {len(reported)} report(s) au round 1 (attendu {len(duos)})")
+    return errors
+
+
+async def _refused(path: str, aid: int, rnd: int, duo: tuple, label: str) -> list[str]:
+    before = await D.arena_get_by_id(path, aid)
+    try:
+        await D.arena_mark_results(path, aid, rnd, {duo: (1, 99)})
+    except RuntimeError:
+        after = await D.arena_get_by_id(path, aid)
+        return [] if after.scores == before.scores else [f"{label} : refusé mais scores modifiés"]
+    return [f"{label} : accepté (attendu RuntimeError)"]
+
+
+async def _guards(path: str) -> list[str]:
+    ids = list(range(1, PLAYERS + 1))
+    schedule = _schedule(ids)
+    aid = await D.arena_create(path, GUILD_ID, 1, len(schedule), ids, schedule)
+    for k, duo in enumerate(schedule[0]):
+        await D.arena_mark_results(path, aid, 1, {tuple(duo): (k + 1, 1)})
+    errors = await _refused(path, aid, 1, tuple(schedule[0][0]), "report du round 1 une fois au round 2")
+    await D.arena_set_state(path, aid, "cancelled")
+    errors += await _refused(path, aid, 2, tuple(schedule[1][0]), "report sur une arena annulée")
+    return errors
+
+
+async def main() -> int:
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    errors: list[str] = []
+    try:
+        await D.init_db(path)
+        for attempt in range(1, ROUNDS + 1):
+            errors += await _one_round(path, attempt)
+        errors += await _guards(path)
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(path + suffix)
+            except FileNotFoundError:
+                pass
+    for e in errors:
+        print("FAIL", e)
+    print(f"\n{len(errors)} erreur(s)" if errors else
+          f"\nok : {ROUNDS} x {PLAYERS // 2} reports concurrents, scores exacts, une seule avance de round ; "
+          "reports en retard / sur arena close refusés")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,237 @@
+# scripts/check_query_plans.py
+"""
+Vérifie via EXPLAIN QUERY PLAN qu'aucune requête de app/db.py ni de app/cogs/team_tournament.py
+ne fait de scan complet de table (SCAN <table>) sur le schéma issu des migrations.
+
+Les requêtes ne sont pas recopiées ici : SCENARIO appelle chaque fonction de repository sur une base
+temporaire et le SQL réellement exécuté est capturé (dbstats.capture_statements, y compris les
+connexions sqlite3 des exports), puis rejoué en EXPLAIN QUERY PLAN sur une base vierge migrée.
+Échoue aussi si une fonction de repository chronométrée n'est pas appelée par le scénario.
+Les scans assumés sont listés dans ALLOWED_SCANS, avec leur raison.
+
+Usage : python -m scripts.check_query_plans   (code retour 1 si un scan inattendu apparaît)
+À relancer dès qu'une requête est ajoutée ; une nouvelle fonction de repository va dans SCENARIO.
+"""
+from __future__ import annotations
+
+import asyncio
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+from app import db as D
+from app.cogs import team_tournament as TT
+from app.dbstats import FN_STATS, capture_statements
+
+GUILD_ID = 1
+
+# (fonction, table telle qu'affichée par le plan — alias compris) -> raison ; "*" : toute fonction
+ALLOWED_SCANS = {
+    ("*", "sqlite_master"): "liste des tables (exports)",
+    ("*", "_archive_ids"): "table temporaire des ids à archiver, lue en entier par construction",
+    ("db.warm_ratings_cache", "skills"): "préchargement du cache des ratings au démarrage (LIMIT taille du cache)",
+    ("db.fetch_all_ratings_and_links", "skills"): "lecture globale assumée (une ligne par joueur)",
+    ("db.fetch_all_ratings_and_links", "lol_links"): "lecture globale assumée (une ligne par joueur)",
+    ("db.fetch_all_ratings_and_links", "lol_rank"): "lecture globale assumée (une ligne par joueur)",
+    # Archivage (quotidien, heure creuse) : state IN (…) AND created_at < ? sur les tables chaudes,
+    # réduites aux compétitions récentes justement par cet archivage
+    **{(fn, parent): "sélection des compétitions à archiver (maintenance quotidienne, tables chaudes petites)"
+       for fn in ("db.archive_competitions", "db.run_maintenance")
+       for parent in ("tournaments", "team_tournaments", "arena_tournaments")},
+    ("db.run_maintenance", "team_history"): "pruning de toutes les signatures par bucket (fenêtre ROW_NUMBER)",
+    ("db.run_maintenance", "s"): "sessions inactives : parcours de team_sessions (maintenance quotidienne)",
+    # Exports (thread, instantané en lecture seule) : chaque table est écrite en entier ou presque
+    ("db.export_csv_zip", "*"): "export complet : tables lues en entier (filtres serveur / période sans index dédié)",
+    # Export incrémental : seules les tables sans filigrane sont relues en entier (à revoir si une table
+    # s'ajoute ici : lui donner un filigrane dans _INCR_ROWID / _INCR_TIME / _INCR_FAMILIES)
+    **{("db.export_incremental", t): "instantané complet à chaque export (pas de filigrane, une ligne par joueur)"
+       for t in ("skills", "lol_links", "lol_rank", "team_pair_counts")},
+    ("db.export_incremental", "export_watermarks"): "filigranes : une ligne par table exportée",
+    ("db.export_incremental", "team_last_history"): "journal compacté à chaque écriture : quelques versions par serveur",
+    **{("db.export_incremental", parent): "compétitions encore actives (state IN …, tous serveurs) : parcours de "
+                                          "l'index, tables chaudes petites depuis l'archivage"
+       for parent in ("tournaments", "team_tournaments", "arena_tournaments")},
+}
+
+_SCAN = re.compile(r"^SCAN (\S+)")
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "REPLACE")
+
+
+async def scenario(path: str, workdir: Path) -> None:
+    """Appelle chaque fonction de repository (toutes branches utiles : archived, defer, filtres…)."""
+    users = list(range(101, 117))
+
+    # ratings / LoL
+    for u in users:
+        await D.set_rating(path, u, 1000.0 + u)
+    D.RATINGS_CACHE.clear()
+    await D.warm_ratings_cache(path)
+    await D.get_rating(path, 999)
+    await D.link_lol(path, users[0], "Joueur", "EUW")
+    await D.get_linked_lol(path, users[0])
+    await D.set_lol_rank(path, users[0], "riot", "gold", "II", 40)
+    await D.set_lol_rank(path, users[1], "riot", "silver", "I", 10, defer=True)
+    await D.fetch_all_ratings_and_links(path)
+
+    # tournoi user vs user
+    tid = await D.create_tournament(path, GUILD_ID, "cup", 1)
+    await D.get_active_tournament(path, GUILD_ID)
+    for seed, u in enumerate(users[:4], start=1):
+        await D.add_participant(path, tid, u, seed, 1000.0)
+    await D.list_participants(path, tid)
+    await D.clear_bracket(path, tid)
+    await D.create_matches(path, tid, [
+        {"round": 1, "pos_in_round": 1, "p1_user_id": users[0], "p2_user_id": users[1], "status": "open"},
+        {"round": 1, "pos_in_round": 2, "p1_user_id": users[2], "p2_user_id": users[3], "status": "open"},
+        {"round": 2, "pos_in_round": 1},
+    ])
+    m1, m2, final = await D.list_matches(path, tid)
+    await D.set_next_links(path, tid, [(m1.id, final.id, 1), (m2.id, final.id, 2)])
+    await D.set_tournament_state(path, tid, "running", started=True)
+    await D.report_match_result(path, tid, m1.id, users[0], 1, 0)
+    await D.update_match_participant(path, final.id, 2, users[2])
+    await D.set_match_open_if_ready(path, final.id)
+    await D.set_tournament_state(path, tid, "finished")
+
+    # TeamRoll : sessions, paires, dernier tirage, signatures
+    sid = await D.get_or_create_session_id(path, GUILD_ID, "soir")
+    await D.bump_pair_counts(path, sid, [users[:4], users[4:8]])
+    await D.load_pair_counts(path, sid)
+    await D.session_stats(path, sid, users[:8])
+    await D.set_team_last(path, GUILD_ID, {"teams": [users[:4], users[4:8]]})
+    await D.set_team_last(path, GUILD_ID, {"teams": [users[4:8], users[:4]]}, defer=True)
+    await D.get_team_last_versioned(path, GUILD_ID)
+    await D.get_team_last(path, GUILD_ID)
+    bucket = (GUILD_ID, "soir", "p", "z")
+    await D.add_team_signature(path, *bucket, "sig-1", 1)
+    await D.add_team_signature(path, *bucket, "sig-2", 2, defer=True)
+    await D.load_team_signatures(path, *bucket)
+    await D.prune_team_signatures(path, *bucket, 1)
+    await D.prune_team_signatures(path, *bucket, 1, defer=True)
+    await D.clear_team_signatures(path, GUILD_ID, "soir", "p", "z")
+    await D.clear_team_signatures(path, GUILD_ID, "soir")
+    await D.clear_team_signatures(path, GUILD_ID, "", "p", "z")
+
+    # arena
+    duos = [[[users[i], users[i + 1]] for i in range(0, 8, 2)], [[users[i], users[i + 2]] for i in (0, 1, 4, 5)]]
+    aid = await D.arena_create(path, GUILD_ID, 1, len(duos), users[:8], duos)
+    await D.arena_get_active(path, GUILD_ID)
+    await D.arena_mark_results(path, aid, 1, {tuple(duos[0][0]): (1, 10)})
+    await D.arena_get_by_id(path, aid)
+    await D.arena_set_state(path, aid, "finished")
+
+    # tournoi team vs team
+    ttid = await TT.tt_create(path, GUILD_ID, "teams", 1)
+    await TT.tt_get_active(path, GUILD_ID)
+    await TT.tm_clear(path, ttid)
+    t1, t2 = await TT.tt_teams_create(path, ttid, [users[:4], users[4:8]])
+    await TT.tt_teams_map(path, ttid)
+    await TT.tm_create_many(path, ttid, [
+        {"round": 1, "pos_in_round": 1, "p1_team_id": t1, "p2_team_id": t2, "status": "running"},
+        {"round": 2, "pos_in_round": 1},
+    ])
+    tm1, tm2 = await TT.tm_list(path, ttid)
+    await TT.tm_update_next_links(path, ttid, [(tm1.id, tm2.id, 1)])
+    await TT.tm_set_result(path, ttid, tm1.id, t1, 2, 0)
+    await TT.tt_set_state(path, ttid, "running")
+    await TT.tt_set_state(path, ttid, "cancelled")
+
+    # listes (tables chaudes), archivage, puis lectures des archives
+    for kind in ("tournament", "tt", "arena"):
+        await D.list_competitions(path, kind, GUILD_ID)
+    await D.archive_competitions(path, older_than_days=-1)  # tout ce qui est terminé, quelle que soit la date
+    for kind in ("tournament", "tt", "arena"):
+        await D.list_competitions(path, kind, GUILD_ID, archived=True)
+    await D.list_participants(path, tid, archived=True)
+    await D.list_matches(path, tid, archived=True)
+    await D.arena_get_by_id(path, aid, archived=True)
+    await TT.tt_teams_map(path, ttid, archived=True)
+    await TT.tm_list(path, ttid, archived=True)
+    await D.end_session(path, GUILD_ID, "soir")
+
+    # exports, sauvegarde, maintenance
+    await D.export_csv_zip(path, workdir)
+    await D.export_csv_zip(path, workdir, guild_id=GUILD_ID, since=0, until=2 ** 31)
+    info = await D.export_incremental(path, workdir)
+    await D.commit_export_watermarks(path, info["marks"])
+    await D.export_incremental(path, workdir, fmt="csv")
+    await D.backup_db(path, workdir)
+    await D.run_maintenance(path, archive_after_days=-1)
+    await D.persist_memory_db()
+    await D.close_memory_db()
+
+
+def _repository_functions() -> set[str]:
+    names = set()
+    for module in (D, TT):
+        short = module.__name__.rsplit(".", 1)[-1]
+        names |= {f"{short}.{attr}" for attr, obj in vars(module).items()
+                  if getattr(obj, "__timed__", False) and obj.__module__ == module.__name__}
+    return names
+
+
+def _plans(path: str, captured: list) -> list[tuple[str, str, list[str]]]:
+    """EXPLAIN QUERY PLAN de chaque requête distincte (fonction, SQL) capturée."""
+    con = sqlite3.connect(path)
+    try:
+        # tables temporaires créées en cours de route (archivage) : recréées avant le rejeu
+        for _fn, sql, _params in captured:
+            if sql.lstrip().upper().startswith("CREATE TEMP"):
+                con.execute(sql)
+        seen, out = set(), []
+        for fn, sql, params in captured:
+            short = " ".join(sql.split())
+            key = (fn, short)
+            if key in seen or not short.upper().startswith(_EXPLAINABLE):
+                continue
+            seen.add(key)
+            plan = [row[3] for row in con.execute(f"EXPLAIN QUERY PLAN {sql}", params or ())]
+            out.append((fn or "(écriture différée)", short, plan))
+        return out
+    finally:
+        con.close()
+
+
+def _unexpected_scans(fn: str, plan: list[str]) -> list[str]:
+    bad = []
+    for detail in plan:
+        m = _SCAN.match(detail)
+        # « SCAN (subquery-N) » / CONSTANT ROW : pas une table ; le scan éventuel de la table apparaît à part
+        if not m or m.group(1).startswith("(") or "CONSTANT ROW" in detail:
+            continue
+        table = m.group(1)
+        if not any(k in ALLOWED_SCANS for k in ((fn, table), (fn, "*"), ("*", table))):
+            bad.append(detail)
+    return bad
+
+
+async def main() -> int:
+    workdir = Path(tempfile.mkdtemp())
+    path, plan_path = str(workdir / "scenario.db"), str(workdir / "plans.db")
+    failures = 0
+    try:
+        await D.init_db(path)
+        await D.init_db(plan_path)  # schéma vierge pour les plans (pas de sqlite_stat1 laissé par ANALYZE)
+        with capture_statements() as captured:
+            await scenario(path, workdir)
+
+        for fn, sql, plan in _plans(plan_path, captured):
+            bad = _unexpected_scans(fn, plan)
+            failures += bool(bad)
+            print(f"{'FAIL' if bad else 'ok  '} {fn:<34} {sql[:110]}\n       {' | '.join(plan)}")
+
+        missing = sorted(_repository_functions() - set(FN_STATS))
+        for name in missing:
+            print(f"FAIL {name:<34} jamais appelée par SCENARIO : requêtes non vérifiées")
+        failures += len(missing)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print(f"\n{failures} échec(s)" if failures else "\naucun scan complet inattendu, toutes les fonctions couvertes")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))